@@ -17,11 +17,23 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = "127.0.0.1"
     port: int = 8000
+    environment: str = "development"
+
+    # Templates
+    template_cache_dir: Path = Path(".jinja_cache")
+
+    # AI results cache (identical requests are served from disk)
+    ai_cache_dir: Path = Path(".ai_cache")
 
     # File Handling
     max_upload_size_mb: int = 500
     temp_file_retention_hours: int = 1
 
+    @property
+    def max_upload_bytes(self) -> int:
+        """Hard ceiling on a single request's upload size, in bytes."""
+        return self.max_upload_size_mb * 1024 * 1024
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,32 @@
+"""Shared executors for blocking media work.
+
+Route handlers are async, so CPU-heavy or subprocess-bound calls must be
+handed off to an executor to keep the event loop serving other requests.
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+# pypdf is pure Python and holds the GIL, so PDF work runs in processes
+PDF_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+# FFmpeg/FFprobe do their work in a child process; threads only wait on them
+FFMPEG_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ffmpeg")
+
+
+async def run_in_pool(pool: Executor, func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a blocking function in an executor and await its result.
+
+    Args:
+        pool: Executor to run the function in
+        func: Blocking function (must be picklable for process pools)
+        *args: Positional arguments for func
+
+    Returns:
+        Whatever func returns
+    """
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
@@ -0,0 +1,53 @@
+"""Buffered logging setup.
+
+Log records are collected in memory and written to stdout in batches,
+either every LOG_FLUSH_INTERVAL seconds or immediately for errors, so
+request handlers never block on a console write.
+"""
+
+import asyncio
+import logging
+import sys
+from logging.handlers import MemoryHandler
+from typing import Optional
+from app.config import settings
+
+
+LOG_BUFFER_CAPACITY = 1024
+LOG_FLUSH_INTERVAL = 0.5  # seconds
+
+_handler: Optional[MemoryHandler] = None
+_flush_task: Optional[asyncio.Task] = None
+
+
+def configure_logging():
+    """Route all logging through a buffered stdout handler (idempotent)."""
+    global _handler
+    if _handler is not None:
+        return
+
+    _handler = MemoryHandler(
+        capacity=LOG_BUFFER_CAPACITY,
+        target=logging.StreamHandler(sys.stdout),
+        flushLevel=logging.ERROR
+    )
+    logging.basicConfig(level=logging.WARNING, format="%(message)s", handlers=[_handler])
+
+    # Our own modules log at INFO in production and DEBUG in development
+    logging.getLogger("app").setLevel(
+        logging.INFO if settings.environment == "production" else logging.DEBUG
+    )
+
+
+async def _flush_loop():
+    """Flush buffered log records on a fixed interval."""
+    while True:
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)
+        _handler.flush()
+
+
+def start_log_flusher():
+    """Start the periodic flush task on the running event loop."""
+    global _flush_task
+    if _handler is not None and _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
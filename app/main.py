@@ -1,13 +1,21 @@
 """FastAPI application entry point for Media Toolkit."""
 
+import asyncio
+import hashlib
+import logging
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from app.config import settings
+from app.logging_config import configure_logging, start_log_flusher
+from app.middleware.cors import APICORSMiddleware
+from app.middleware.upload_limit import UploadLimitMiddleware
+from app.templating import render_static_pages, static_page
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 
 # Initialize FastAPI app
@@ -17,9 +25,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS for local development
+# Stop oversized uploads while they are received, before Starlette spools
+# them (added first so it runs inside CORS and 413s still get CORS headers)
+app.add_middleware(UploadLimitMiddleware)
+
+# Configure CORS for local development (API routes only)
 app.add_middleware(
-    CORSMiddleware,
+    APICORSMiddleware,
     allow_origins=["*"],  # Allow all origins for local development
     allow_credentials=True,
     allow_methods=["*"],
@@ -29,17 +41,60 @@ app.add_middleware(
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Configure templates
-templates = Jinja2Templates(directory="templates")
+# SEO files are tiny and hit often by crawlers, so keep them in memory
+_SITEMAP = Path("static/sitemap.xml").read_bytes()
+_SITEMAP_ETAG = f'"{hashlib.md5(_SITEMAP).hexdigest()}"'
+_ROBOTS = Path("static/robots.txt").read_bytes()
+_ROBOTS_ETAG = f'"{hashlib.md5(_ROBOTS).hexdigest()}"'
+
+
+def _cached_file_response(request: Request, content: bytes, etag: str, media_type: str) -> Response:
+    """Return in-memory file content, or 304 if the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+# Periodic temp-file sweep: anything a request failed to clean up is
+# removed once it is older than its directory's TTL (AI results are only
+# reused for retries carrying the same idempotency key, so a day is plenty)
+CLEANUP_INTERVAL_SECONDS = 300
+UPLOAD_TTL_SECONDS = 1800
+OUTPUT_TTL_SECONDS = settings.temp_file_retention_hours * 3600
+AI_CACHE_TTL_SECONDS = 24 * 3600
+
+_cleanup_task = None
+
+
+async def cleanup_loop():
+    """Sweep expired files from the upload and output directories forever."""
+    from app.services.cleanup_service import sweep_directory
+
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+        try:
+            deleted = await asyncio.to_thread(sweep_directory, settings.upload_dir, UPLOAD_TTL_SECONDS)
+            deleted += await asyncio.to_thread(sweep_directory, settings.output_dir, OUTPUT_TTL_SECONDS)
+            deleted += await asyncio.to_thread(sweep_directory, settings.ai_cache_dir, AI_CACHE_TTL_SECONDS)
+            if deleted:
+                logger.info("[OK] Swept %d expired temporary files", deleted)
+        except Exception:
+            logger.exception("[ERROR] Temporary file sweep failed")
 
 
 @app.on_event("startup")
 async def startup_event():
     """Create necessary directories on startup."""
+    start_log_flusher()
+
     settings.upload_dir.mkdir(parents=True, exist_ok=True)
     settings.output_dir.mkdir(parents=True, exist_ok=True)
-    print(f"[OK] Upload directory: {settings.upload_dir.absolute()}")
-    print(f"[OK] Output directory: {settings.output_dir.absolute()}")
+    logger.info("[OK] Upload directory: %s", settings.upload_dir.absolute())
+    logger.info("[OK] Output directory: %s", settings.output_dir.absolute())
+
+    # Render static pages once so page handlers only return cached HTML
+    render_static_pages()
 
     # Clean up old temporary files on startup
     from app.services.cleanup_service import cleanup_uploads_and_outputs
@@ -49,45 +104,59 @@ async def startup_event():
         settings.temp_file_retention_hours
     )
     if result["total_deleted"] > 0:
-        print(f"[OK] Cleaned up {result['total_deleted']} old temporary files")
+        logger.info("[OK] Cleaned up %d old temporary files", result["total_deleted"])
+
+    global _cleanup_task
+    _cleanup_task = asyncio.create_task(cleanup_loop())
+
+    # Usage counters are written to disk in batches
+    from app.services.usage_tracker import usage_tracker
+    usage_tracker.start_flusher()
 
-    print(f"[OK] Server running on http://{settings.host}:{settings.port}")
+    logger.info("[OK] Server running on http://%s:%s", settings.host, settings.port)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write out any usage changes still waiting for the periodic flush."""
+    from app.services.usage_tracker import usage_tracker
+    usage_tracker.flush()
 
 
 @app.get("/")
-async def root(request: Request):
+async def root():
     """Serve the landing page."""
-    return templates.TemplateResponse("landing.html", {"request": request})
+    return static_page("landing")
 
 
 @app.get("/app")
-async def app_page(request: Request):
+async def app_page():
     """Serve the main application dashboard."""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return static_page("app")
 
 
 @app.get("/pricing")
-async def pricing_page(request: Request):
+async def pricing_page():
     """Serve the pricing/upgrade page."""
-    return templates.TemplateResponse("pricing.html", {"request": request})
+    return static_page("pricing")
 
 
 @app.get("/terms")
-async def terms_page(request: Request):
+async def terms_page():
     """Serve the Terms of Service page."""
-    return templates.TemplateResponse("terms.html", {"request": request})
+    return static_page("terms")
 
 
 @app.get("/privacy")
-async def privacy_page(request: Request):
+async def privacy_page():
     """Serve the Privacy Policy page."""
-    return templates.TemplateResponse("privacy.html", {"request": request})
+    return static_page("privacy")
 
 
 @app.get("/success")
-async def success_page(request: Request):
+async def success_page():
     """Serve the payment success page."""
-    return templates.TemplateResponse("success.html", {"request": request})
+    return static_page("success")
 
 
 @app.get("/api/usage/stats")
@@ -113,23 +182,15 @@ async def health_check():
 
 
 @app.get("/sitemap.xml")
-async def sitemap():
+async def sitemap(request: Request):
     """Serve sitemap.xml for SEO."""
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        "static/sitemap.xml",
-        media_type="application/xml"
-    )
+    return _cached_file_response(request, _SITEMAP, _SITEMAP_ETAG, "application/xml")
 
 
 @app.get("/robots.txt")
-async def robots():
+async def robots(request: Request):
     """Serve robots.txt for SEO."""
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        "static/robots.txt",
-        media_type="text/plain"
-    )
+    return _cached_file_response(request, _ROBOTS, _ROBOTS_ETAG, "text/plain")
 
 
 @app.post("/api/cleanup")
@@ -0,0 +1,20 @@
+"""CORS middleware scoped to the JSON API."""
+
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class APICORSMiddleware(CORSMiddleware):
+    """
+    CORSMiddleware that only handles /api routes.
+
+    Pages, static files, sitemap/robots and the health check are served
+    same-origin, so they skip the CORS header processing entirely.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            await self.app(scope, receive, send)
+            return
+
+        await super().__call__(scope, receive, send)
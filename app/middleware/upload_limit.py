@@ -0,0 +1,66 @@
+"""Request body size limit for API uploads."""
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.services.usage_tracker import usage_tracker
+
+
+# Allowance on top of the file size for multipart boundaries, part
+# headers and the small form fields sent alongside the file
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+_BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+
+
+class UploadLimitMiddleware:
+    """
+    Cap API request bodies at the client's tier file size limit.
+
+    Starlette spools the whole multipart body to disk before the endpoint
+    (or its usage dependency) runs, so the limit has to be applied here to
+    stop an oversized upload while it is being received: a declared
+    Content-Length over the limit is rejected before any body is read, and
+    chunked or under-declared bodies are cut off with a 413 as soon as the
+    received bytes pass it.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in _BODY_METHODS
+            or not scope["path"].startswith("/api")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else ""
+        max_file_mb = usage_tracker.max_file_size_mb(client_ip)
+        max_body = max_file_mb * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES
+        detail = f"File exceeds the {max_file_mb}MB upload limit"
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > max_body:
+                    response = JSONResponse({"detail": detail}, status_code=413)
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # Re-raised by FastAPI's body parsing and turned into the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,181 @@
+"""Response helpers for serving generated files."""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterable, Union
+from urllib.parse import quote
+import aiofiles
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.types import Receive, Scope, Send
+
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+# Read size for streaming generated files back to the client
+FILE_STREAM_CHUNK_SIZE = 64 * 1024
+
+# posix_fadvise is only available on POSIX platforms (not Windows)
+_FADV_SEQUENTIAL = getattr(os, "POSIX_FADV_SEQUENTIAL", None)
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    FileResponse that hands the file descriptor to the server when it
+    advertises the ASGI zero-copy send extension, letting the kernel
+    sendfile() the body straight into the socket.
+
+    Falls back to the regular FileResponse behaviour otherwise, and for
+    HEAD and Range requests.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        use_zerocopy = (
+            scope["type"] == "http"
+            and ZEROCOPY_EXTENSION in scope.get("extensions", {})
+            and scope["method"].upper() != "HEAD"
+            and self.status_code == 200
+            and self.stat_result is not None
+            and not any(name == b"range" for name, _ in scope.get("headers", []))
+        )
+
+        if not use_zerocopy:
+            await super().__call__(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+
+        with open(self.path, "rb") as file:
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file,
+                "count": self.stat_result.st_size,
+                "more_body": False
+            })
+
+        if self.background is not None:
+            await self.background()
+
+
+def file_response(path: Path, media_type: str, filename: str) -> ZeroCopyFileResponse:
+    """
+    Build a download response for a file on disk.
+
+    The file is stat'ed once here so the response does not stat it again.
+
+    Args:
+        path: File to send
+        media_type: Content type of the file
+        filename: Download filename shown to the client
+
+    Returns:
+        Response streaming the file
+    """
+    return ZeroCopyFileResponse(
+        path=path,
+        media_type=media_type,
+        filename=filename,
+        stat_result=os.stat(path)
+    )
+
+
+def content_disposition(filename: str) -> str:
+    """Build an attachment Content-Disposition header (RFC 6266 encoded if needed)."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def stream_response(
+    content: Union[Iterable[bytes], AsyncIterable[bytes]],
+    media_type: str,
+    filename: str
+) -> StreamingResponse:
+    """
+    Build a download response from a stream of chunks.
+
+    Args:
+        content: Iterator producing the response body
+        media_type: Content type of the body
+        filename: Download filename shown to the client
+
+    Returns:
+        Streaming download response
+    """
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(filename)}
+    )
+
+
+async def _iter_file(path: Path, chunk_size: int = FILE_STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a file in chunks without blocking the event loop."""
+    async with aiofiles.open(path, "rb") as f:
+        if _FADV_SEQUENTIAL is not None:
+            # Served files are read once front to back: ask for aggressive readahead
+            os.posix_fadvise(f.fileno(), 0, 0, _FADV_SEQUENTIAL)
+        while chunk := await f.read(chunk_size):
+            yield chunk
+
+
+def stream_and_delete(path: Path, media_type: str, filename: str) -> StreamingResponse:
+    """
+    Build a download response for a generated file and delete the file
+    once the response body has been sent.
+
+    Args:
+        path: Generated file to send
+        media_type: Content type of the file
+        filename: Download filename shown to the client
+
+    Returns:
+        Streaming download response
+    """
+    return StreamingResponse(
+        _iter_file(path),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": content_disposition(filename),
+            "Content-Length": str(os.stat(path).st_size)
+        },
+        background=BackgroundTask(path.unlink, missing_ok=True)
+    )
+
+
+async def _iter_spool(spool: BinaryIO, chunk_size: int = FILE_STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read an open file object in chunks, off the event loop once it has spilled to disk."""
+    while chunk := await asyncio.to_thread(spool.read, chunk_size):
+        yield chunk
+
+
+def stream_spool(spool: BinaryIO, media_type: str, filename: str) -> StreamingResponse:
+    """
+    Build a download response from an open (e.g. spooled temporary) file
+    and close it once the response body has been sent.
+
+    Args:
+        spool: File object positioned at the start of the content
+        media_type: Content type of the file
+        filename: Download filename shown to the client
+
+    Returns:
+        Streaming download response
+    """
+    size = spool.seek(0, os.SEEK_END)
+    spool.seek(0)
+    return StreamingResponse(
+        _iter_spool(spool),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": content_disposition(filename),
+            "Content-Length": str(size)
+        },
+        background=BackgroundTask(spool.close)
+    )
@@ -1,26 +1,28 @@
 """AI Image generation and editing API endpoints."""
 
-import uuid
-from pathlib import Path
+import asyncio
+from secrets import token_hex
 from typing import Optional
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, File, UploadFile, Form, Header, HTTPException, Depends
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from app.config import settings
+from app.responses import file_response
 from app.services.ai_image_service import (
-    generate_image,
-    edit_image,
+    generate_image_async,
+    edit_image_async,
     get_style_presets,
     get_action_presets,
     check_api_key_configured,
-    AIImageError
+    AIImageError,
+    MIME_EXTENSIONS
 )
+from app.services.upload_service import safe_filename, save_upload
 from app.middleware.usage_check import require_usage_limit
 
 
 router = APIRouter(prefix="/api/ai-image", tags=["ai-image"])
 
-
 class GenerateRequest(BaseModel):
     """Request model for image generation."""
     prompt: str
@@ -51,14 +53,18 @@ async def get_presets():
     })
 
 
-@router.post("/generate")
-@require_usage_limit(file_size_mb=0)
-async def generate_ai_image(http_request: Request, request: GenerateRequest):
+@router.post("/generate", dependencies=[Depends(require_usage_limit(file_size_mb=0))])
+async def generate_ai_image(
+    request: GenerateRequest,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Generate an image from text prompt.
 
     Args:
         request: Generation parameters (prompt, style, aspect_ratio, size)
+        idempotency_key: Optional Idempotency-Key header; a retry with the
+            same key returns the original image instead of a new one
 
     Returns:
         Generated image file
@@ -75,36 +81,31 @@ async def generate_ai_image(http_request: Request, request: GenerateRequest):
             detail="Prompt must be at least 3 characters long"
         )
 
-    unique_id = str(uuid.uuid4())[:8]
+    unique_id = token_hex(4)
     output_filename = f"generated_{unique_id}.png"
     output_path = settings.output_dir / output_filename
 
     try:
         # Generate image
-        image_bytes, mime_type = generate_image(
+        image_bytes, mime_type = await generate_image_async(
             prompt=request.prompt,
             style=request.style,
             aspect_ratio=request.aspect_ratio,
-            size=request.size
+            size=request.size,
+            idempotency_key=idempotency_key
         )
 
         # Save to file
-        output_path.write_bytes(image_bytes)
+        await asyncio.to_thread(output_path.write_bytes, image_bytes)
 
         # Determine file extension from mime type
-        ext_map = {
-            "image/png": ".png",
-            "image/jpeg": ".jpg",
-            "image/webp": ".webp"
-        }
-        ext = ext_map.get(mime_type, ".png")
+        ext = MIME_EXTENSIONS.get(mime_type, ".png")
 
         # Return image file
-        return FileResponse(
-            path=output_path,
+        return file_response(
+            output_path,
             media_type=mime_type,
-            filename=f"generated{ext}",
-            background=None
+            filename=f"generated{ext}"
         )
 
     except AIImageError as e:
@@ -115,14 +116,13 @@ async def generate_ai_image(http_request: Request, request: GenerateRequest):
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
-@router.post("/edit")
-@require_usage_limit(file_size_mb=25)
+@router.post("/edit", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def edit_ai_image(
-    request: Request,
     file: UploadFile = File(...),
     action: str = Form(...),
     custom_prompt: Optional[str] = Form(None),
-    style: Optional[str] = Form(None)
+    style: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Edit an existing image using AI.
@@ -132,6 +132,8 @@ async def edit_ai_image(
         action: Action preset name
         custom_prompt: Optional custom instructions
         style: Optional style for style-change action
+        idempotency_key: Optional Idempotency-Key header; a retry with the
+            same key returns the original edit instead of a new one
 
     Returns:
         Edited image file
@@ -145,48 +147,43 @@ async def edit_ai_image(
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_input_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = token_hex(4)
+    input_path = settings.upload_dir / f"{unique_id}_input_{safe_filename(file.filename)}"
 
     output_filename = f"{unique_id}_edited.png"
     output_path = settings.output_dir / output_filename
 
     try:
         # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
+        await save_upload(file, input_path, expected_type="image")
 
         # Edit image
-        image_bytes, mime_type = edit_image(
+        image_bytes, mime_type = await edit_image_async(
             image_path=input_path,
             action=action,
             custom_prompt=custom_prompt,
-            style=style
+            style=style,
+            idempotency_key=idempotency_key
         )
 
         # Save edited image
-        output_path.write_bytes(image_bytes)
+        await asyncio.to_thread(output_path.write_bytes, image_bytes)
 
         # Cleanup input
         input_path.unlink(missing_ok=True)
 
-        # Determine file extension
-        ext_map = {
-            "image/png": ".png",
-            "image/jpeg": ".jpg",
-            "image/webp": ".webp"
-        }
-        ext = ext_map.get(mime_type, ".png")
+        # Determine file extension from mime type
+        ext = MIME_EXTENSIONS.get(mime_type, ".png")
 
         # Return edited image
-        return FileResponse(
-            path=output_path,
+        return file_response(
+            output_path,
             media_type=mime_type,
-            filename=f"edited{ext}",
-            background=None
+            filename=f"edited{ext}"
         )
 
+    except HTTPException:
+        raise
     except AIImageError as e:
         input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
@@ -1,42 +1,55 @@
 """Audio extraction API endpoints."""
 
-import uuid
-from pathlib import Path
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
-from app.config import settings
+import asyncio
+import itertools
+from secrets import token_hex
+from typing import Iterator
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
+import orjson
+from fastapi.responses import JSONResponse, Response
+from app.responses import stream_response
 from app.services.audio_service import (
-    extract_audio,
+    extract_audio_stream,
     get_video_info,
     get_supported_formats,
     validate_video_file,
     check_ffmpeg_installed,
     check_ffprobe_installed
 )
+from app.services.upload_service import prep_upload_paths, save_upload
 from app.middleware.usage_check import require_usage_limit
 
 
 router = APIRouter(prefix="/api/audio", tags=["audio"])
 
+# Supported formats never change at runtime
+_SUPPORTED = get_supported_formats()
+_AUDIO_FORMATS = frozenset(_SUPPORTED["audio_outputs"])
+_BITRATES = frozenset(_SUPPORTED["bitrate_options"])
+
+# Pre-encoded /check-ffmpeg bodies, keyed by the cached (ffmpeg, ffprobe) checks.
+# Responses carry per-request state, so only the bytes are shared
+_FFMPEG_CHECK_BODIES = {
+    (ffmpeg, ffprobe): orjson.dumps({"ffmpeg_installed": ffmpeg, "ffprobe_installed": ffprobe})
+    for ffmpeg, ffprobe in itertools.product((True, False), repeat=2)
+}
+
 
 @router.get("/formats")
 async def list_supported_formats():
     """Get list of supported video inputs and audio outputs."""
-    return get_supported_formats()
+    return _SUPPORTED
 
 
 @router.get("/check-ffmpeg")
 async def check_ffmpeg_availability():
     """Check if FFmpeg and FFprobe are installed."""
-    return JSONResponse({
-        "ffmpeg_installed": check_ffmpeg_installed(),
-        "ffprobe_installed": check_ffprobe_installed()
-    })
+    body = _FFMPEG_CHECK_BODIES[check_ffmpeg_installed(), check_ffprobe_installed()]
+    return Response(content=body, media_type="application/json")
 
 
-@router.post("/info")
-@require_usage_limit(file_size_mb=25)
-async def get_video_information(request: Request, file: UploadFile = File(...)):
+@router.post("/info", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def get_video_information(file: UploadFile = File(...)):
     """
     Get information about a video file.
 
@@ -52,14 +65,12 @@ async def get_video_information(request: Request, file: UploadFile = File(...)):
             detail="FFprobe is not installed. Please install FFmpeg to use this feature."
         )
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = token_hex(4)
+    input_path, _, stem = prep_upload_paths(file, unique_id)
 
     try:
         # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
+        await save_upload(file, input_path, expected_type="video")
 
         # Validate video
         if not validate_video_file(input_path):
@@ -95,10 +106,8 @@ async def get_video_information(request: Request, file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Failed to read video: {str(e)}")
 
 
-@router.post("/extract")
-@require_usage_limit(file_size_mb=25)
+@router.post("/extract", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def extract_audio_from_video(
-    request: Request,
     file: UploadFile = File(...),
     format: str = Form(...),
     bitrate: int = Form(192)
@@ -121,50 +130,51 @@ async def extract_audio_from_video(
         )
 
     # Validate format
-    supported = get_supported_formats()
     format = format.lower()
 
-    if format not in supported["audio_outputs"]:
+    if format not in _AUDIO_FORMATS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported format: {format}. Supported: {', '.join(supported['audio_outputs'])}"
+            detail=f"Unsupported format: {format}. Supported: {', '.join(_SUPPORTED['audio_outputs'])}"
         )
 
     # Validate bitrate
-    if bitrate not in supported["bitrate_options"]:
+    if bitrate not in _BITRATES:
         bitrate = 192  # Default
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = token_hex(4)
+    input_path, _, stem = prep_upload_paths(file, unique_id)
 
     try:
         # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
+        await save_upload(file, input_path, expected_type="video")
 
         # Validate video
         if not validate_video_file(input_path):
             input_path.unlink(missing_ok=True)
             raise HTTPException(status_code=400, detail="Invalid video file")
 
-        # Extract audio
-        output_path = extract_audio(
+        # Extract audio, streaming FFmpeg's output straight to the client
+        first_chunk, remaining_chunks = await asyncio.to_thread(
+            extract_audio_stream,
             input_path,
             format,
-            bitrate,
-            settings.output_dir
+            bitrate
         )
 
-        # Cleanup input
-        input_path.unlink(missing_ok=True)
-
-        # Return audio file
-        return FileResponse(
-            path=output_path,
+        def body() -> Iterator[bytes]:
+            try:
+                yield first_chunk
+                yield from remaining_chunks
+            finally:
+                # Input is only needed until FFmpeg has finished reading it
+                remaining_chunks.close()
+                input_path.unlink(missing_ok=True)
+
+        return stream_response(
+            body(),
             media_type=f"audio/{format}",
-            filename=f"{Path(file.filename).stem}.{format}",
-            background=None
+            filename=f"{stem}.{format}"
         )
 
     except HTTPException:
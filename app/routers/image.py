@@ -1,34 +1,44 @@
 """Image conversion API endpoints."""
 
-import uuid
-from pathlib import Path
+import asyncio
+import logging
+import os
+from secrets import token_hex
 from typing import List
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
+from fastapi.responses import JSONResponse
 from app.config import settings
+from app.responses import file_response, stream_response
 from app.services.image_service import (
     convert_image,
+    open_validated,
     get_supported_formats,
     validate_image_file,
     convert_multiple_images,
-    create_zip_archive
+    iter_zip_archive
 )
+from app.services.cleanup_service import list_dir_names, unlink_paths
+from app.services.upload_service import prep_upload_paths, save_upload, upload_limit
 from app.middleware.usage_check import require_usage_limit
 
 
 router = APIRouter(prefix="/api/image", tags=["image"])
 
+logger = logging.getLogger(__name__)
+
+# Supported formats never change at runtime
+_SUPPORTED = get_supported_formats()
+_OUTPUT_FORMATS = frozenset(_SUPPORTED["output"])
+
 
 @router.get("/formats")
 async def list_supported_formats():
     """Get list of supported input and output formats."""
-    return get_supported_formats()
+    return _SUPPORTED
 
 
-@router.post("/convert")
-@require_usage_limit(file_size_mb=25)  # Enforce free tier limits
+@router.post("/convert", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def convert_single_image(
-    request: Request,
     file: UploadFile = File(...),
     format: str = Form(...),
     quality: int = Form(85)
@@ -45,42 +55,37 @@ async def convert_single_image(
         Converted image file
     """
     # Validate format
-    supported = get_supported_formats()
     format = format.lower().replace("jpeg", "jpg")
 
-    if format not in supported["output"]:
+    if format not in _OUTPUT_FORMATS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported format: {format}. Supported: {', '.join(supported['output'])}"
+            detail=f"Unsupported format: {format}. Supported: {', '.join(_SUPPORTED['output'])}"
         )
 
     # Generate unique filename
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = token_hex(4)
+    input_path, _, stem = prep_upload_paths(file, unique_id)
 
     try:
         # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
+        await save_upload(file, input_path, expected_type="image")
 
-        # Validate image
-        if not validate_image_file(input_path):
+        # Validate image (opened and decoded once, then reused for the conversion)
+        try:
+            image = open_validated(input_path)
+        except ValueError as e:
             input_path.unlink(missing_ok=True)
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid or unsupported image file"
-            )
+            raise HTTPException(status_code=400, detail=str(e))
 
         # Convert image
-        output_path = convert_image(input_path, format, quality)
+        output_path = convert_image(input_path, format, quality, skip_if_same=True, image=image)
 
         # Return converted file
-        return FileResponse(
-            path=output_path,
+        return file_response(
+            output_path,
             media_type=f"image/{format}",
-            filename=f"{Path(file.filename).stem}.{format}",
-            background=None  # Will handle cleanup after response
+            filename=f"{stem}.{format}"
         )
 
     except HTTPException:
@@ -109,34 +114,42 @@ async def convert_multiple_images_endpoint(
         ZIP file containing all converted images
     """
     # Validate format
-    supported = get_supported_formats()
     format = format.lower().replace("jpeg", "jpg")
 
-    if format not in supported["output"]:
+    if format not in _OUTPUT_FORMATS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported format: {format}. Supported: {', '.join(supported['output'])}"
+            detail=f"Unsupported format: {format}. Supported: {', '.join(_SUPPORTED['output'])}"
         )
 
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    unique_id = str(uuid.uuid4())[:8]
+    unique_id = token_hex(4)
     input_paths = []
     output_paths = []
 
+    # The upload limit applies to the whole batch, not to each file
+    remaining_bytes = upload_limit()
+
     try:
         # Save all uploaded files
         for file in files:
-            input_filename = f"{unique_id}_{file.filename}"
-            input_path = settings.upload_dir / input_filename
-
-            content = await file.read()
-            input_path.write_bytes(content)
+            input_path, _, _ = prep_upload_paths(file, unique_id)
+
+            try:
+                remaining_bytes -= await save_upload(
+                    file, input_path, max_bytes=remaining_bytes, expected_type="image"
+                )
+            except HTTPException as e:
+                if e.status_code != 400:
+                    raise
+                logger.info("Skipping invalid image: %s", file.filename)
+                continue
 
             # Validate image
             if not validate_image_file(input_path):
-                print(f"Skipping invalid image: {file.filename}")
+                logger.info("Skipping invalid image: %s", file.filename)
                 input_path.unlink(missing_ok=True)
                 continue
 
@@ -146,7 +159,9 @@ async def convert_multiple_images_endpoint(
             raise HTTPException(status_code=400, detail="No valid images provided")
 
         # Convert all images
-        results = convert_multiple_images(input_paths, format, quality)
+        results = await asyncio.to_thread(
+            convert_multiple_images, input_paths, format, quality, skip_if_same=True
+        )
 
         if not results:
             raise HTTPException(status_code=500, detail="Failed to convert any images")
@@ -154,17 +169,11 @@ async def convert_multiple_images_endpoint(
         # Collect output paths
         output_paths = [output_path for _, output_path in results]
 
-        # Create ZIP archive
-        zip_filename = f"converted_images_{unique_id}.zip"
-        zip_path = settings.output_dir / zip_filename
-        create_zip_archive(output_paths, zip_path)
-
-        # Return ZIP file
-        return FileResponse(
-            path=zip_path,
+        # Stream the ZIP archive as it is built
+        return stream_response(
+            iter_zip_archive(output_paths),
             media_type="application/zip",
-            filename="converted_images.zip",
-            background=None
+            filename="converted_images.zip"
         )
 
     except HTTPException:
@@ -184,15 +193,17 @@ async def cleanup_temp_files():
     This is a manual cleanup endpoint.
     """
     try:
-        upload_files = list(settings.upload_dir.glob("*"))
-        output_files = list(settings.output_dir.glob("*"))
-
         # Remove all files except .gitkeep
-        deleted_count = 0
-        for file_path in upload_files + output_files:
-            if file_path.name != ".gitkeep" and file_path.is_file():
-                file_path.unlink()
-                deleted_count += 1
+        files = []
+        for directory in (settings.upload_dir, settings.output_dir):
+            root = os.fsencode(directory)
+            files.extend(
+                os.path.join(root, name)
+                for name in list_dir_names(directory)
+                if name != b".gitkeep"
+            )
+
+        deleted_count = unlink_paths(files)
 
         return JSONResponse({
             "status": "success",
@@ -1,24 +1,32 @@
 """Stripe payment integration for Pro subscriptions."""
 
+import logging
 import os
 import stripe
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse, RedirectResponse
 from dotenv import load_dotenv
+from app.templating import templates
 
 load_dotenv()
 
 router = APIRouter(prefix="/api/payment", tags=["payment"])
 
+logger = logging.getLogger(__name__)
+
+# Checkout redirect URLs (Stripe fills in {CHECKOUT_SESSION_ID})
+SUCCESS_URL_TEMPLATE = "{base}success?session_id={{CHECKOUT_SESSION_ID}}"
+CANCEL_URL_TEMPLATE = "{base}pricing"
+
 # Initialize Stripe (API key from environment variable)
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PRICE_ID = os.getenv("STRIPE_PRICE_ID")
 
 # Validate Stripe configuration
 if not stripe.api_key:
-    print("[WARNING] STRIPE_SECRET_KEY not set in environment variables")
+    logger.warning("[WARNING] STRIPE_SECRET_KEY not set in environment variables")
 if not STRIPE_PRICE_ID:
-    print("[WARNING] STRIPE_PRICE_ID not set in environment variables")
+    logger.warning("[WARNING] STRIPE_PRICE_ID not set in environment variables")
 
 
 @router.post("/create-checkout")
@@ -28,9 +36,11 @@ async def create_checkout_session(request: Request):
         # Get client IP for tracking
         client_ip = request.client.host
 
-        print(f"[DEBUG] Creating checkout for IP: {client_ip}")
-        print(f"[DEBUG] Stripe API Key: {stripe.api_key[:20]}...")
-        print(f"[DEBUG] Price ID: {STRIPE_PRICE_ID}")
+        base_url = str(request.base_url)
+
+        logger.debug("Creating checkout for IP: %s", client_ip)
+        logger.debug("Stripe API key configured: %s", bool(stripe.api_key))
+        logger.debug("Price ID: %s", STRIPE_PRICE_ID)
 
         # Create Stripe Checkout Session
         checkout_session = stripe.checkout.Session.create(
@@ -40,8 +50,8 @@ async def create_checkout_session(request: Request):
                 'quantity': 1,
             }],
             mode='subscription',  # Monthly recurring subscription
-            success_url=f'{request.base_url}success?session_id={{CHECKOUT_SESSION_ID}}',
-            cancel_url=f'{request.base_url}pricing',
+            success_url=SUCCESS_URL_TEMPLATE.format(base=base_url),
+            cancel_url=CANCEL_URL_TEMPLATE.format(base=base_url),
             client_reference_id=client_ip,  # Store IP for webhook
             metadata={
                 'client_ip': client_ip
@@ -54,9 +64,7 @@ async def create_checkout_session(request: Request):
         })
 
     except Exception as e:
-        print(f"[ERROR] Stripe checkout failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[ERROR] Stripe checkout failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -96,7 +104,7 @@ async def stripe_webhook(request: Request):
             from app.services.usage_tracker import usage_tracker
             usage_tracker.set_pro_status(client_ip, True)
 
-            print(f"✓ User {client_ip} upgraded to Pro!")
+            logger.info("✓ User %s upgraded to Pro!", client_ip)
 
     elif event['type'] == 'customer.subscription.deleted':
         # Handle subscription cancellation
@@ -105,7 +113,7 @@ async def stripe_webhook(request: Request):
 
         # TODO: Remove Pro status when canceled
         # Would need to store customer_id -> IP mapping in database
-        print(f"⚠️ Subscription canceled for customer {customer_id}")
+        logger.info("⚠️ Subscription canceled for customer %s", customer_id)
 
     return JSONResponse({"status": "success"})
 
@@ -113,16 +121,11 @@ async def stripe_webhook(request: Request):
 @router.get("/success")
 async def payment_success(request: Request, session_id: str = None):
     """Payment success page."""
-    from fastapi.templating import Jinja2Templates
-
-    templates = Jinja2Templates(directory="templates")
-
     # Set Pro status for this IP
     client_ip = request.client.host
     from app.services.usage_tracker import usage_tracker
     usage_tracker.set_pro_status(client_ip, True)
 
-    return templates.TemplateResponse("success.html", {
-        "request": request,
+    return templates.TemplateResponse(request, "success.html", {
         "session_id": session_id
     })
@@ -1,27 +1,42 @@
 """PDF manipulation API endpoints."""
 
-import uuid
+import asyncio
+import logging
 from pathlib import Path
-from typing import List
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
+from typing import List, Optional
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
+from fastapi.responses import JSONResponse
 from app.config import settings
+from app.executors import PDF_POOL, run_in_pool
+from app.responses import stream_and_delete, stream_spool
 from app.services.pdf_service import (
-    merge_pdfs,
+    merge_pdfs_to_stream,
     split_pdf_all,
     split_pdf_range,
-    get_pdf_info,
+    inspect_pdf,
     validate_pdf_file
 )
+from app.services.cleanup_service import unlink_paths
+from app.services.upload_service import (
+    new_upload_id,
+    prep_upload_paths,
+    safe_filename,
+    save_upload,
+    staged_upload
+)
 from app.middleware.usage_check import require_usage_limit
 
 
 router = APIRouter(prefix="/api/pdf", tags=["pdf"])
 
+logger = logging.getLogger(__name__)
+
+# Maximum number of merge inputs saved/validated at the same time
+MERGE_INGEST_CONCURRENCY = 8
 
-@router.post("/info")
-@require_usage_limit(file_size_mb=25)
-async def get_pdf_information(request: Request, file: UploadFile = File(...)):
+
+@router.post("/info", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def get_pdf_information(file: UploadFile = File(...)):
     """
     Get information about a PDF file.
 
@@ -31,38 +46,60 @@ async def get_pdf_information(request: Request, file: UploadFile = File(...)):
     Returns:
         JSON with page count and metadata
     """
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = new_upload_id()
+    input_path, _, _ = prep_upload_paths(file, unique_id)
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
+        async with staged_upload(file, input_path, expected_type="pdf"):
+            # Validate and read info in one parse
+            is_valid, info = await run_in_pool(PDF_POOL, inspect_pdf, input_path)
 
-        # Validate PDF
-        if not validate_pdf_file(input_path):
-            input_path.unlink(missing_ok=True)
+        if not is_valid:
             raise HTTPException(status_code=400, detail="Invalid PDF file")
 
-        # Get info
-        info = get_pdf_info(input_path)
-
-        # Cleanup
-        input_path.unlink(missing_ok=True)
-
         return JSONResponse(info)
 
     except HTTPException:
         raise
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Failed to read PDF: {str(e)}")
 
 
-@router.post("/merge")
-@require_usage_limit(file_size_mb=25)
-async def merge_pdf_files(request: Request, files: List[UploadFile] = File(...)):
+async def _ingest_pdf(
+    file: UploadFile,
+    input_path: Path,
+    semaphore: asyncio.Semaphore
+) -> Optional[Path]:
+    """
+    Save one uploaded PDF and validate it.
+
+    Args:
+        file: Uploaded PDF file
+        input_path: Where to save the upload
+        semaphore: Limits how many files are ingested at once
+
+    Returns:
+        Saved path, or None if the file isn't a valid PDF
+    """
+    async with semaphore:
+        try:
+            await save_upload(file, input_path, expected_type="pdf")
+        except HTTPException as e:
+            if e.status_code != 400:
+                raise
+            logger.info("Skipping invalid PDF: %s", file.filename)
+            return None
+
+        if not await asyncio.to_thread(validate_pdf_file, input_path):
+            logger.info("Skipping invalid PDF: %s", file.filename)
+            input_path.unlink(missing_ok=True)
+            return None
+
+        return input_path
+
+
+@router.post("/merge", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def merge_pdf_files(files: List[UploadFile] = File(...)):
     """
     Merge multiple PDF files into one.
 
@@ -78,25 +115,24 @@ async def merge_pdf_files(request: Request, files: List[UploadFile] = File(...))
             detail="At least 2 PDF files required for merging"
         )
 
-    unique_id = str(uuid.uuid4())[:8]
+    unique_id = new_upload_id()
     input_paths = []
 
     try:
-        # Save all uploaded files
-        for file in files:
-            input_filename = f"{unique_id}_{file.filename}"
-            input_path = settings.upload_dir / input_filename
-
-            content = await file.read()
-            input_path.write_bytes(content)
-
-            # Validate PDF
-            if not validate_pdf_file(input_path):
-                print(f"Skipping invalid PDF: {file.filename}")
-                input_path.unlink(missing_ok=True)
-                continue
+        # Save and validate all uploaded files concurrently (order is preserved)
+        semaphore = asyncio.Semaphore(MERGE_INGEST_CONCURRENCY)
+        results = await asyncio.gather(
+            *[
+                _ingest_pdf(file, settings.upload_dir / f"{unique_id}_{index}_{safe_filename(file.filename)}", semaphore)
+                for index, file in enumerate(files)
+            ],
+            return_exceptions=True
+        )
 
-            input_paths.append(input_path)
+        input_paths = [result for result in results if isinstance(result, Path)]
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
 
         if len(input_paths) < 2:
             raise HTTPException(
@@ -104,18 +140,15 @@ async def merge_pdf_files(request: Request, files: List[UploadFile] = File(...))
                 detail="At least 2 valid PDF files required"
             )
 
-        # Merge PDFs
-        output_filename = f"merged_{unique_id}.pdf"
-        output_path = settings.output_dir / output_filename
-
-        merge_pdfs(input_paths, output_path)
+        # Merge PDFs into a spooled file (memory first, disk only when large).
+        # Runs in a thread: an open spool cannot be returned from the process pool.
+        spool = await asyncio.to_thread(merge_pdfs_to_stream, input_paths)
 
         # Return merged file
-        return FileResponse(
-            path=output_path,
+        return stream_spool(
+            spool,
             media_type="application/pdf",
-            filename="merged.pdf",
-            background=None
+            filename="merged.pdf"
         )
 
     except HTTPException:
@@ -123,15 +156,12 @@ async def merge_pdf_files(request: Request, files: List[UploadFile] = File(...))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Merge failed: {str(e)}")
     finally:
-        # Cleanup input files
-        for path in input_paths:
-            path.unlink(missing_ok=True)
+        # Cleanup input files in one executor hop
+        await asyncio.to_thread(unlink_paths, input_paths)
 
 
-@router.post("/split")
-@require_usage_limit(file_size_mb=25)
+@router.post("/split", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def split_pdf_file(
-    request: Request,
     file: UploadFile = File(...),
     mode: str = Form(...),
     pages: str = Form(None)
@@ -145,7 +175,7 @@ async def split_pdf_file(
         pages: Page range for "range" mode (e.g., "1-5,10,15-20")
 
     Returns:
-        ZIP file with extracted pages
+        ZIP file with extracted pages, or a PDF for a single page or contiguous range
     """
     if mode not in ["all", "range"]:
         raise HTTPException(
@@ -159,57 +189,50 @@ async def split_pdf_file(
             detail="Page range required for 'range' mode"
         )
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = new_upload_id()
+    input_path, _, stem = prep_upload_paths(file, unique_id)
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
-
-        # Validate PDF
-        if not validate_pdf_file(input_path):
-            input_path.unlink(missing_ok=True)
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
-
-        # Split based on mode
-        if mode == "all":
-            output_path, page_count = split_pdf_all(input_path, settings.output_dir)
-            download_filename = f"{Path(file.filename).stem}_split.zip"
-
-        else:  # mode == "range"
-            output_path, page_count = split_pdf_range(
-                input_path,
-                pages,
-                settings.output_dir
-            )
-
-            # Determine filename and media type
-            if output_path.suffix == '.zip':
-                download_filename = f"{Path(file.filename).stem}_pages.zip"
-            else:
-                download_filename = output_path.name
-
-        # Cleanup input
-        input_path.unlink(missing_ok=True)
+        # No separate validation pass: the split parses the PDF anyway and
+        # reports unreadable files as a ValueError (400)
+        async with staged_upload(file, input_path, expected_type="pdf"):
+            # Split based on mode
+            if mode == "all":
+                # Page blocks fan out to the PDF pool; this thread only
+                # waits on them and builds the ZIP
+                output_path, page_count = await asyncio.to_thread(
+                    split_pdf_all, input_path, settings.output_dir, PDF_POOL
+                )
+                download_filename = f"{stem}_split.zip"
+
+            else:  # mode == "range"
+                output_path, page_count = await run_in_pool(
+                    PDF_POOL,
+                    split_pdf_range,
+                    input_path,
+                    pages,
+                    settings.output_dir
+                )
+
+                # Determine filename and media type
+                if output_path.suffix == '.zip':
+                    download_filename = f"{stem}_pages.zip"
+                else:
+                    download_filename = output_path.name
 
         # Determine media type
         media_type = "application/zip" if output_path.suffix == '.zip' else "application/pdf"
 
         # Return result
-        return FileResponse(
-            path=output_path,
+        return stream_and_delete(
+            output_path,
             media_type=media_type,
-            filename=download_filename,
-            background=None
+            filename=download_filename
         )
 
     except HTTPException:
         raise
     except ValueError as e:
-        input_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Split failed: {str(e)}")
@@ -1,12 +1,15 @@
 """Video processing API endpoints."""
 
-import uuid
+import asyncio
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Body, Request
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
+from typing import Awaitable, Optional
+import orjson
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from app.config import settings
+from app.executors import FFMPEG_POOL, run_in_pool
+from app.responses import stream_and_delete
 from app.services.video_service import (
     split_video,
     get_video_info,
@@ -19,32 +22,90 @@ from app.services.video_service import (
     compress_target_size,
     compress_quality,
     compress_resolution,
-    estimate_output_size
+    estimate_output_size,
+    estimate_output_size_batch
 )
+from app.services.cleanup_service import unlink_paths
+from app.services.upload_service import new_upload_id, prep_upload_paths, staged_upload
 from app.middleware.usage_check import require_usage_limit
 
 
 router = APIRouter(prefix="/api/video", tags=["video"])
 
+# How often a running compression checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 1.0
 
-class LocalVideoRequest(BaseModel):
-    """Request model for local video operations."""
+# Most settings accepted by one /compress/estimate-batch call
+MAX_BATCH_ESTIMATES = 50
+
+# Pre-encoded /check-ffmpeg bodies, keyed by the cached availability check.
+# Responses carry per-request state, so only the bytes are shared
+_FFMPEG_CHECK_BODIES = {
+    True: b'{"ffmpeg_installed":true}',
+    False: b'{"ffmpeg_installed":false}'
+}
+
+
+@dataclass(slots=True)
+class LocalVideoRequest:
+    """Request body for local video operations."""
     path: str
     parts: Optional[int] = None
     output_dir: Optional[str] = None
 
 
+def _invalid_body(message: str) -> HTTPException:
+    """Build the 422 raised for a malformed local video request body."""
+    return HTTPException(status_code=422, detail=f"Invalid request body: {message}")
+
+
+async def parse_local_request(request: Request) -> LocalVideoRequest:
+    """
+    Parse and validate a local video request body.
+
+    Three plain fields don't need a Pydantic model: the JSON is decoded
+    with orjson and checked by hand.
+
+    Args:
+        request: Incoming request with a JSON body
+
+    Returns:
+        Parsed request
+
+    Raises:
+        HTTPException: 422 if the body is not valid JSON or has wrong field types
+    """
+    try:
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise _invalid_body("expected JSON")
+
+    if not isinstance(data, dict):
+        raise _invalid_body("expected a JSON object")
+
+    path = data.get("path")
+    parts = data.get("parts")
+    output_dir = data.get("output_dir")
+
+    if not isinstance(path, str):
+        raise _invalid_body("'path' must be a string")
+    if parts is not None and (not isinstance(parts, int) or isinstance(parts, bool)):
+        raise _invalid_body("'parts' must be an integer")
+    if output_dir is not None and not isinstance(output_dir, str):
+        raise _invalid_body("'output_dir' must be a string")
+
+    return LocalVideoRequest(path, parts, output_dir)
+
+
 @router.get("/check-ffmpeg")
 async def check_ffmpeg_availability():
     """Check if FFmpeg is installed."""
-    return JSONResponse({
-        "ffmpeg_installed": check_ffmpeg_installed()
-    })
+    body = _FFMPEG_CHECK_BODIES[check_ffmpeg_installed()]
+    return Response(content=body, media_type="application/json")
 
 
-@router.post("/info")
-@require_usage_limit(file_size_mb=25)
-async def get_video_information(request: Request, file: UploadFile = File(...)):
+@router.post("/info", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def get_video_information(file: UploadFile = File(...)):
     """
     Get information about an uploaded video file.
 
@@ -60,31 +121,23 @@ async def get_video_information(request: Request, file: UploadFile = File(...)):
             detail="FFmpeg is not installed"
         )
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = new_upload_id()
+    input_path, _, _ = prep_upload_paths(file, unique_id)
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
-
-        # Get info
-        info = get_video_info(input_path)
-
-        # Cleanup
-        input_path.unlink(missing_ok=True)
+        async with staged_upload(file, input_path, expected_type="video"):
+            info = await run_in_pool(FFMPEG_POOL, get_video_info, input_path)
 
         return JSONResponse(info)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/info-local")
-@require_usage_limit(file_size_mb=25)
-async def get_local_video_info(request: Request, local_request: LocalVideoRequest = Body(...)):
+@router.post("/info-local", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def get_local_video_info(local_request: LocalVideoRequest = Depends(parse_local_request)):
     """
     Get information about a video file from local path.
 
@@ -101,15 +154,15 @@ async def get_local_video_info(request: Request, local_request: LocalVideoReques
         )
 
     try:
-        video_path = Path(request.path)
+        video_path = Path(local_request.path)
 
         if not video_path.exists():
             raise HTTPException(status_code=404, detail="File not found")
 
-        if not validate_video_file(video_path):
+        if not await run_in_pool(FFMPEG_POOL, validate_video_file, video_path):
             raise HTTPException(status_code=400, detail="Invalid video file")
 
-        info = get_video_info(video_path)
+        info = await run_in_pool(FFMPEG_POOL, get_video_info, video_path)
         return JSONResponse(info)
 
     except HTTPException:
@@ -118,10 +171,8 @@ async def get_local_video_info(request: Request, local_request: LocalVideoReques
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/split-preview")
-@require_usage_limit(file_size_mb=25)
+@router.post("/split-preview", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def preview_split_times(
-    request: Request,
     file: Optional[UploadFile] = File(None),
     parts: int = Form(...)
 ):
@@ -141,26 +192,20 @@ async def preview_split_times(
     if parts < 2 or parts > 20:
         raise HTTPException(status_code=400, detail="Parts must be between 2 and 20")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_path = None
-
-    try:
-        if file:
-            input_filename = f"{unique_id}_{file.filename}"
-            input_path = settings.upload_dir / input_filename
+    if not file:
+        raise HTTPException(status_code=400, detail="No video file provided")
 
-            content = await file.read()
-            input_path.write_bytes(content)
+    unique_id = new_upload_id()
+    input_path, _, _ = prep_upload_paths(file, unique_id)
 
-            duration = get_video_duration(input_path)
-        else:
-            raise HTTPException(status_code=400, detail="No video file provided")
+    try:
+        async with staged_upload(file, input_path, expected_type="video"):
+            duration = await run_in_pool(FFMPEG_POOL, get_video_duration, input_path)
 
         split_times = calculate_split_times(duration, parts)
 
-        preview = []
-        for i, (start, end) in enumerate(split_times, 1):
-            preview.append({
+        preview = [
+            {
                 "part": i,
                 "start": start,
                 "end": end,
@@ -168,9 +213,11 @@ async def preview_split_times(
                 "end_formatted": format_duration(end),
                 "duration": end - start,
                 "duration_formatted": format_duration(end - start)
-            })
+            }
+            for i, (start, end) in enumerate(split_times, 1)
+        ]
 
-        return JSONResponse({
+        return ORJSONResponse({
             "total_duration": duration,
             "total_duration_formatted": format_duration(duration),
             "num_parts": parts,
@@ -181,15 +228,10 @@ async def preview_split_times(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if input_path:
-            input_path.unlink(missing_ok=True)
 
 
-@router.post("/split")
-@require_usage_limit(file_size_mb=25)
+@router.post("/split", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def split_uploaded_video(
-    request: Request,
     file: UploadFile = File(...),
     parts: int = Form(...)
 ):
@@ -209,51 +251,38 @@ async def split_uploaded_video(
     if parts < 2 or parts > 20:
         raise HTTPException(status_code=400, detail="Parts must be between 2 and 20")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = new_upload_id()
+    input_path, _, stem = prep_upload_paths(file, unique_id)
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
-
-        # Validate
-        if not validate_video_file(input_path):
-            input_path.unlink(missing_ok=True)
-            raise HTTPException(status_code=400, detail="Invalid video file")
-
-        # Split video
-        output_paths = split_video(input_path, parts, settings.output_dir)
+        async with staged_upload(
+            file, input_path, validate_video_file, "video", invalid_detail="Invalid video file"
+        ):
+            output_paths = await split_video(input_path, parts, settings.output_dir)
 
         # Create ZIP
-        zip_filename = f"{Path(file.filename).stem}_split.zip"
-        zip_path = settings.output_dir / zip_filename
-        create_video_zip(output_paths, zip_path)
+        zip_filename = f"{stem}_split.zip"
+        zip_path = settings.output_dir / f"{unique_id}_{zip_filename}"
+        await run_in_pool(FFMPEG_POOL, create_video_zip, output_paths, zip_path)
 
-        # Cleanup input and individual parts
-        input_path.unlink(missing_ok=True)
-        for path in output_paths:
-            path.unlink(missing_ok=True)
+        # Cleanup individual parts in one executor hop
+        await asyncio.to_thread(unlink_paths, output_paths)
 
         # Return ZIP
-        return FileResponse(
-            path=zip_path,
+        return stream_and_delete(
+            zip_path,
             media_type="application/zip",
-            filename=zip_filename,
-            background=None
+            filename=zip_filename
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Split failed: {str(e)}")
 
 
-@router.post("/split-local")
-@require_usage_limit(file_size_mb=25)
-async def split_local_video(request: Request, local_request: LocalVideoRequest = Body(...)):
+@router.post("/split-local", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def split_local_video(local_request: LocalVideoRequest = Depends(parse_local_request)):
     """
     Split a video from local file path.
 
@@ -275,7 +304,7 @@ async def split_local_video(request: Request, local_request: LocalVideoRequest =
         if not video_path.exists():
             raise HTTPException(status_code=404, detail="File not found")
 
-        if not validate_video_file(video_path):
+        if not await run_in_pool(FFMPEG_POOL, validate_video_file, video_path):
             raise HTTPException(status_code=400, detail="Invalid video file")
 
         # Determine output directory
@@ -286,7 +315,7 @@ async def split_local_video(request: Request, local_request: LocalVideoRequest =
             output_dir = settings.output_dir
 
         # Split video
-        output_paths = split_video(video_path, local_request.parts, output_dir)
+        output_paths = await split_video(video_path, local_request.parts, output_dir)
 
         return JSONResponse({
             "status": "success",
@@ -304,19 +333,53 @@ async def split_local_video(request: Request, local_request: LocalVideoRequest =
 # VIDEO COMPRESSION ENDPOINTS
 # ============================================================================
 
-@router.post("/compress/target-size")
-@require_usage_limit(file_size_mb=25)
+async def _run_until_disconnect(request: Request, compression: Awaitable, output_path: Path):
+    """
+    Run a compression, cancelling it if the client disconnects.
+
+    Cancelling stops FFmpeg's process group, so an abandoned upload doesn't
+    keep encoding for up to an hour.
+
+    Args:
+        request: The request being served
+        compression: Compression coroutine
+        output_path: Output file, deleted if the compression is abandoned
+
+    Raises:
+        HTTPException: 499 if the client disconnected
+    """
+    task = asyncio.ensure_future(compression)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                output_path.unlink(missing_ok=True)
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        # The endpoint itself was cancelled
+        if not task.done():
+            task.cancel()
+
+
+@router.post("/compress/target-size", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def compress_video_target_size(
     request: Request,
     file: UploadFile = File(...),
-    target_size_mb: float = Form(...)
+    target_size_mb: float = Form(...),
+    strict_size: bool = Form(False)
 ):
     """
-    Compress video to target file size using two-pass encoding.
+    Compress video to target file size.
 
     Args:
         file: Video file to compress
         target_size_mb: Target output size in MB
+        strict_size: Use two-pass encoding to hit the size precisely
+            (slower; by default the size is a cap)
 
     Returns:
         Compressed video file
@@ -327,49 +390,40 @@ async def compress_video_target_size(
     if target_size_mb <= 0:
         raise HTTPException(status_code=400, detail="Target size must be positive")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
-
-    output_filename = f"{unique_id}_compressed_{file.filename}"
-    output_path = settings.output_dir / output_filename
+    unique_id = new_upload_id()
+    input_path, filename, _ = prep_upload_paths(file, unique_id)
+    output_path = settings.output_dir / f"{unique_id}_compressed_{filename}"
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
-
-        # Validate
-        if not validate_video_file(input_path):
-            input_path.unlink(missing_ok=True)
-            raise HTTPException(status_code=400, detail="Invalid video file")
-
-        # Compress
-        compress_target_size(input_path, target_size_mb, output_path)
-
-        # Cleanup input
-        input_path.unlink(missing_ok=True)
+        async with staged_upload(
+            file, input_path, validate_video_file, "video", invalid_detail="Invalid video file"
+        ):
+            await _run_until_disconnect(
+                request,
+                compress_target_size(
+                    input_path, target_size_mb, output_path, strict_size=strict_size
+                ),
+                output_path
+            )
 
         # Return compressed video
-        return FileResponse(
-            path=output_path,
+        return stream_and_delete(
+            output_path,
             media_type="video/mp4",
-            filename=f"compressed_{file.filename}",
-            background=None
+            filename=f"compressed_{filename}"
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
-        input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
 
 
-@router.post("/compress/quality")
-@require_usage_limit(file_size_mb=25)
+@router.post("/compress/quality", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def compress_video_quality(
     request: Request,
     file: UploadFile = File(...),
@@ -391,49 +445,36 @@ async def compress_video_quality(
     if preset.lower() not in ["low", "medium", "high"]:
         raise HTTPException(status_code=400, detail="Invalid preset. Use low/medium/high")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
-
-    output_filename = f"{unique_id}_compressed_{file.filename}"
-    output_path = settings.output_dir / output_filename
+    unique_id = new_upload_id()
+    input_path, filename, _ = prep_upload_paths(file, unique_id)
+    output_path = settings.output_dir / f"{unique_id}_compressed_{filename}"
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
-
-        # Validate
-        if not validate_video_file(input_path):
-            input_path.unlink(missing_ok=True)
-            raise HTTPException(status_code=400, detail="Invalid video file")
-
-        # Compress
-        compress_quality(input_path, preset, output_path)
-
-        # Cleanup input
-        input_path.unlink(missing_ok=True)
+        async with staged_upload(
+            file, input_path, validate_video_file, "video", invalid_detail="Invalid video file"
+        ):
+            await _run_until_disconnect(
+                request, compress_quality(input_path, preset, output_path), output_path
+            )
 
         # Return compressed video
-        return FileResponse(
-            path=output_path,
+        return stream_and_delete(
+            output_path,
             media_type="video/mp4",
-            filename=f"compressed_{file.filename}",
-            background=None
+            filename=f"compressed_{filename}"
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
-        input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
 
 
-@router.post("/compress/resolution")
-@require_usage_limit(file_size_mb=25)
+@router.post("/compress/resolution", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def compress_video_resolution(
     request: Request,
     file: UploadFile = File(...),
@@ -461,51 +502,39 @@ async def compress_video_resolution(
     if preset.lower() not in ["low", "medium", "high"]:
         raise HTTPException(status_code=400, detail="Invalid preset. Use low/medium/high")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
-
-    output_filename = f"{unique_id}_compressed_{file.filename}"
-    output_path = settings.output_dir / output_filename
+    unique_id = new_upload_id()
+    input_path, filename, _ = prep_upload_paths(file, unique_id)
+    output_path = settings.output_dir / f"{unique_id}_compressed_{filename}"
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
-
-        # Validate
-        if not validate_video_file(input_path):
-            input_path.unlink(missing_ok=True)
-            raise HTTPException(status_code=400, detail="Invalid video file")
-
-        # Compress
-        compress_resolution(input_path, resolution, preset, output_path)
-
-        # Cleanup input
-        input_path.unlink(missing_ok=True)
+        async with staged_upload(
+            file, input_path, validate_video_file, "video", invalid_detail="Invalid video file"
+        ):
+            await _run_until_disconnect(
+                request,
+                compress_resolution(input_path, resolution, preset, output_path),
+                output_path
+            )
 
         # Return compressed video
-        return FileResponse(
-            path=output_path,
+        return stream_and_delete(
+            output_path,
             media_type="video/mp4",
-            filename=f"compressed_{file.filename}",
-            background=None
+            filename=f"compressed_{filename}"
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
-        input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         output_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
 
 
-@router.post("/compress/estimate")
-@require_usage_limit(file_size_mb=25)
+@router.post("/compress/estimate", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
 async def estimate_compression(
-    request: Request,
     file: Optional[UploadFile] = File(None),
     mode: str = Form(...),
     target_size_mb: Optional[float] = Form(None),
@@ -534,37 +563,98 @@ async def estimate_compression(
     if not file:
         raise HTTPException(status_code=400, detail="No video file provided")
 
-    unique_id = str(uuid.uuid4())[:8]
-    input_filename = f"{unique_id}_{file.filename}"
-    input_path = settings.upload_dir / input_filename
+    unique_id = new_upload_id()
+    input_path, _, _ = prep_upload_paths(file, unique_id)
 
     try:
-        # Save uploaded file
-        content = await file.read()
-        input_path.write_bytes(content)
+        async with staged_upload(
+            file, input_path, validate_video_file, "video", invalid_detail="Invalid video file"
+        ):
+            estimate = await run_in_pool(
+                FFMPEG_POOL,
+                estimate_output_size,
+                input_path,
+                mode,
+                target_size_mb,
+                preset,
+                resolution
+            )
 
-        # Validate
-        if not validate_video_file(input_path):
-            input_path.unlink(missing_ok=True)
-            raise HTTPException(status_code=400, detail="Invalid video file")
+        return JSONResponse(estimate)
 
-        # Estimate
-        estimate = estimate_output_size(
-            input_path,
-            mode,
-            target_size_mb,
-            preset,
-            resolution
-        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Estimation failed: {str(e)}")
 
-        # Cleanup
-        input_path.unlink(missing_ok=True)
 
-        return JSONResponse(estimate)
+@router.post("/compress/estimate-batch", dependencies=[Depends(require_usage_limit(file_size_mb=25))])
+async def estimate_compression_batch(
+    file: Optional[UploadFile] = File(None),
+    estimates: str = Form(...)
+):
+    """
+    Estimate output sizes for several settings with one upload.
+
+    The video is probed once and every estimate is computed from the same
+    metadata, so a UI can fill in all presets and resolutions at once.
+
+    Args:
+        file: Video file to analyze
+        estimates: JSON list of objects with "mode" (target_size/quality/
+            resolution) and the matching "target_size_mb", "preset" or
+            "resolution"
+
+    Returns:
+        JSON with one estimate per requested setting, in order
+    """
+    if not check_ffmpeg_installed():
+        raise HTTPException(status_code=503, detail="FFmpeg is not installed")
+
+    try:
+        items = orjson.loads(estimates)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="estimates must be a JSON list")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="estimates must be a non-empty JSON list")
+    if len(items) > MAX_BATCH_ESTIMATES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ESTIMATES} estimates per request")
+
+    requests = []
+    for item in items:
+        if not isinstance(item, dict) or item.get("mode") not in ["target_size", "quality", "resolution"]:
+            raise HTTPException(status_code=400, detail="Invalid mode")
+        try:
+            target_size_mb = item.get("target_size_mb")
+            requests.append({
+                "mode": item["mode"],
+                "target_size_mb": float(target_size_mb) if target_size_mb is not None else None,
+                "quality_preset": item.get("preset"),
+                "resolution": item.get("resolution")
+            })
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="target_size_mb must be a number")
+
+    if not file:
+        raise HTTPException(status_code=400, detail="No video file provided")
+
+    unique_id = new_upload_id()
+    input_path, _, _ = prep_upload_paths(file, unique_id)
+
+    try:
+        async with staged_upload(
+            file, input_path, validate_video_file, "video", invalid_detail="Invalid video file"
+        ):
+            results = await run_in_pool(
+                FFMPEG_POOL,
+                estimate_output_size_batch,
+                input_path,
+                requests
+            )
+
+        return ORJSONResponse({"estimates": results})
 
     except HTTPException:
-        input_path.unlink(missing_ok=True)
         raise
     except Exception as e:
-        input_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Estimation failed: {str(e)}")
@@ -1,11 +1,21 @@
 """AI Image generation and editing service using Google Gemini."""
 
+import asyncio
+import hashlib
+import json
 import os
+import random
+import string
+import tempfile
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import httpx
 from dotenv import load_dotenv
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from app.config import settings
 
 # Load environment variables from .env file
 load_dotenv()
@@ -36,6 +46,25 @@ ACTION_PRESETS = {
     "color_correction": "Correct and enhance the colors in this image. Improve white balance, saturation, and overall color harmony."
 }
 
+# Display labels for the presets (built once, returned as-is)
+_STYLE_PRESET_LABELS = {
+    "photorealistic": "Photorealistic",
+    "digital_art": "Digital Art",
+    "watercolor": "Watercolor",
+    "minimalist": "Minimalist",
+    "3d_render": "3D Render",
+    "anime": "Anime/Manga"
+}
+
+_ACTION_PRESET_LABELS = {
+    "remove_background": "Remove Background",
+    "change_style": "Change Style",
+    "add_elements": "Add Elements",
+    "remove_object": "Remove Object",
+    "enhance_quality": "Enhance Quality",
+    "color_correction": "Color Correction"
+}
+
 # Aspect ratio mappings
 ASPECT_RATIOS = {
     "1:1": (1024, 1024),
@@ -52,9 +81,184 @@ SIZE_MULTIPLIERS = {
 }
 
 
+# Models used for generation and editing (part of the cache key)
+GENERATION_MODEL = "imagen-4.0-fast-generate-001"
+EDIT_MODEL = "gemini-3-pro-image-preview"
+
+# Maximum concurrent Gemini calls from this process (keeps us under API rate limits)
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "5"))
+_gemini_semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+# Transient Gemini failures (rate limits, overload, network) are retried
+# with exponential backoff: 2s, 4s, ... plus up to 0.5s of jitter
+GEMINI_MAX_ATTEMPTS = 3
+GEMINI_RETRY_BASE_SECONDS = 2.0
+_TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+T = TypeVar("T")
+
+# Mime type sent to the API for each input image extension
+_MIME_TYPE_MAP = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp"
+}
+
+# Prompt builders are memoized: users iterating on a prompt send the same
+# (prompt, style) combinations over and over
+PROMPT_CACHE_SIZE = 256
+
+# Gemini accepts at most ~20 MB of inline data per request
+MAX_EDIT_IMAGE_BYTES = 20 * 1024 * 1024
+
+# File extension for each image mime type the AI service returns
+MIME_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp"
+}
+
+
+def _cache_key(*parts, data: bytes = b"") -> str:
+    """
+    Build a content hash for an AI request.
+
+    Args:
+        *parts: JSON-serializable request parameters
+        data: Raw input bytes (e.g. the image being edited)
+
+    Returns:
+        Hex SHA-256 of the data and the normalized parameters
+    """
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(parts, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _result_cache_key(idempotency_key: Optional[str], *parts, data: bytes = b"") -> Optional[str]:
+    """
+    Build the result cache key for a request, or None if it isn't cacheable.
+
+    Results are only cached for requests that carry an idempotency key, so
+    asking again for the same prompt still produces a fresh image while a
+    retried request (same key, same parameters) gets the original result.
+    """
+    if not idempotency_key:
+        return None
+    return _cache_key(idempotency_key, *parts, data=data)
+
+
+def _cache_get(key: str) -> Optional[Tuple[bytes, str]]:
+    """Get a cached result as (image_bytes, mime_type), or None on a miss."""
+    for mime_type, ext in MIME_EXTENSIONS.items():
+        try:
+            return (settings.ai_cache_dir / f"{key}{ext}").read_bytes(), mime_type
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _cache_put(key: str, image_bytes: bytes, mime_type: str) -> None:
+    """
+    Store a result in the cache.
+
+    The bytes are written to a temporary file and renamed into place, so
+    concurrent readers never see a partial image. Failures are ignored:
+    the cache is only an optimization.
+    """
+    ext = MIME_EXTENSIONS.get(mime_type)
+    if ext is None:
+        return
+
+    try:
+        settings.ai_cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=settings.ai_cache_dir, suffix=".tmp")
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(image_bytes)
+        os.replace(tmp_path, settings.ai_cache_dir / f"{key}{ext}")
+    except OSError:
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Check whether a failed Gemini call is worth retrying."""
+    if isinstance(error, errors.APIError):
+        return error.code in _TRANSIENT_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+
+def _retry_delay(attempt: int) -> float:
+    """Backoff before retry number attempt + 1."""
+    return GEMINI_RETRY_BASE_SECONDS * 2 ** attempt + random.uniform(0, 0.5)
+
+
+def _retry_transient(call: Callable[[], T], max_attempts: int = GEMINI_MAX_ATTEMPTS) -> T:
+    """
+    Run a blocking Gemini call, retrying transient failures.
+
+    Args:
+        call: Zero-argument function making the API call
+        max_attempts: Total number of tries
+
+    Returns:
+        The call's result
+
+    Raises:
+        Exception: The last error, or the first non-transient one
+    """
+    for attempt in range(max_attempts):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not _is_transient(e):
+                raise
+        time.sleep(_retry_delay(attempt))
+
+
+async def _retry_transient_async(
+    call: Callable[[], Awaitable[T]],
+    max_attempts: int = GEMINI_MAX_ATTEMPTS
+) -> T:
+    """
+    Run an async Gemini call, retrying transient failures.
+
+    Each attempt holds a concurrency slot only while the request is in
+    flight, not while backing off.
+
+    Args:
+        call: Zero-argument function returning the API call's awaitable
+        max_attempts: Total number of tries
+
+    Returns:
+        The call's result
+
+    Raises:
+        Exception: The last error, or the first non-transient one
+    """
+    for attempt in range(max_attempts):
+        try:
+            async with _gemini_semaphore:
+                return await call()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not _is_transient(e):
+                raise
+        await asyncio.sleep(_retry_delay(attempt))
+
+
+@lru_cache(maxsize=1)
 def _get_gemini_client() -> genai.Client:
     """
-    Get Gemini API client.
+    Get the shared Gemini API client.
+
+    The client (and its HTTP connection pool, used by both the sync and
+    client.aio APIs) is built once per process. A new GOOGLE_API_KEY is
+    only picked up after a restart or _get_gemini_client.cache_clear().
+    Failures are not cached.
 
     Returns:
         Initialized Gemini client
@@ -79,16 +283,9 @@ def get_style_presets() -> Dict[str, str]:
     Get all available style presets.
 
     Returns:
-        Dictionary mapping style names to descriptions
+        Dictionary mapping style names to descriptions (shared; do not modify)
     """
-    return {
-        "photorealistic": "Photorealistic",
-        "digital_art": "Digital Art",
-        "watercolor": "Watercolor",
-        "minimalist": "Minimalist",
-        "3d_render": "3D Render",
-        "anime": "Anime/Manga"
-    }
+    return _STYLE_PRESET_LABELS
 
 
 def get_action_presets() -> Dict[str, str]:
@@ -96,18 +293,47 @@ def get_action_presets() -> Dict[str, str]:
     Get all available edit action presets.
 
     Returns:
-        Dictionary mapping action names to descriptions
+        Dictionary mapping action names to descriptions (shared; do not modify)
     """
-    return {
-        "remove_background": "Remove Background",
-        "change_style": "Change Style",
-        "add_elements": "Add Elements",
-        "remove_object": "Remove Object",
-        "enhance_quality": "Enhance Quality",
-        "color_correction": "Color Correction"
-    }
+    return _ACTION_PRESET_LABELS
+
+
+def _compile_template(template: str) -> Callable[..., str]:
+    """
+    Pre-split a preset template into a callable that fills it in.
 
+    Templates with a single plain placeholder become a prefix + value +
+    suffix concatenation, so the format string isn't re-parsed per call.
+    Anything fancier falls back to str.format.
+
+    Args:
+        template: Template using str.format syntax
+
+    Returns:
+        Callable taking the placeholder values as keyword arguments
+    """
+    parts = list(string.Formatter().parse(template))
+    fields = [part for part in parts if part[1] is not None]
 
+    if not fields:
+        literal = "".join(part[0] for part in parts)
+        return lambda **values: literal
+
+    if len(fields) == 1 and fields[0] is parts[0] and not fields[0][2] and not fields[0][3]:
+        prefix, field = parts[0][0], parts[0][1]
+        suffix = "".join(part[0] for part in parts[1:])
+        return lambda **values: f"{prefix}{values[field]}{suffix}"
+
+    return template.format
+
+
+# Action templates parsed once at import
+_ACTION_FORMATTERS = {
+    action: _compile_template(template) for action, template in ACTION_PRESETS.items()
+}
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def _build_generation_prompt(user_prompt: str, style: str) -> str:
     """
     Build full generation prompt with style modifiers.
@@ -127,6 +353,7 @@ def _build_generation_prompt(user_prompt: str, style: str) -> str:
         return user_prompt
 
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def _build_edit_prompt(action: str, custom_prompt: Optional[str] = None, style: Optional[str] = None) -> str:
     """
     Build edit instruction prompt.
@@ -143,10 +370,10 @@ def _build_edit_prompt(action: str, custom_prompt: Optional[str] = None, style:
 
     # Handle special cases
     if action == "change_style" and style:
-        style_name = get_style_presets().get(style, style)
-        base_prompt = base_prompt.format(style=style_name)
+        style_name = _STYLE_PRESET_LABELS.get(style, style)
+        base_prompt = _ACTION_FORMATTERS[action](style=style_name)
     elif action in ["add_elements", "remove_object"] and custom_prompt:
-        base_prompt = base_prompt.format(prompt=custom_prompt)
+        base_prompt = _ACTION_FORMATTERS[action](prompt=custom_prompt)
     elif custom_prompt:
         # For other actions, append custom instructions
         base_prompt = f"{base_prompt} Additional instructions: {custom_prompt}"
@@ -154,11 +381,89 @@ def _build_edit_prompt(action: str, custom_prompt: Optional[str] = None, style:
     return base_prompt
 
 
+def _generation_request(prompt: str, style: str, aspect_ratio: str) -> Dict:
+    """Build the keyword arguments for an Imagen generate_images call."""
+    return {
+        "model": GENERATION_MODEL,
+        "prompt": _build_generation_prompt(prompt, style),
+        "config": types.GenerateImagesConfig(
+            number_of_images=1,
+            aspect_ratio=aspect_ratio,
+            person_generation="allow_adult",
+        )
+    }
+
+
+def _generated_image_bytes(response) -> bytes:
+    """Extract the image bytes from a generate_images response."""
+    if not response.generated_images:
+        raise AIImageError("No image generated. Try rephrasing your prompt.")
+    return response.generated_images[0].image.image_bytes
+
+
+def _read_edit_input(image_path: Path) -> Tuple[bytes, str]:
+    """
+    Read an image to edit.
+
+    Returns:
+        Tuple of (image_bytes, mime_type)
+    """
+    # One stat both checks existence and rejects inputs the API can't take
+    # inline, before anything is read into memory
+    try:
+        size = image_path.stat().st_size
+    except FileNotFoundError:
+        raise AIImageError("Image file not found")
+
+    if size > MAX_EDIT_IMAGE_BYTES:
+        raise AIImageError(
+            f"Image is too large to edit (max {MAX_EDIT_IMAGE_BYTES // (1024 * 1024)}MB)"
+        )
+
+    # Determine mime type
+    suffix = image_path.suffix.lower()
+    return image_path.read_bytes(), _MIME_TYPE_MAP.get(suffix, "image/jpeg")
+
+
+def _edit_request(
+    image_bytes: bytes,
+    input_mime_type: str,
+    action: str,
+    custom_prompt: Optional[str],
+    style: Optional[str]
+) -> Dict:
+    """Build the keyword arguments for a Gemini generate_content edit call."""
+    image_part = types.Part.from_bytes(
+        data=image_bytes,
+        mime_type=input_mime_type
+    )
+    return {
+        "model": EDIT_MODEL,
+        "contents": [image_part, _build_edit_prompt(action, custom_prompt, style)],
+        "config": types.GenerateContentConfig(
+            response_modalities=["IMAGE"],
+        )
+    }
+
+
+def _edited_image(response) -> Tuple[bytes, str]:
+    """Extract (image_bytes, mime_type) from a generate_content edit response."""
+    if not response.candidates:
+        raise AIImageError("Image editing failed. Try different instructions.")
+
+    for part in response.candidates[0].content.parts:
+        if part.inline_data:
+            return part.inline_data.data, part.inline_data.mime_type
+
+    raise AIImageError("No image data in response")
+
+
 def generate_image(
     prompt: str,
     style: str = "photorealistic",
     aspect_ratio: str = "1:1",
-    size: str = "1k"
+    size: str = "1k",
+    idempotency_key: Optional[str] = None
 ) -> Tuple[bytes, str]:
     """
     Generate an image from text prompt using Imagen 3.
@@ -168,6 +473,9 @@ def generate_image(
         style: Style preset name
         aspect_ratio: Aspect ratio (1:1, 4:5, 9:16, 16:9)
         size: Image size (1k, 2k, 4k)
+        idempotency_key: Client key identifying retries of one request. The
+            result is cached under it, so a retry gets the same image back;
+            without a key every call produces a new image
 
     Returns:
         Tuple of (image_bytes, mime_type)
@@ -175,31 +483,68 @@ def generate_image(
     Raises:
         AIImageError: If generation fails
     """
+    # Retries of the same request are served from the result cache
+    key = _result_cache_key(
+        idempotency_key, GENERATION_MODEL, prompt.strip(), style, aspect_ratio, size
+    )
+    cached = _cache_get(key) if key else None
+    if cached is not None:
+        return cached
+
     try:
         client = _get_gemini_client()
 
-        # Build full prompt with style
-        full_prompt = _build_generation_prompt(prompt, style)
-
         # Generate image using Imagen 4
-        response = client.models.generate_images(
-            model="imagen-4.0-fast-generate-001",
-            prompt=full_prompt,
-            config=types.GenerateImagesConfig(
-                number_of_images=1,
-                aspect_ratio=aspect_ratio,
-                person_generation="allow_adult",
-            )
-        )
+        request = _generation_request(prompt, style, aspect_ratio)
+        response = _retry_transient(lambda: client.models.generate_images(**request))
+        image_bytes = _generated_image_bytes(response)
 
-        # Extract image data
-        if not response.generated_images:
-            raise AIImageError("No image generated. Try rephrasing your prompt.")
+        # Cache and return image bytes and mime type
+        if key:
+            _cache_put(key, image_bytes, "image/png")
+        return image_bytes, "image/png"
 
-        generated_image = response.generated_images[0]
+    except AIImageError:
+        raise
+    except Exception as e:
+        raise AIImageError(f"Image generation failed: {str(e)}")
 
-        # Return image bytes and mime type
-        return generated_image.image.image_bytes, "image/png"
+
+async def generate_image_async(
+    prompt: str,
+    style: str = "photorealistic",
+    aspect_ratio: str = "1:1",
+    size: str = "1k",
+    idempotency_key: Optional[str] = None
+) -> Tuple[bytes, str]:
+    """
+    Generate an image without blocking the event loop.
+
+    Same as generate_image, but uses the client's async API and waits for
+    a slot so no more than GEMINI_CONCURRENCY calls run at once.
+
+    Raises:
+        AIImageError: If generation fails
+    """
+    key = _result_cache_key(
+        idempotency_key, GENERATION_MODEL, prompt.strip(), style, aspect_ratio, size
+    )
+    cached = await asyncio.to_thread(_cache_get, key) if key else None
+    if cached is not None:
+        return cached
+
+    try:
+        client = _get_gemini_client()
+
+        request = _generation_request(prompt, style, aspect_ratio)
+        response = await _retry_transient_async(
+            lambda: client.aio.models.generate_images(**request)
+        )
+        image_bytes = _generated_image_bytes(response)
+
+        if key:
+            await asyncio.to_thread(_cache_put, key, image_bytes, "image/png")
+        return image_bytes, "image/png"
 
     except AIImageError:
         raise
@@ -207,11 +552,30 @@ def generate_image(
         raise AIImageError(f"Image generation failed: {str(e)}")
 
 
+async def generate_images_batch(requests: List[Dict]) -> List[Tuple[bytes, str]]:
+    """
+    Generate several images concurrently (bounded by GEMINI_CONCURRENCY).
+
+    Args:
+        requests: Keyword arguments for generate_image_async, one dict per image
+
+    Returns:
+        List of (image_bytes, mime_type) in request order
+
+    Raises:
+        AIImageError: If any generation fails
+    """
+    return await asyncio.gather(
+        *[generate_image_async(**request) for request in requests]
+    )
+
+
 def edit_image(
     image_path: Path,
     action: str,
     custom_prompt: Optional[str] = None,
-    style: Optional[str] = None
+    style: Optional[str] = None,
+    idempotency_key: Optional[str] = None
 ) -> Tuple[bytes, str]:
     """
     Edit an existing image using Gemini 2.5 Flash Image.
@@ -221,6 +585,9 @@ def edit_image(
         action: Action preset name
         custom_prompt: Optional custom instructions
         style: Optional style for style-change action
+        idempotency_key: Client key identifying retries of one request. The
+            result is cached under it, so a retry gets the same image back;
+            without a key every call produces a new image
 
     Returns:
         Tuple of (image_bytes, mime_type)
@@ -229,51 +596,70 @@ def edit_image(
         AIImageError: If editing fails
     """
     try:
-        client = _get_gemini_client()
+        image_bytes, input_mime_type = _read_edit_input(image_path)
 
-        # Read image file
-        if not image_path.exists():
-            raise AIImageError("Image file not found")
-
-        image_bytes = image_path.read_bytes()
-
-        # Determine mime type
-        suffix = image_path.suffix.lower()
-        mime_type_map = {
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".png": "image/png",
-            ".webp": "image/webp"
-        }
-        input_mime_type = mime_type_map.get(suffix, "image/jpeg")
-
-        # Create image part
-        image_part = types.Part.from_bytes(
-            data=image_bytes,
-            mime_type=input_mime_type
+        # Retries of the same edit are served from the result cache
+        key = _result_cache_key(
+            idempotency_key, EDIT_MODEL, action, custom_prompt, style, data=image_bytes
         )
+        cached = _cache_get(key) if key else None
+        if cached is not None:
+            return cached
 
-        # Build edit prompt
-        edit_instruction = _build_edit_prompt(action, custom_prompt, style)
+        client = _get_gemini_client()
 
         # Edit image using Gemini 3 Pro Image (Nano Banana Pro)
-        response = client.models.generate_content(
-            model="gemini-3-pro-image-preview",
-            contents=[image_part, edit_instruction],
-            config=types.GenerateContentConfig(
-                response_modalities=["IMAGE"],
-            )
+        request = _edit_request(image_bytes, input_mime_type, action, custom_prompt, style)
+        response = _retry_transient(lambda: client.models.generate_content(**request))
+        edited_bytes, mime_type = _edited_image(response)
+
+        if key:
+            _cache_put(key, edited_bytes, mime_type)
+        return edited_bytes, mime_type
+
+    except AIImageError:
+        raise
+    except Exception as e:
+        raise AIImageError(f"Image editing failed: {str(e)}")
+
+
+async def edit_image_async(
+    image_path: Path,
+    action: str,
+    custom_prompt: Optional[str] = None,
+    style: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> Tuple[bytes, str]:
+    """
+    Edit an image without blocking the event loop.
+
+    Same as edit_image, but uses the client's async API and waits for a
+    slot so no more than GEMINI_CONCURRENCY calls run at once.
+
+    Raises:
+        AIImageError: If editing fails
+    """
+    try:
+        image_bytes, input_mime_type = await asyncio.to_thread(_read_edit_input, image_path)
+
+        key = _result_cache_key(
+            idempotency_key, EDIT_MODEL, action, custom_prompt, style, data=image_bytes
         )
+        cached = await asyncio.to_thread(_cache_get, key) if key else None
+        if cached is not None:
+            return cached
 
-        # Extract edited image data
-        if not response.candidates:
-            raise AIImageError("Image editing failed. Try different instructions.")
+        client = _get_gemini_client()
 
-        for part in response.candidates[0].content.parts:
-            if part.inline_data:
-                return part.inline_data.data, part.inline_data.mime_type
+        request = _edit_request(image_bytes, input_mime_type, action, custom_prompt, style)
+        response = await _retry_transient_async(
+            lambda: client.aio.models.generate_content(**request)
+        )
+        edited_bytes, mime_type = _edited_image(response)
 
-        raise AIImageError("No image data in response")
+        if key:
+            await asyncio.to_thread(_cache_put, key, edited_bytes, mime_type)
+        return edited_bytes, mime_type
 
     except AIImageError:
         raise
@@ -281,10 +667,14 @@ def edit_image(
         raise AIImageError(f"Image editing failed: {str(e)}")
 
 
+@lru_cache(maxsize=1)
 def check_api_key_configured() -> bool:
     """
     Check if Google API key is configured.
 
+    The result is cached for the life of the process; call
+    check_api_key_configured.cache_clear() to re-check.
+
     Returns:
         True if API key is set, False otherwise
     """
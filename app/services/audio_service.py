@@ -2,8 +2,12 @@
 
 import json
 import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 
 # Supported formats
@@ -12,20 +16,40 @@ SUPPORTED_VIDEO_FORMATS = [
 ]
 
 SUPPORTED_AUDIO_FORMATS = {
-    "mp3": {"codec": "libmp3lame", "supports_bitrate": True},
-    "aac": {"codec": "aac", "supports_bitrate": True},
-    "wav": {"codec": "pcm_s16le", "supports_bitrate": False},
-    "flac": {"codec": "flac", "supports_bitrate": False},
-    "ogg": {"codec": "libvorbis", "supports_bitrate": True}
+    "mp3": {"codec": "libmp3lame", "muxer": "mp3", "supports_bitrate": True},
+    "aac": {"codec": "aac", "muxer": "adts", "supports_bitrate": True},
+    "wav": {"codec": "pcm_s16le", "muxer": "wav", "supports_bitrate": False},
+    "flac": {"codec": "flac", "muxer": "flac", "supports_bitrate": False},
+    "ogg": {"codec": "libvorbis", "muxer": "ogg", "supports_bitrate": True}
 }
 
+# Source audio codec that each output format can carry without re-encoding
+NATIVE_AUDIO_CODECS = {
+    "mp3": "mp3",
+    "aac": "aac",
+    "wav": "pcm_s16le",
+    "flac": "flac",
+    "ogg": "vorbis"
+}
+
+# Chunk size used when streaming FFmpeg output
+STREAM_CHUNK_SIZE = 1 << 16
+
 BITRATE_OPTIONS = [64, 128, 192, 256, 320]  # kbps
 
+# File extractions have no wall-clock limit; FFmpeg is only killed if it
+# stops reporting progress for this many seconds
+PROGRESS_STALL_TIMEOUT = 60
 
+
+@lru_cache(maxsize=1)
 def check_ffmpeg_installed() -> bool:
     """
     Check if FFmpeg is installed and accessible.
 
+    The result is cached for the life of the process; call
+    check_ffmpeg_installed.cache_clear() to re-check.
+
     Returns:
         True if FFmpeg is available
     """
@@ -40,10 +64,14 @@ def check_ffmpeg_installed() -> bool:
         return False
 
 
+@lru_cache(maxsize=1)
 def check_ffprobe_installed() -> bool:
     """
     Check if FFprobe is installed and accessible.
 
+    The result is cached for the life of the process; call
+    check_ffprobe_installed.cache_clear() to re-check.
+
     Returns:
         True if FFprobe is available
     """
@@ -58,6 +86,7 @@ def check_ffprobe_installed() -> bool:
         return False
 
 
+@lru_cache(maxsize=1)
 def get_supported_formats() -> Dict:
     """Get supported video inputs and audio outputs."""
     return {
@@ -75,6 +104,9 @@ def get_video_info(video_path: Path) -> Dict:
     """
     Get information about a video file using ffprobe.
 
+    Results are cached by (path, mtime, size), so asking for a file's info
+    and then extracting from it only runs ffprobe once.
+
     Args:
         video_path: Path to video file
 
@@ -85,6 +117,26 @@ def get_video_info(video_path: Path) -> Dict:
         RuntimeError: If FFprobe is not installed
         ValueError: If video cannot be read
     """
+    try:
+        file_stat = video_path.stat()
+    except OSError:
+        raise ValueError("Video file not found")
+
+    # Copy so callers can't modify the cached entry
+    return dict(_probe_video_info(str(video_path), file_stat.st_mtime_ns, file_stat.st_size))
+
+
+@lru_cache(maxsize=128)
+def _probe_video_info(path: str, mtime_ns: int, size: int) -> Dict:
+    """
+    Run ffprobe on a video (cached; mtime_ns and size only form the cache key).
+
+    Raises:
+        RuntimeError: If FFprobe is not installed
+        ValueError: If video cannot be read
+    """
+    video_path = Path(path)
+
     if not check_ffprobe_installed():
         raise RuntimeError(
             "FFprobe is not installed. Please install FFmpeg to use this feature."
@@ -119,6 +171,7 @@ def get_video_info(video_path: Path) -> Dict:
         # Find video and audio streams
         video_codec = None
         audio_codec = None
+        audio_bitrate = None
         has_audio = False
 
         for stream in data.get("streams", []):
@@ -126,6 +179,8 @@ def get_video_info(video_path: Path) -> Dict:
                 video_codec = stream.get("codec_name", "unknown")
             elif stream.get("codec_type") == "audio" and not audio_codec:
                 audio_codec = stream.get("codec_name", "unknown")
+                if str(stream.get("bit_rate", "")).isdigit():
+                    audio_bitrate = int(stream["bit_rate"]) // 1000
                 has_audio = True
 
         return {
@@ -135,6 +190,7 @@ def get_video_info(video_path: Path) -> Dict:
             "size": size,
             "video_codec": video_codec or "unknown",
             "audio_codec": audio_codec or "unknown",
+            "audio_bitrate": audio_bitrate,
             "has_audio": has_audio
         }
 
@@ -166,28 +222,106 @@ def format_duration(seconds: float) -> str:
         return f"{minutes}:{secs:02d}"
 
 
-def extract_audio(
+def _can_stream_copy(video_path: Path, output_format: str, bitrate: int) -> bool:
+    """
+    Check whether the source audio can be copied into the output as-is.
+
+    That is the case when the source codec is the output format's native
+    codec and, for lossy formats, the source bitrate is not above the
+    requested one (re-encoding could only lose quality). Any probe failure
+    means no.
+
+    Args:
+        video_path: Path to input video
+        output_format: Target audio format (already validated)
+        bitrate: Requested bitrate in kbps (already validated)
+
+    Returns:
+        True if "-c:a copy" can be used
+    """
+    try:
+        info = get_video_info(video_path)
+    except Exception:
+        return False
+
+    if info["audio_codec"] != NATIVE_AUDIO_CODECS[output_format]:
+        return False
+
+    if not SUPPORTED_AUDIO_FORMATS[output_format]["supports_bitrate"]:
+        return True
+
+    return info["audio_bitrate"] is not None and info["audio_bitrate"] <= bitrate
+
+
+def _build_extract_command(
     video_path: Path,
     output_format: str,
-    bitrate: int = 192,
-    output_dir: Optional[Path] = None
-) -> Path:
+    bitrate: int,
+    output_target: str,
+    copy: bool = False
+) -> List[str]:
     """
-    Extract audio from a video file using FFmpeg.
+    Build the FFmpeg command for audio extraction.
 
     Args:
         video_path: Path to input video
-        output_format: Target audio format (mp3, aac, wav, flac, ogg)
-        bitrate: Bitrate in kbps (for lossy formats)
-        output_dir: Output directory (defaults to same as video)
+        output_format: Target audio format (already validated)
+        bitrate: Bitrate in kbps (already validated)
+        output_target: Output file path, or "pipe:1" to write to stdout
+        copy: Copy the source audio stream instead of re-encoding it
 
     Returns:
-        Path to extracted audio file
+        FFmpeg command as a list of arguments
+    """
+    format_info = SUPPORTED_AUDIO_FORMATS[output_format]
+
+    command = [
+        "ffmpeg",
+        "-i", str(video_path),
+        "-vn"  # No video
+    ]
+
+    if copy:
+        command.extend(["-c:a", "copy"])
+    else:
+        command.extend(["-acodec", format_info["codec"]])
+
+        # Add bitrate for lossy formats
+        if format_info["supports_bitrate"]:
+            command.extend(["-ab", f"{bitrate}k"])
+
+    # Stdout has no extension, so the container must be named explicitly
+    if output_target == "pipe:1":
+        command.extend(["-f", format_info["muxer"]])
+
+    command.append(output_target)
+    return command
+
+
+def _raise_extraction_error(stderr: str) -> None:
+    """
+    Translate FFmpeg error output into a ValueError.
+
+    Args:
+        stderr: FFmpeg stderr output
 
     Raises:
-        RuntimeError: If FFmpeg is not installed
-        ValueError: If format is not supported or extraction fails
+        ValueError: Always
     """
+    error_msg = stderr.lower()
+
+    if "no such file" in error_msg or "does not exist" in error_msg:
+        raise ValueError("Video file not found")
+    elif "invalid" in error_msg or "could not find" in error_msg:
+        raise ValueError("Video file is invalid or corrupted")
+    elif "no audio" in error_msg or "stream not found" in error_msg:
+        raise ValueError("Video does not contain an audio stream")
+    else:
+        raise ValueError(f"Audio extraction failed: {stderr}")
+
+
+def _validate_extract_args(output_format: str, bitrate: int) -> Tuple[str, int]:
+    """Normalize and validate the requested output format and bitrate."""
     if not check_ffmpeg_installed():
         raise RuntimeError(
             "FFmpeg is not installed. Please install FFmpeg to use this feature."
@@ -202,59 +336,137 @@ def extract_audio(
     if bitrate not in BITRATE_OPTIONS:
         bitrate = 192  # Default
 
-    # Get format info
-    format_info = SUPPORTED_AUDIO_FORMATS[output_format]
-    codec = format_info["codec"]
+    return output_format, bitrate
 
-    # Determine output path
-    if output_dir is None:
-        output_dir = video_path.parent
 
-    output_path = output_dir / f"{video_path.stem}.{output_format}"
+def _run_with_progress(
+    command: List[str],
+    progress_callback: Optional[Callable[[float], None]] = None,
+    stall_timeout: float = PROGRESS_STALL_TIMEOUT
+) -> Tuple[int, str]:
+    """
+    Run an FFmpeg command, following its -progress output.
 
-    # Build FFmpeg command
-    command = [
-        "ffmpeg",
-        "-i", str(video_path),
-        "-vn",  # No video
-        "-acodec", codec
-    ]
+    A watchdog thread kills FFmpeg only if no progress line arrives within
+    stall_timeout, so long inputs are never cut off while work is still
+    being done. Stderr is spooled to a temp file instead of memory and only
+    read back if the command fails.
 
-    # Add bitrate for lossy formats
-    if format_info["supports_bitrate"]:
-        command.extend(["-ab", f"{bitrate}k"])
+    Args:
+        command: FFmpeg command (starting with "ffmpeg")
+        progress_callback: Called with the output position in seconds
+        stall_timeout: Seconds without progress before FFmpeg is killed
 
-    # Add output path
-    command.append(str(output_path))
+    Returns:
+        Tuple of (return code, stderr text or "" on success)
 
-    try:
-        # Run FFmpeg
-        result = subprocess.run(
+    Raises:
+        ValueError: If FFmpeg stalled and was killed
+    """
+    command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
             command,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minutes max
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True
         )
 
-        if result.returncode != 0:
-            error_msg = result.stderr.lower()
+        last_progress = time.monotonic()
+        finished = threading.Event()
+        stalled = threading.Event()
+
+        def watchdog() -> None:
+            while not finished.wait(1):
+                if time.monotonic() - last_progress > stall_timeout:
+                    stalled.set()
+                    process.kill()
+                    return
+
+        watchdog_thread = threading.Thread(target=watchdog, daemon=True)
+        watchdog_thread.start()
+
+        try:
+            for line in process.stdout:
+                last_progress = time.monotonic()
+                # Despite its name, out_time_ms is in microseconds
+                if progress_callback is not None and line.startswith("out_time_ms="):
+                    value = line[len("out_time_ms="):].strip()
+                    if value.isdigit():
+                        progress_callback(int(value) / 1_000_000)
+            returncode = process.wait()
+        finally:
+            finished.set()
+            watchdog_thread.join()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+        if stalled.is_set():
+            raise ValueError(
+                f"Audio extraction stalled (no progress for {int(stall_timeout)} seconds)"
+            )
+
+        if returncode == 0:
+            return returncode, ""
+
+        stderr_file.seek(0)
+        return returncode, stderr_file.read().decode("utf-8", errors="replace")
+
+
+def extract_audio(
+    video_path: Path,
+    output_format: str,
+    bitrate: int = 192,
+    output_dir: Optional[Path] = None,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    force_reencode: bool = False
+) -> Path:
+    """
+    Extract audio from a video file using FFmpeg.
+
+    Args:
+        video_path: Path to input video
+        output_format: Target audio format (mp3, aac, wav, flac, ogg)
+        bitrate: Bitrate in kbps (for lossy formats)
+        output_dir: Output directory (defaults to same as video)
+        progress_callback: Called with the extracted duration in seconds as FFmpeg works
+        force_reencode: Always re-encode, even when the source audio could be copied
+
+    Returns:
+        Path to extracted audio file
+
+    Raises:
+        RuntimeError: If FFmpeg is not installed
+        ValueError: If format is not supported or extraction fails
+    """
+    output_format, bitrate = _validate_extract_args(output_format, bitrate)
+
+    # Determine output path
+    if output_dir is None:
+        output_dir = video_path.parent
+
+    output_path = output_dir / f"{video_path.stem}.{output_format}"
 
-            if "no such file" in error_msg or "does not exist" in error_msg:
-                raise ValueError("Video file not found")
-            elif "invalid" in error_msg or "could not find" in error_msg:
-                raise ValueError("Video file is invalid or corrupted")
-            elif "no audio" in error_msg or "stream not found" in error_msg:
-                raise ValueError("Video does not contain an audio stream")
-            else:
-                raise ValueError(f"Audio extraction failed: {result.stderr}")
+    # Build FFmpeg command (stream copy when the source already matches)
+    copy = not force_reencode and _can_stream_copy(video_path, output_format, bitrate)
+    command = _build_extract_command(video_path, output_format, bitrate, str(output_path), copy)
+
+    try:
+        # Run FFmpeg (no overall timeout: only a stalled FFmpeg is killed)
+        returncode, stderr = _run_with_progress(command, progress_callback)
+
+        if returncode != 0:
+            _raise_extraction_error(stderr)
 
         if not output_path.exists():
             raise ValueError("Audio file was not created")
 
         return output_path
 
-    except subprocess.TimeoutExpired:
-        raise ValueError("Audio extraction timed out (file too large or corrupted)")
     except Exception as e:
         # Cleanup partial output
         if output_path.exists():
@@ -262,6 +474,116 @@ def extract_audio(
         raise
 
 
+def extract_audio_stream(
+    video_path: Path,
+    output_format: str,
+    bitrate: int = 192,
+    force_reencode: bool = False,
+    stall_timeout: float = PROGRESS_STALL_TIMEOUT
+) -> Tuple[bytes, Iterator[bytes]]:
+    """
+    Extract audio from a video file, streaming FFmpeg's output from stdout.
+
+    Nothing is written to disk. The first chunk is read up front so that
+    FFmpeg failures are reported before any response is started.
+
+    Stdout carries the audio, so instead of -progress a watchdog thread
+    tracks chunk reads: FFmpeg is killed once no chunk has moved for
+    stall_timeout seconds, whether FFmpeg stopped producing output or the
+    consumer stopped reading (or abandoned the iterator without closing it).
+
+    Args:
+        video_path: Path to input video
+        output_format: Target audio format (mp3, aac, wav, flac, ogg)
+        bitrate: Bitrate in kbps (for lossy formats)
+        force_reencode: Always re-encode, even when the source audio could be copied
+        stall_timeout: Seconds without a chunk moving before FFmpeg is killed
+
+    Returns:
+        Tuple of (first chunk, iterator over the remaining chunks)
+
+    Raises:
+        RuntimeError: If FFmpeg is not installed
+        ValueError: If format is not supported or extraction fails
+    """
+    output_format, bitrate = _validate_extract_args(output_format, bitrate)
+    copy = not force_reencode and _can_stream_copy(video_path, output_format, bitrate)
+    command = _build_extract_command(video_path, output_format, bitrate, "pipe:1", copy)
+
+    # Stderr goes to a temp file so a chatty FFmpeg can never block on a full pipe
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=stderr_file
+    )
+
+    last_activity = time.monotonic()
+    finished = threading.Event()
+    stalled = threading.Event()
+
+    def watchdog() -> None:
+        while not finished.wait(1):
+            if time.monotonic() - last_activity > stall_timeout:
+                stalled.set()
+                process.kill()
+                process.wait()
+                return
+
+    watchdog_thread = threading.Thread(target=watchdog, daemon=True)
+    watchdog_thread.start()
+
+    def read_chunk() -> bytes:
+        nonlocal last_activity
+        last_activity = time.monotonic()
+        chunk = process.stdout.read(STREAM_CHUNK_SIZE)
+        last_activity = time.monotonic()
+        return chunk
+
+    def stop() -> None:
+        finished.set()
+        watchdog_thread.join()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+
+    def raise_if_stalled() -> None:
+        if stalled.is_set():
+            raise ValueError(
+                f"Audio extraction stalled (no progress for {int(stall_timeout)} seconds)"
+            )
+
+    try:
+        first_chunk = read_chunk()
+    except BaseException:
+        stop()
+        stderr_file.close()
+        raise
+
+    if not first_chunk:
+        stop()
+        raise_if_stalled()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode("utf-8", errors="replace")
+        stderr_file.close()
+        _raise_extraction_error(stderr)
+
+    def remaining_chunks() -> Iterator[bytes]:
+        try:
+            while chunk := read_chunk():
+                yield chunk
+            # A killed FFmpeg ends stdout early; fail rather than truncate silently
+            raise_if_stalled()
+        finally:
+            # Client may disconnect early; make sure FFmpeg does not linger
+            stop()
+            stderr_file.close()
+
+    return first_chunk, remaining_chunks()
+
+
 def validate_video_file(file_path: Path) -> bool:
     """
     Validate if a file is a supported video.
@@ -283,24 +605,11 @@ def validate_video_file(file_path: Path) -> bool:
         return True
 
     try:
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v", "quiet",
-                "-print_format", "json",
-                "-show_streams",
-                str(file_path)
-            ],
-            capture_output=True,
-            timeout=10
-        )
-
-        if result.returncode != 0:
-            return False
-
-        data = json.loads(result.stdout)
-        # Check if it has at least one stream
-        return len(data.get("streams", [])) > 0
-
+        # Goes through the probe cache, so the later get_video_info and
+        # stream-copy checks on this upload don't run ffprobe again
+        info = get_video_info(file_path)
     except Exception:
         return False
+
+    # Check if it has at least one stream
+    return info["video_codec"] != "unknown" or info["has_audio"]
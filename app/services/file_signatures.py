@@ -0,0 +1,84 @@
+"""Detect file types from their leading bytes."""
+
+from pathlib import Path
+from typing import Optional
+
+
+# Leading bytes needed to recognize image and video containers
+SNIFF_SIZE = 16
+
+# PDF readers accept junk before the %PDF- marker as long as it's in the first 1 KiB
+PDF_SNIFF_SIZE = 1024
+
+# Leading-byte signatures -> image format key (matching image_service's format names)
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+)
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+_VIDEO_SIGNATURES = (
+    b"\x1aE\xdf\xa3",                  # Matroska / WebM (EBML)
+    b"FLV",                              # Flash video
+    b"\x00\x00\x01\xba",               # MPEG program stream
+    b"\x00\x00\x01\xb3",               # MPEG video elementary stream
+    b"0&\xb2u\x8ef\xcf\x11",             # ASF / WMV
+)
+# Top-level atoms that can start an old-style QuickTime file
+_QUICKTIME_ATOMS = {b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot"}
+
+
+def read_header(file_path: Path, size: int = SNIFF_SIZE) -> bytes:
+    """Read the first bytes of a file, or b"" if it can't be read."""
+    try:
+        with open(file_path, "rb") as f:
+            return f.read(size)
+    except OSError:
+        return b""
+
+
+def image_format(header: bytes) -> Optional[str]:
+    """
+    Detect an image format from leading bytes.
+
+    Args:
+        header: First SNIFF_SIZE bytes of the file
+
+    Returns:
+        Format key (png, jpg, gif, bmp, tiff, webp, heif) or None if not recognized
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[4:8] == b"ftyp" and header[8:12] in _HEIF_BRANDS:
+        return "heif"
+
+    for signature, format_key in _IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return format_key
+
+    return None
+
+
+def is_image_header(header: bytes) -> bool:
+    """Check whether leading bytes look like a supported image format."""
+    return image_format(header) is not None
+
+
+def is_video_header(header: bytes) -> bool:
+    """Check whether leading bytes look like a supported video container."""
+    if header.startswith(_VIDEO_SIGNATURES):
+        return True
+    if header[:4] == b"RIFF" and header[8:12] == b"AVI ":
+        return True
+    # MP4, MOV, M4V and 3GP are all ISO base media files
+    return header[4:8] == b"ftyp" or header[4:8] in _QUICKTIME_ATOMS
+
+
+def is_pdf_header(header: bytes) -> bool:
+    """Check whether leading bytes contain the PDF header marker."""
+    return b"%PDF-" in header
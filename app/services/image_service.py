@@ -1,15 +1,22 @@
 """Image conversion service using Pillow."""
 
 import io
+import logging
+import os
 import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from PIL import Image
 import pillow_heif
+from app.services.file_signatures import image_format, read_header
 
 # Register HEIF opener with Pillow
 pillow_heif.register_heif_opener()
 
+logger = logging.getLogger(__name__)
+
 
 # Supported formats
 SUPPORTED_INPUT_FORMATS = {
@@ -40,7 +47,25 @@ QUALITY_FORMATS = {"jpg", "jpeg", "webp"}
 # Formats that don't support alpha channel
 NO_ALPHA_FORMATS = {"jpg", "jpeg", "bmp"}
 
+# Lossy re-encodes at or above this quality are treated as no-ops
+SAME_FORMAT_MIN_QUALITY = 95
+
+# Quality used when the caller doesn't ask for one
+DEFAULT_QUALITY = 85
+
+# Flush streamed ZIP data to the client in ~1 MiB chunks
+ZIP_STREAM_CHUNK_SIZE = 1 << 20
+
+# Already entropy-coded formats are stored as-is in ZIPs (deflate can't shrink
+# them); everything else (BMP, TIFF, ...) gets fast level-1 deflate
+STORED_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".webp", ".gif", ".heic", ".heif"})
+ZIP_DEFLATE_LEVEL = 1
 
+# Process pool for batch conversions
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+@lru_cache(maxsize=1)
 def get_supported_formats() -> dict:
     """Get supported input and output formats."""
     return {
@@ -53,8 +78,10 @@ def get_supported_formats() -> dict:
 def convert_image(
     input_path: Path,
     output_format: str,
-    quality: int = 85,
-    optimize: bool = True
+    quality: int = DEFAULT_QUALITY,
+    optimize: bool = True,
+    skip_if_same: bool = False,
+    image: Optional[Image.Image] = None
 ) -> Path:
     """
     Convert an image to a different format.
@@ -64,6 +91,11 @@ def convert_image(
         output_format: Target format (png, jpg, webp, etc.)
         quality: Quality for lossy formats (1-100)
         optimize: Whether to optimize the output
+        skip_if_same: Return the input unchanged (renamed to the output path)
+            when it is already in the target format and re-encoding it would
+            not reduce quality
+        image: input_path already opened (e.g. by open_validated); it is
+            closed by this function
 
     Returns:
         Path to converted image
@@ -80,18 +112,29 @@ def convert_image(
     # Validate quality
     quality = max(1, min(100, quality))
 
-    # Load image
-    try:
-        img = Image.open(input_path)
-    except Exception as e:
-        raise IOError(f"Failed to open image: {str(e)}")
+    # Generate output path
+    output_path = input_path.parent / f"{input_path.stem}.{output_format}"
+
+    # Already in the target format: skip the decode/encode cycle
+    if skip_if_same and _is_same_format(input_path, output_format, quality):
+        if image is not None:
+            image.close()
+        if output_path != input_path:
+            os.replace(input_path, output_path)
+        return output_path
+
+    # Load image (unless the caller already has it open)
+    if image is not None:
+        img = image
+    else:
+        try:
+            img = Image.open(input_path)
+        except Exception as e:
+            raise IOError(f"Failed to open image: {str(e)}")
 
     # Convert color mode if necessary
     img = _convert_color_mode(img, output_format)
 
-    # Generate output path
-    output_path = input_path.parent / f"{input_path.stem}.{output_format}"
-
     # Prepare save options
     save_kwargs = {
         "format": SUPPORTED_OUTPUT_FORMATS[output_format]
@@ -118,6 +161,31 @@ def convert_image(
     return output_path
 
 
+def _sniff_format(file_path: Path) -> Optional[str]:
+    """
+    Detect an image's format from its leading bytes.
+
+    Args:
+        file_path: Path to image
+
+    Returns:
+        Output format key (png, jpg, ...) or None if not recognized
+    """
+    return image_format(read_header(file_path))
+
+
+def _is_same_format(input_path: Path, output_format: str, quality: int) -> bool:
+    """
+    Check whether converting input_path to output_format would be a no-op.
+
+    Lossless targets only need a format match; lossy targets also need a
+    quality high enough that re-encoding wouldn't shrink the file.
+    """
+    if output_format in QUALITY_FORMATS and quality < SAME_FORMAT_MIN_QUALITY:
+        return False
+    return _sniff_format(input_path) == output_format
+
+
 def _convert_color_mode(img: Image.Image, output_format: str) -> Image.Image:
     """
     Convert image color mode based on output format requirements.
@@ -136,18 +204,20 @@ def _convert_color_mode(img: Image.Image, output_format: str) -> Image.Image:
         else:
             img = img.convert("RGB")
 
+    # Convert grayscale with alpha to RGBA (before flattening, so LA
+    # inputs get a white background for formats without alpha too)
+    if img.mode == "LA":
+        img = img.convert("RGBA")
+
     # Convert RGBA to RGB for formats that don't support alpha
     if img.mode == "RGBA" and output_format in NO_ALPHA_FORMATS:
-        # Create white background
+        # Create white background; pasting with the RGBA image itself as the
+        # mask uses its alpha band in place instead of splitting out 4 bands
         background = Image.new("RGB", img.size, (255, 255, 255))
-        background.paste(img, mask=img.split()[3])  # Use alpha channel as mask
+        background.paste(img, mask=img)
         img.close()
         return background
 
-    # Convert grayscale with alpha to RGBA
-    if img.mode == "LA":
-        img = img.convert("RGBA")
-
     # Convert grayscale to RGB if needed
     if img.mode == "L" and output_format in {"jpg", "webp"}:
         img = img.convert("RGB")
@@ -159,34 +229,85 @@ def _convert_color_mode(img: Image.Image, output_format: str) -> Image.Image:
     return img
 
 
+def _convert_one(
+    input_path: Path,
+    output_format: str,
+    quality: int,
+    skip_if_same: bool
+) -> Optional[Tuple[Path, Path]]:
+    """Convert one image inside a worker process, returning None on failure."""
+    try:
+        return input_path, convert_image(input_path, output_format, quality, skip_if_same=skip_if_same)
+    except Exception as e:
+        logger.warning("Failed to convert %s: %s", input_path.name, e)
+        return None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool used for batch conversions (created on first use)."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _process_pool
+
+
 def convert_multiple_images(
     input_paths: List[Path],
     output_format: str,
-    quality: int = 85
+    quality: int = DEFAULT_QUALITY,
+    skip_if_same: bool = False,
+    max_workers: Optional[int] = None
 ) -> List[Tuple[Path, Path]]:
     """
     Convert multiple images to the same format.
 
+    Conversions run in parallel across CPU cores using a process pool.
+    At most max_workers conversions are in flight for this call, so one
+    large batch can be throttled without resizing the shared pool.
+
     Args:
         input_paths: List of input image paths
         output_format: Target format
-        quality: Quality for lossy formats
+        quality: Quality for lossy formats (1-100)
+        skip_if_same: Pass images already in the target format through unchanged
+        max_workers: Maximum concurrent conversions (None = one per CPU core)
 
     Returns:
-        List of tuples (input_path, output_path) for successful conversions
+        List of tuples (input_path, output_path) for successful conversions,
+        in input order
     """
-    results = []
+    pool = _get_process_pool()
+    limit = max(1, max_workers or os.cpu_count() or 1)
+    results: List[Optional[Tuple[Path, Path]]] = [None] * len(input_paths)
+    in_flight: Dict[Future, int] = {}
 
-    for input_path in input_paths:
-        try:
-            output_path = convert_image(input_path, output_format, quality)
-            results.append((input_path, output_path))
-        except Exception as e:
-            print(f"Failed to convert {input_path.name}: {str(e)}")
-            # Continue with other images
-            continue
+    for index, input_path in enumerate(input_paths):
+        if len(in_flight) >= limit:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[in_flight.pop(future)] = future.result()
+
+        future = pool.submit(_convert_one, input_path, output_format, quality, skip_if_same)
+        in_flight[future] = index
+
+    for future in wait(in_flight).done:
+        results[in_flight[future]] = future.result()
 
-    return results
+    # Failed conversions come back as None; continue with the others
+    return [result for result in results if result is not None]
+
+
+def _write_zip_entry(zipf: zipfile.ZipFile, file_path: Path) -> None:
+    """Add a file to a ZIP, storing already-compressed images uncompressed."""
+    if file_path.suffix.lower() in STORED_EXTENSIONS:
+        zipf.write(file_path, file_path.name, compress_type=zipfile.ZIP_STORED)
+    else:
+        zipf.write(
+            file_path,
+            file_path.name,
+            compress_type=zipfile.ZIP_DEFLATED,
+            compresslevel=ZIP_DEFLATE_LEVEL
+        )
 
 
 def create_zip_archive(file_paths: List[Path], zip_path: Path) -> Path:
@@ -200,13 +321,111 @@ def create_zip_archive(file_paths: List[Path], zip_path: Path) -> Path:
     Returns:
         Path to created ZIP file
     """
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    with zipfile.ZipFile(zip_path, 'w') as zipf:
         for file_path in file_paths:
-            zipf.write(file_path, file_path.name)
+            _write_zip_entry(zipf, file_path)
 
     return zip_path
 
 
+class _ZipStream(io.RawIOBase):
+    """
+    Write-only, non-seekable buffer for streaming a ZIP archive.
+
+    zipfile falls back to data descriptors when it can't seek, so the
+    archive can be handed out in pieces while it is still being written.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_zip_archive(
+    file_paths: List[Path],
+    chunk_size: int = ZIP_STREAM_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Build a ZIP archive from multiple files and yield it in chunks.
+
+    Nothing is written to disk; the first chunk is ready as soon as the
+    first files have been compressed.
+
+    Args:
+        file_paths: List of file paths to include
+        chunk_size: Minimum number of bytes to buffer before yielding
+
+    Yields:
+        Consecutive pieces of the ZIP archive
+    """
+    stream = _ZipStream()
+
+    with zipfile.ZipFile(stream, 'w') as zipf:
+        for file_path in file_paths:
+            _write_zip_entry(zipf, file_path)
+            if stream.pending() >= chunk_size:
+                yield stream.drain()
+
+    # Closing the archive writes the central directory
+    yield stream.drain()
+
+
+def open_validated(file_path: Path) -> Image.Image:
+    """
+    Validate a supported image and return it opened and decoded.
+
+    Decoding is the validation, so callers that go on to convert the
+    image (pass it as convert_image's image argument) read and parse the
+    file once instead of once for validate_image_file and again to convert.
+
+    Args:
+        file_path: Path to file
+
+    Returns:
+        Loaded image (caller must close it)
+
+    Raises:
+        ValueError: If the file is not a valid supported image
+    """
+    extension = file_path.suffix.lower().lstrip('.')
+
+    if extension not in SUPPORTED_INPUT_FORMATS:
+        raise ValueError("Invalid or unsupported image file")
+
+    try:
+        img = Image.open(file_path)
+    except Exception:
+        raise ValueError("Invalid or unsupported image file")
+
+    try:
+        img.load()
+    except Exception:
+        img.close()
+        raise ValueError("Invalid or unsupported image file")
+
+    return img
+
+
 def validate_image_file(file_path: Path) -> bool:
     """
     Validate if a file is a supported image.
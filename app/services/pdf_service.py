@@ -1,10 +1,75 @@
 """PDF manipulation service using pypdf."""
 
+import io
+import itertools
+import math
+import mmap
+import os
 import re
+import tempfile
 import zipfile
+from concurrent.futures import Executor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple, Dict
-from pypdf import PdfReader, PdfWriter
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator, List, Tuple, Dict, Optional
+from app.services.file_signatures import PDF_SNIFF_SIZE, is_pdf_header, read_header
+
+# pypdf and pikepdf are imported on first use rather than at server start
+if TYPE_CHECKING:
+    import pikepdf
+    from pypdf import PdfReader, PdfWriter
+
+
+# Merged output stays in memory up to this size, then spills to a temp file
+MERGE_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+# Pages per worker task when splitting a whole PDF: enough to amortize
+# re-opening the reader in each worker, small enough to spread the load
+SPLIT_BLOCK_MIN_PAGES = 8
+SPLIT_BLOCK_MAX_PAGES = 16
+
+# Split page PDFs are small and mostly hold already-compressed streams:
+# level 1 deflate is several times faster than the default with little size cost
+PDF_ZIP_DEFLATE_LEVEL = 1
+
+# PDFs larger than this are read through a memory map instead of being
+# loaded into memory whole (pypdf reads path-opened files into a buffer)
+PDF_MMAP_THRESHOLD = 50 * 1024 * 1024
+
+# One comma-separated page range token: "5", "1-5" or empty, whitespace allowed.
+# Numbers may carry a leading "+", as int() accepted before the regex parser.
+# Every token ends at a comma or the end of the string, so consecutive
+# matches cover the whole input exactly when it is well-formed.
+_RANGE_TOKEN_RE = re.compile(r'\s*(?:(\+?\d+)\s*(?:-\s*(\+?\d+)\s*)?)?(?:,|\Z)')
+
+
+@lru_cache(maxsize=1)
+def _load_pikepdf():
+    """Import pikepdf if it is installed (optional), else return None."""
+    try:
+        import pikepdf
+    except ImportError:
+        return None
+    return pikepdf
+
+
+@contextmanager
+def _open_reader(pdf_path: Path) -> Iterator["PdfReader"]:
+    """
+    Open a PdfReader, memory-mapping files above PDF_MMAP_THRESHOLD.
+
+    With a map the kernel only pages in the parts of the file the reader
+    touches. The reader must not be used after the with block exits.
+    """
+    from pypdf import PdfReader
+
+    if pdf_path.stat().st_size <= PDF_MMAP_THRESHOLD:
+        yield PdfReader(pdf_path)
+        return
+
+    with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PdfReader(mapped)
 
 
 def get_pdf_info(pdf_path: Path) -> Dict:
@@ -18,9 +83,10 @@ def get_pdf_info(pdf_path: Path) -> Dict:
         Dictionary with page count and other metadata
     """
     try:
-        reader = PdfReader(pdf_path)
+        with _open_reader(pdf_path) as reader:
+            page_count = len(reader.pages)
         return {
-            "page_count": len(reader.pages),
+            "page_count": page_count,
             "filename": pdf_path.name,
             "size": pdf_path.stat().st_size
         }
@@ -28,6 +94,55 @@ def get_pdf_info(pdf_path: Path) -> Dict:
         raise ValueError(f"Failed to read PDF: {str(e)}")
 
 
+def inspect_pdf(pdf_path: Path) -> Tuple[bool, Optional[Dict]]:
+    """
+    Validate a PDF and read its information with a single parse.
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        Tuple of (is_valid, info) where info has the same keys as
+        get_pdf_info plus "is_encrypted", or None if the PDF is invalid
+    """
+    if not _has_pdf_header(pdf_path):
+        return False, None
+
+    try:
+        with _open_reader(pdf_path) as reader:
+            page_count = len(reader.pages)
+            is_encrypted = reader.is_encrypted
+    except Exception:
+        return False, None
+
+    if page_count == 0:
+        return False, None
+
+    return True, {
+        "page_count": page_count,
+        "filename": pdf_path.name,
+        "size": pdf_path.stat().st_size,
+        "is_encrypted": is_encrypted
+    }
+
+
+def _merge_writer(pdf_paths: List[Path]) -> "PdfWriter":
+    """
+    Build a writer holding all pages from the PDFs in order.
+
+    Each source is appended in one call, which imports objects shared
+    between its pages (fonts, images) once by reference, so memory tracks
+    the number of unique objects rather than the page count. Outlines are
+    not imported, matching a page-by-page copy.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for pdf_path in pdf_paths:
+        writer.append(PdfReader(pdf_path), import_outline=False)
+    return writer
+
+
 def merge_pdfs(pdf_paths: List[Path], output_path: Path) -> Path:
     """
     Merge multiple PDF files into one.
@@ -46,13 +161,7 @@ def merge_pdfs(pdf_paths: List[Path], output_path: Path) -> Path:
         raise ValueError("No PDF files provided for merging")
 
     try:
-        writer = PdfWriter()
-
-        # Add all pages from all PDFs in order
-        for pdf_path in pdf_paths:
-            reader = PdfReader(pdf_path)
-            for page in reader.pages:
-                writer.add_page(page)
+        writer = _merge_writer(pdf_paths)
 
         # Write merged PDF
         with open(output_path, 'wb') as output_file:
@@ -64,13 +173,101 @@ def merge_pdfs(pdf_paths: List[Path], output_path: Path) -> Path:
         raise ValueError(f"Failed to merge PDFs: {str(e)}")
 
 
-def split_pdf_all(pdf_path: Path, output_dir: Path) -> Tuple[Path, int]:
+def merge_pdfs_to_stream(pdf_paths: List[Path]) -> tempfile.SpooledTemporaryFile:
+    """
+    Merge multiple PDF files into a spooled temporary file.
+
+    The result is kept in memory up to MERGE_SPOOL_MAX_SIZE and only
+    spills to disk beyond that, so it can be streamed straight back to
+    the client without staging a file in the output directory.
+
+    Args:
+        pdf_paths: List of PDF file paths in merge order
+
+    Returns:
+        Spooled file holding the merged PDF, positioned at the start
+
+    Raises:
+        ValueError: If no PDFs provided or merge fails
+    """
+    if not pdf_paths:
+        raise ValueError("No PDF files provided for merging")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=MERGE_SPOOL_MAX_SIZE)
+    try:
+        writer = _merge_writer(pdf_paths)
+        writer.write(spool)
+        spool.seek(0)
+        return spool
+
+    except Exception as e:
+        spool.close()
+        raise ValueError(f"Failed to merge PDFs: {str(e)}")
+
+
+def _page_blocks(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Divide page indices into consecutive (start, end) blocks for the workers."""
+    size = math.ceil(page_count / max(1, workers))
+    size = max(SPLIT_BLOCK_MIN_PAGES, min(SPLIT_BLOCK_MAX_PAGES, size))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _page_bytes(reader: "PdfReader", page_index: int) -> bytes:
+    """Serialize a single page of a PDF as a standalone PDF document."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_page(reader.pages[page_index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _pikepdf_page_bytes(source: "pikepdf.Pdf", page_index: int) -> bytes:
+    """Serialize a single page with pikepdf, copying its streams without re-encoding."""
+    with _load_pikepdf().new() as document:
+        document.pages.append(source.pages[page_index])
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+
+
+def _write_page_block(pdf_path: Path, start: int, end: int) -> List[bytes]:
+    """
+    Serialize pages [start, end) of a PDF as one document per page.
+
+    Runs inside a worker process, so it opens its own reader once per block.
+    When pikepdf is installed, qpdf copies each page's streams byte-for-byte
+    instead of pypdf cloning and re-serializing them; pypdf is the fallback.
+
+    Returns:
+        Page PDFs as bytes, in page order
+    """
+    pikepdf = _load_pikepdf()
+    if pikepdf is not None:
+        with pikepdf.open(pdf_path) as source:
+            return [_pikepdf_page_bytes(source, page_num) for page_num in range(start, end)]
+
+    with _open_reader(pdf_path) as reader:
+        return [_page_bytes(reader, page_num) for page_num in range(start, end)]
+
+
+def split_pdf_all(
+    pdf_path: Path,
+    output_dir: Path,
+    executor: Optional[Executor] = None
+) -> Tuple[Path, int]:
     """
     Split a PDF into individual pages.
 
+    Pages are serialized in blocks of consecutive pages. With an executor
+    the blocks are serialized in parallel (use a process pool: pypdf holds
+    the GIL), and only the ZIP step runs in the calling thread.
+
     Args:
         pdf_path: Path to PDF file
-        output_dir: Directory to save individual pages
+        output_dir: Directory to save the ZIP archive
+        executor: Optional executor to serialize page blocks in parallel
 
     Returns:
         Tuple of (ZIP path, number of pages)
@@ -79,36 +276,37 @@ def split_pdf_all(pdf_path: Path, output_dir: Path) -> Tuple[Path, int]:
         ValueError: If split fails
     """
     try:
-        reader = PdfReader(pdf_path)
-        page_count = len(reader.pages)
+        with _open_reader(pdf_path) as reader:
+            page_count = len(reader.pages)
 
         if page_count == 0:
             raise ValueError("PDF has no pages")
 
-        # Create individual PDFs for each page
-        page_paths = []
         base_name = pdf_path.stem
+        blocks = _page_blocks(page_count, os.cpu_count() or 1)
 
-        for page_num in range(page_count):
-            writer = PdfWriter()
-            writer.add_page(reader.pages[page_num])
-
-            # Page numbers are 1-indexed for user display
-            page_path = output_dir / f"{base_name}_page_{page_num + 1}.pdf"
-            with open(page_path, 'wb') as output_file:
-                writer.write(output_file)
-
-            page_paths.append(page_path)
-
-        # Create ZIP archive
+        # Serialize each page to memory, one block per task
+        block_pages: Dict[int, List[bytes]] = {}
+        if executor is None or len(blocks) == 1:
+            for start, end in blocks:
+                block_pages[start] = _write_page_block(pdf_path, start, end)
+        else:
+            futures = {
+                executor.submit(_write_page_block, pdf_path, start, end): start
+                for start, end in blocks
+            }
+            for future in as_completed(futures):
+                block_pages[futures[future]] = future.result()
+
+        # Write pages straight into the ZIP archive (no per-page temp files)
         zip_path = output_dir / f"{base_name}_split.zip"
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for page_path in page_paths:
-                zipf.write(page_path, page_path.name)
-
-        # Clean up individual PDFs (keep only ZIP)
-        for page_path in page_paths:
-            page_path.unlink()
+        with zipfile.ZipFile(
+            zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=PDF_ZIP_DEFLATE_LEVEL
+        ) as zipf:
+            for start in sorted(block_pages):
+                for offset, page_data in enumerate(block_pages[start]):
+                    # Page numbers are 1-indexed for user display
+                    zipf.writestr(f"{base_name}_page_{start + offset + 1}.pdf", page_data)
 
         return zip_path, page_count
 
@@ -125,6 +323,9 @@ def parse_page_range(range_string: str, max_pages: int) -> List[int]:
     - "1-5" -> [1, 2, 3, 4, 5]
     - "1-3,5,7-9" -> [1, 2, 3, 5, 7, 8, 9]
 
+    Whitespace and empty tokens are ignored and numbers may have a leading
+    "+". Other int() spellings such as "1_0" are rejected as invalid.
+
     Args:
         range_string: Page range specification
         max_pages: Maximum valid page number
@@ -138,53 +339,43 @@ def parse_page_range(range_string: str, max_pages: int) -> List[int]:
     if not range_string or not range_string.strip():
         raise ValueError("Page range cannot be empty")
 
-    pages = set()
-
-    # Split by comma
-    parts = range_string.split(',')
-
-    for part in parts:
-        part = part.strip()
-        if not part:
+    # One flag byte per page: marking a range is a slice write, and reading
+    # the flags back in order replaces sorting a set of ints
+    selected = bytearray(max_pages + 1)
+    position = 0
+
+    for match in _RANGE_TOKEN_RE.finditer(range_string):
+        # A gap between tokens means something unparseable sits there
+        if match.start() != position:
+            part = range_string[position:].split(',', 1)[0].strip()
+            if '-' in part:
+                raise ValueError(f"Invalid range format: {part}")
+            raise ValueError(f"Invalid page number: {part}")
+        position = match.end()
+
+        first, last = match.group(1, 2)
+        if first is None:
+            continue  # Empty token, e.g. "1,,3"
+
+        start = int(first)
+        if last is None:
+            if start < 1 or start > max_pages:
+                raise ValueError(f"Page {start} is out of bounds (1-{max_pages})")
+            selected[start] = 1
             continue
 
-        # Check if it's a range (e.g., "1-5")
-        if '-' in part:
-            try:
-                start, end = part.split('-', 1)
-                start = int(start.strip())
-                end = int(end.strip())
-
-                if start < 1 or end > max_pages:
-                    raise ValueError(f"Page range {start}-{end} is out of bounds (1-{max_pages})")
-
-                if start > end:
-                    raise ValueError(f"Invalid range: {start}-{end} (start > end)")
-
-                pages.update(range(start, end + 1))
-
-            except ValueError as e:
-                if "invalid literal" in str(e):
-                    raise ValueError(f"Invalid range format: {part}")
-                raise
-
-        else:
-            # Single page number
-            try:
-                page_num = int(part.strip())
-
-                if page_num < 1 or page_num > max_pages:
-                    raise ValueError(f"Page {page_num} is out of bounds (1-{max_pages})")
-
-                pages.add(page_num)
-
-            except ValueError:
-                raise ValueError(f"Invalid page number: {part}")
+        end = int(last)
+        if start < 1 or end > max_pages:
+            raise ValueError(f"Page range {start}-{end} is out of bounds (1-{max_pages})")
+        if start > end:
+            raise ValueError(f"Invalid range: {start}-{end} (start > end)")
+        selected[start:end + 1] = b'\x01' * (end - start + 1)
 
+    pages = list(itertools.compress(range(max_pages + 1), selected))
     if not pages:
         raise ValueError("No valid pages specified")
 
-    return sorted(list(pages))
+    return pages
 
 
 def split_pdf_range(
@@ -203,77 +394,89 @@ def split_pdf_range(
     Returns:
         Tuple of (output path, number of pages extracted)
         - If single page: returns PDF path
-        - If multiple pages: returns ZIP path
+        - If one contiguous range: returns a single multi-page PDF path
+        - If multiple separate pages: returns ZIP path
 
     Raises:
         ValueError: If extraction fails
     """
-    try:
-        reader = PdfReader(pdf_path)
-        max_pages = len(reader.pages)
-
-        # Parse page range
-        page_numbers = parse_page_range(page_range, max_pages)
+    from pypdf import PdfWriter
 
-        if not page_numbers:
-            raise ValueError("No valid pages to extract")
+    try:
+        with _open_reader(pdf_path) as reader:
+            max_pages = len(reader.pages)
 
-        base_name = pdf_path.stem
+            # Parse page range
+            page_numbers = parse_page_range(page_range, max_pages)
 
-        # If only one page, return as single PDF
-        if len(page_numbers) == 1:
-            writer = PdfWriter()
-            # Page numbers are 1-indexed, but array is 0-indexed
-            writer.add_page(reader.pages[page_numbers[0] - 1])
+            if not page_numbers:
+                raise ValueError("No valid pages to extract")
 
-            output_path = output_dir / f"{base_name}_page_{page_numbers[0]}.pdf"
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
+            base_name = pdf_path.stem
 
-            return output_path, 1
+            # If only one page, return as single PDF
+            if len(page_numbers) == 1:
+                writer = PdfWriter()
+                # Page numbers are 1-indexed, but array is 0-indexed
+                writer.add_page(reader.pages[page_numbers[0] - 1])
 
-        # Multiple pages: create individual PDFs and ZIP them
-        page_paths = []
+                output_path = output_dir / f"{base_name}_page_{page_numbers[0]}.pdf"
+                with open(output_path, 'wb') as output_file:
+                    writer.write(output_file)
 
-        for page_num in page_numbers:
-            writer = PdfWriter()
-            writer.add_page(reader.pages[page_num - 1])  # Convert to 0-indexed
+                return output_path, 1
 
-            page_path = output_dir / f"{base_name}_page_{page_num}.pdf"
-            with open(page_path, 'wb') as output_file:
-                writer.write(output_file)
+            # One contiguous range (e.g. "1-50"): a single PDF holding those pages
+            first, last = page_numbers[0], page_numbers[-1]
+            if last - first + 1 == len(page_numbers):
+                writer = PdfWriter()
+                for page_num in page_numbers:
+                    writer.add_page(reader.pages[page_num - 1])
 
-            page_paths.append(page_path)
+                output_path = output_dir / f"{base_name}_pages_{first}-{last}.pdf"
+                with open(output_path, 'wb') as output_file:
+                    writer.write(output_file)
 
-        # Create ZIP archive
-        zip_path = output_dir / f"{base_name}_pages.zip"
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for page_path in page_paths:
-                zipf.write(page_path, page_path.name)
+                return output_path, len(page_numbers)
 
-        # Clean up individual PDFs
-        for page_path in page_paths:
-            page_path.unlink()
+            # Separate pages: write each page PDF straight into a ZIP archive
+            zip_path = output_dir / f"{base_name}_pages.zip"
+            with zipfile.ZipFile(
+                zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=PDF_ZIP_DEFLATE_LEVEL
+            ) as zipf:
+                for page_num in page_numbers:
+                    # Convert to 0-indexed
+                    zipf.writestr(f"{base_name}_page_{page_num}.pdf", _page_bytes(reader, page_num - 1))
 
-        return zip_path, len(page_numbers)
+            return zip_path, len(page_numbers)
 
     except Exception as e:
         raise ValueError(f"Failed to extract pages: {str(e)}")
 
 
+def _has_pdf_header(file_path: Path) -> bool:
+    """Check for the %PDF- header without parsing the file."""
+    return is_pdf_header(read_header(file_path, PDF_SNIFF_SIZE))
+
+
 def validate_pdf_file(file_path: Path) -> bool:
     """
     Validate if a file is a valid PDF.
 
+    Files without a PDF header are rejected before parsing.
+
     Args:
         file_path: Path to file
 
     Returns:
         True if file is a valid PDF
     """
+    if not _has_pdf_header(file_path):
+        return False
+
     try:
-        reader = PdfReader(file_path)
-        # Check if it has at least one page
-        return len(reader.pages) > 0
+        with _open_reader(file_path) as reader:
+            # Check if it has at least one page
+            return len(reader.pages) > 0
     except Exception:
         return False
@@ -0,0 +1,190 @@
+"""Helpers for saving uploaded files to disk."""
+
+import asyncio
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from app.config import settings
+from app.services.file_signatures import (
+    PDF_SNIFF_SIZE,
+    SNIFF_SIZE,
+    is_image_header,
+    is_pdf_header,
+    is_video_header
+)
+
+
+# Read uploads in 1 MiB chunks so memory use stays flat regardless of file size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Upload IDs: a per-process counter seeded from the start time. The PID is
+# appended so workers sharing the upload/output dirs never collide
+_upload_ids = itertools.count(int(time.time() * 1000) << 16)
+
+# Per-request upload ceiling in bytes, set by the usage limit dependency
+# from the client's tier (None = fall back to settings.max_upload_bytes)
+_upload_limit: ContextVar[Optional[int]] = ContextVar("upload_limit", default=None)
+
+# Upload type -> (header check, error detail, bytes to sniff)
+_TYPE_CHECKS = {
+    "image": (is_image_header, "Invalid or unsupported image file", SNIFF_SIZE),
+    "video": (is_video_header, "Video file is invalid or corrupted", SNIFF_SIZE),
+    "pdf": (is_pdf_header, "Invalid PDF file", PDF_SNIFF_SIZE),
+}
+
+
+def set_upload_limit(max_bytes: int) -> None:
+    """
+    Cap the size of uploads saved while handling the current request.
+
+    Args:
+        max_bytes: Maximum accepted upload size in bytes
+    """
+    _upload_limit.set(max_bytes)
+
+
+def upload_limit() -> int:
+    """Get the upload size limit in bytes for the current request."""
+    limit = _upload_limit.get()
+    return settings.max_upload_bytes if limit is None else limit
+
+
+async def save_upload(
+    file: UploadFile,
+    dest: Path,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    max_bytes: Optional[int] = None,
+    expected_type: Optional[str] = None
+) -> int:
+    """
+    Stream an uploaded file to disk chunk by chunk.
+
+    When expected_type is given, the first bytes of the upload are checked
+    against known file signatures before anything is written, so garbage
+    uploads are rejected without costing a disk write or a decoder run.
+
+    Args:
+        file: Uploaded file
+        dest: Destination path
+        chunk_size: Bytes to read per chunk
+        max_bytes: Maximum accepted size (defaults to upload_limit())
+        expected_type: "image", "video" or "pdf" to sniff the upload (None = no check)
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        HTTPException: 400 if the upload doesn't match expected_type,
+            413 if the upload exceeds max_bytes
+    """
+    if max_bytes is None:
+        max_bytes = upload_limit()
+
+    header = b""
+    if expected_type is not None:
+        is_valid_header, detail, sniff_size = _TYPE_CHECKS[expected_type]
+        header = await file.read(sniff_size)
+        if not is_valid_header(header):
+            raise HTTPException(status_code=400, detail=detail)
+
+    written = 0
+
+    try:
+        with open(dest, "wb") as output_file:
+            chunk = header or await file.read(chunk_size)
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {max_bytes // (1024 * 1024)}MB upload limit"
+                    )
+                # Write off the event loop so large files don't stall other requests
+                await asyncio.to_thread(output_file.write, chunk)
+                chunk = await file.read(chunk_size)
+    except BaseException:
+        # Never leave a partial upload behind
+        dest.unlink(missing_ok=True)
+        raise
+
+    return written
+
+
+def new_upload_id() -> str:
+    """Get an ID for a request's files, unique across worker processes."""
+    # Fixed-width PID suffix keeps counter/PID pairs from running together
+    return f"{next(_upload_ids):x}{os.getpid():06x}"
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """
+    Reduce a client-supplied filename to a bare name that can't escape
+    the directory it is joined to.
+
+    Args:
+        filename: Filename from the upload (may be None or contain a path)
+
+    Returns:
+        Sanitized filename
+    """
+    name = os.path.basename((filename or "").replace("\\", "/")).replace("..", "")
+    return name or "upload"
+
+
+def prep_upload_paths(file: UploadFile, unique_id: str) -> Tuple[Path, str, str]:
+    """
+    Sanitize an upload's filename once and derive the names handlers need.
+
+    Args:
+        file: Uploaded file
+        unique_id: Per-request ID used to keep saved files apart
+
+    Returns:
+        Tuple of (input path in the upload dir, safe filename, filename stem)
+    """
+    name = safe_filename(file.filename)
+    stem = name.rsplit(".", 1)[0] if "." in name[1:] else name
+    return settings.upload_dir / f"{unique_id}_{name}", name, stem
+
+
+@asynccontextmanager
+async def staged_upload(
+    file: UploadFile,
+    input_path: Path,
+    validator: Optional[Callable[[Path], bool]] = None,
+    expected_type: Optional[str] = None,
+    invalid_detail: str = "Invalid file"
+) -> AsyncIterator[Path]:
+    """
+    Save an upload, validate it, and delete it when the block exits.
+
+    Usage:
+        async with staged_upload(file, input_path, validate_pdf_file, "pdf") as path:
+            info = await run_in_pool(PDF_POOL, get_pdf_info, path)
+
+    Args:
+        file: Uploaded file
+        input_path: Where to save the upload
+        validator: Blocking check run in a thread after saving (None = skip)
+        expected_type: Signature check passed to save_upload
+        invalid_detail: Error detail when the validator rejects the file
+
+    Yields:
+        Path of the saved upload
+
+    Raises:
+        HTTPException: 400 if the upload is invalid, 413 if it is too large
+    """
+    await save_upload(file, input_path, expected_type=expected_type)
+
+    try:
+        if validator is not None and not await asyncio.to_thread(validator, input_path):
+            raise HTTPException(status_code=400, detail=invalid_detail)
+        yield input_path
+    finally:
+        await asyncio.to_thread(input_path.unlink, missing_ok=True)
@@ -1,71 +1,221 @@
 """Usage tracking service for freemium model."""
 
+import asyncio
 import json
+import logging
+import sqlite3
+import threading
 import time
+from collections import Counter, deque
 from pathlib import Path
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Deque, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 class UsageTracker:
-    """Track usage limits for free users (by IP address)."""
+    """
+    Track usage limits for free users (by IP address).
+
+    Usage is counted in a sliding window made of hourly buckets: each bucket
+    is a Counter of conversions per IP, and the oldest bucket is dropped as
+    soon as it falls out of the window. Checking a user sums their count
+    across the buckets; recording a conversion only touches the newest one.
+    Per-IP updates are guarded by a fixed set of sharded locks so different
+    users never contend on the same lock.
+
+    The counters live in memory and are persisted to SQLite in WAL mode.
+    Requests only mark what changed; a background task flushes the changed
+    (ip, bucket) rows every FLUSH_INTERVAL_SECONDS in one transaction, so a
+    burst of conversions costs one write instead of one per request. Pro
+    status changes are rare and paid for, so they are written immediately.
+    """
+
+    NUM_LOCK_SHARDS = 16
+    BUCKET_SECONDS = 3600
+    FLUSH_INTERVAL_SECONDS = 1.0
 
-    def __init__(self, storage_path: str = "usage_data.json"):
+    def __init__(
+        self,
+        storage_path: str = "usage_data.db",
+        legacy_json_path: str = "usage_data.json"
+    ):
         self.storage_path = Path(storage_path)
+        self.legacy_json_path = Path(legacy_json_path)
         self.free_daily_limit = 5  # Free users get 5 conversions per day
         self.free_file_size_limit_mb = 25  # Free users limited to 25MB
+        self.pro_file_size_limit_mb = 500  # Pro users limited to 500MB
+        self.window_buckets = 24  # 24 hourly buckets = rolling day
+
+        self._buckets: Deque[Tuple[int, Counter]] = deque()
+        self._pro_users: Set[str] = set()
+        self._locks = [threading.Lock() for _ in range(self.NUM_LOCK_SHARDS)]
+        self._rotate_lock = threading.Lock()
+        self._db_lock = threading.Lock()  # sqlite3 connections are not thread-safe
+
+        # Changes waiting for the next flush
+        self._dirty_lock = threading.Lock()
+        self._dirty_rows: Set[Tuple[str, int]] = set()
+        self._prune_before: Optional[int] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self._conn = self._connect()
         self._load_data()
 
+    def _lock_for(self, ip_address: str) -> threading.Lock:
+        """Get the lock shard responsible for an IP address."""
+        return self._locks[hash(ip_address) % self.NUM_LOCK_SHARDS]
+
+    def _bucket_index(self, timestamp: float) -> int:
+        """Get the bucket index for a timestamp."""
+        return int(timestamp // self.BUCKET_SECONDS)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the usage database (autocommit, WAL) and create its tables."""
+        conn = sqlite3.connect(
+            str(self.storage_path),
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS usage (
+                ip TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (ip, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS pro_users (
+                ip TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+        """)
+        return conn
+
     def _load_data(self):
         """Load usage data from disk."""
-        if self.storage_path.exists():
-            try:
-                with open(self.storage_path, 'r') as f:
-                    self.data = json.load(f)
-            except Exception:
-                self.data = {}
-        else:
-            self.data = {}
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT bucket, ip, count FROM usage ORDER BY bucket"
+            ).fetchall()
+            pro_rows = self._conn.execute("SELECT ip FROM pro_users").fetchall()
+
+        if not rows and not pro_rows and self.legacy_json_path.exists():
+            self._import_legacy_json()
+            return
 
-    def _save_data(self):
-        """Save usage data to disk."""
+        for index, ip, count in rows:
+            if not self._buckets or self._buckets[-1][0] != index:
+                self._buckets.append((index, Counter()))
+            self._buckets[-1][1][ip] = count
+        self._pro_users = {ip for (ip,) in pro_rows}
+
+        self._rotate()
+
+    def _import_legacy_json(self):
+        """Move usage data from the old JSON file into the database."""
         try:
-            with open(self.storage_path, 'w') as f:
-                json.dump(self.data, f)
+            with open(self.legacy_json_path, 'r') as f:
+                data = json.load(f)
         except Exception:
+            return
+
+        if "buckets" in data:
+            for index, counts in data.get("buckets", []):
+                self._buckets.append((int(index), Counter(counts)))
+            self._pro_users = set(data.get("pro_users", []))
+        else:
+            # Legacy format: {ip: {"count", "last_reset", "is_pro"}}
+            legacy_buckets: Dict[int, Counter] = {}
+            for ip, user_data in data.items():
+                if user_data.get('is_pro', False):
+                    self._pro_users.add(ip)
+                if user_data.get('count', 0):
+                    index = self._bucket_index(user_data.get('last_reset', 0))
+                    legacy_buckets.setdefault(index, Counter())[ip] += user_data['count']
+            for index in sorted(legacy_buckets):
+                self._buckets.append((index, legacy_buckets[index]))
+
+        self._rotate()
+
+        try:
+            with self._db_lock:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO usage (ip, bucket, count) VALUES (?, ?, ?)",
+                    [
+                        (ip, index, count)
+                        for index, counts in self._buckets
+                        for ip, count in counts.items()
+                    ]
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO pro_users (ip) VALUES (?)",
+                    [(ip,) for ip in self._pro_users]
+                )
+                self._conn.execute("COMMIT")
+            # Don't import the same file again on the next start
+            self.legacy_json_path.rename(self.legacy_json_path.with_suffix(".json.migrated"))
+        except (sqlite3.Error, OSError):
             pass
 
-    def _cleanup_old_data(self):
-        """Remove usage data older than 2 days."""
-        cutoff_time = time.time() - (48 * 3600)  # 2 days ago
-
-        to_remove = []
-        for ip, data in self.data.items():
-            if data.get('last_reset', 0) < cutoff_time:
-                to_remove.append(ip)
-
-        for ip in to_remove:
-            del self.data[ip]
-
-    def _get_user_data(self, ip_address: str) -> Dict:
-        """Get or create user data for IP address."""
-        if ip_address not in self.data:
-            self.data[ip_address] = {
-                'count': 0,
-                'last_reset': time.time(),
-                'is_pro': False
-            }
+    def _rotate(self) -> Tuple[int, Counter]:
+        """
+        Drop buckets that have left the window and return the current bucket.
+
+        Returns:
+            (index, Counter) for the current hour
+        """
+        current_index = self._bucket_index(time.time())
+
+        # Fast path: the newest bucket is still current
+        if self._buckets and self._buckets[-1][0] == current_index:
+            return self._buckets[-1]
 
-        # Reset count if it's a new day
-        user_data = self.data[ip_address]
-        last_reset = user_data.get('last_reset', 0)
-        hours_since_reset = (time.time() - last_reset) / 3600
+        with self._rotate_lock:
+            oldest_allowed = current_index - self.window_buckets + 1
+            expired = False
+            while self._buckets and self._buckets[0][0] < oldest_allowed:
+                self._buckets.popleft()
+                expired = True
 
-        if hours_since_reset >= 24:
-            user_data['count'] = 0
-            user_data['last_reset'] = time.time()
+            if not self._buckets or self._buckets[-1][0] != current_index:
+                self._buckets.append((current_index, Counter()))
 
-        return user_data
+            bucket = self._buckets[-1]
+
+        if expired:
+            with self._dirty_lock:
+                self._prune_before = oldest_allowed
+
+        return bucket
+
+    def _usage_in_window(self, ip_address: str) -> Tuple[int, int]:
+        """
+        Get a user's conversion count within the window.
+
+        Returns:
+            (count, index of the oldest bucket holding usage, or -1 if none)
+        """
+        self._rotate()
+
+        total = 0
+        oldest_index = -1
+        for index, counts in tuple(self._buckets):
+            count = counts.get(ip_address, 0)
+            if count:
+                total += count
+                if oldest_index < 0:
+                    oldest_index = index
+
+        return total, oldest_index
+
+    def _hours_until_reset(self, oldest_index: int) -> float:
+        """Hours until the oldest bucket with usage leaves the window."""
+        if oldest_index < 0:
+            return 0
+        expires_at = (oldest_index + self.window_buckets) * self.BUCKET_SECONDS
+        return max(0, (expires_at - time.time()) / 3600)
 
     def can_process(self, ip_address: str, file_size_mb: float = 0) -> tuple[bool, str]:
         """
@@ -74,13 +224,10 @@ class UsageTracker:
         Returns:
             (can_process, reason_if_not)
         """
-        self._cleanup_old_data()
-        user_data = self._get_user_data(ip_address)
-
         # Pro users have unlimited access
-        if user_data.get('is_pro', False):
-            if file_size_mb > 500:
-                return False, "File size exceeds 500MB limit (even for Pro users)"
+        if ip_address in self._pro_users:
+            if file_size_mb > self.pro_file_size_limit_mb:
+                return False, f"File size exceeds {self.pro_file_size_limit_mb}MB limit (even for Pro users)"
             return True, ""
 
         # Free users: check file size limit
@@ -88,48 +235,127 @@ class UsageTracker:
             return False, f"Free users limited to {self.free_file_size_limit_mb}MB files. Upgrade to Pro for 500MB limit."
 
         # Free users: check daily conversion limit
-        if user_data['count'] >= self.free_daily_limit:
-            hours_until_reset = 24 - ((time.time() - user_data['last_reset']) / 3600)
+        used, oldest_index = self._usage_in_window(ip_address)
+        if used >= self.free_daily_limit:
+            hours_until_reset = self._hours_until_reset(oldest_index)
             return False, f"Free limit of {self.free_daily_limit} conversions per day reached. Upgrade to Pro for unlimited conversions or wait {int(hours_until_reset)} hours."
 
         return True, ""
 
+    def max_file_size_mb(self, ip_address: str) -> int:
+        """Get the largest file size in MB the user may upload."""
+        if ip_address in self._pro_users:
+            return self.pro_file_size_limit_mb
+        return self.free_file_size_limit_mb
+
     def increment_usage(self, ip_address: str):
         """Increment usage count for user."""
-        user_data = self._get_user_data(ip_address)
+        if ip_address in self._pro_users:
+            return
 
-        if not user_data.get('is_pro', False):
-            user_data['count'] += 1
-            self._save_data()
+        index, bucket = self._rotate()
+        with self._lock_for(ip_address):
+            bucket[ip_address] += 1
+        with self._dirty_lock:
+            self._dirty_rows.add((ip_address, index))
 
     def get_usage_stats(self, ip_address: str) -> Dict:
         """Get usage statistics for user."""
-        user_data = self._get_user_data(ip_address)
-
-        if user_data.get('is_pro', False):
+        if ip_address in self._pro_users:
             return {
                 'is_pro': True,
                 'conversions_used': 'unlimited',
                 'conversions_remaining': 'unlimited',
-                'max_file_size_mb': 500,
+                'max_file_size_mb': self.pro_file_size_limit_mb,
                 'hours_until_reset': 0
             }
 
-        hours_until_reset = 24 - ((time.time() - user_data['last_reset']) / 3600)
+        used, oldest_index = self._usage_in_window(ip_address)
 
         return {
             'is_pro': False,
-            'conversions_used': user_data['count'],
-            'conversions_remaining': max(0, self.free_daily_limit - user_data['count']),
+            'conversions_used': used,
+            'conversions_remaining': max(0, self.free_daily_limit - used),
             'max_file_size_mb': self.free_file_size_limit_mb,
-            'hours_until_reset': max(0, int(hours_until_reset))
+            'hours_until_reset': int(self._hours_until_reset(oldest_index))
         }
 
     def set_pro_status(self, ip_address: str, is_pro: bool = True):
-        """Set Pro status for a user (after payment)."""
-        user_data = self._get_user_data(ip_address)
-        user_data['is_pro'] = is_pro
-        self._save_data()
+        """
+        Set Pro status for a user (after payment).
+
+        Written straight to the database rather than left for the next
+        flush, so a crash right after a payment can't lose the upgrade.
+
+        Raises:
+            sqlite3.Error: If the change could not be saved (memory is unchanged)
+        """
+        with self._db_lock:
+            if is_pro:
+                self._conn.execute("INSERT OR IGNORE INTO pro_users (ip) VALUES (?)", (ip_address,))
+            else:
+                self._conn.execute("DELETE FROM pro_users WHERE ip = ?", (ip_address,))
+
+        with self._lock_for(ip_address):
+            if is_pro:
+                self._pro_users.add(ip_address)
+            else:
+                self._pro_users.discard(ip_address)
+
+    def flush(self):
+        """Write pending usage changes to the database in one transaction."""
+        with self._dirty_lock:
+            rows, self._dirty_rows = self._dirty_rows, set()
+            prune_before, self._prune_before = self._prune_before, None
+
+        if not rows and prune_before is None:
+            return
+
+        # Rows are written with their current in-memory count, so several
+        # increments of the same row since the last flush become one upsert
+        counts = {index: bucket for index, bucket in tuple(self._buckets)}
+        usage_rows = [
+            (ip, index, counts[index][ip])
+            for ip, index in rows
+            if index in counts
+        ]
+
+        try:
+            with self._db_lock:
+                self._conn.execute("BEGIN")
+                try:
+                    if prune_before is not None:
+                        self._conn.execute("DELETE FROM usage WHERE bucket < ?", (prune_before,))
+                    self._conn.executemany(
+                        "INSERT INTO usage (ip, bucket, count) VALUES (?, ?, ?) "
+                        "ON CONFLICT (ip, bucket) DO UPDATE SET count = excluded.count",
+                        usage_rows
+                    )
+                    self._conn.execute("COMMIT")
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            # Keep the changes for the next attempt
+            with self._dirty_lock:
+                self._dirty_rows |= rows
+                if self._prune_before is None:
+                    self._prune_before = prune_before
+
+    async def _flush_loop(self):
+        """Flush pending changes on a fixed interval."""
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                # A failed flush must not stop every later one
+                logger.exception("Usage flush failed")
+
+    def start_flusher(self):
+        """Start the periodic flush task on the running event loop."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
 
 
 # Global instance
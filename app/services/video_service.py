@@ -1,18 +1,146 @@
 """Video processing service using FFmpeg."""
 
+import asyncio
 import json
+import math
+import os
+import shutil
+import signal
 import subprocess
 import zipfile
 import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
-
-
+from typing import Callable, List, Tuple, Dict, Optional
+from app.services.file_signatures import is_video_header, read_header
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+
+# Executables resolved once at import (falls back to a PATH lookup per run)
+_FFMPEG_EXE = shutil.which("ffmpeg") or "ffmpeg"
+_FFPROBE_EXE = shutil.which("ffprobe") or "ffprobe"
+
+# Start of every FFmpeg command that writes a file: overwrite the output
+# and never read from stdin
+_FFMPEG_BASE = (_FFMPEG_EXE, "-y", "-nostdin")
+
+# Output for FFmpeg runs whose result is discarded (two-pass analysis)
+_NULL_DEVICE = "NUL" if os.name == "nt" else "/dev/null"
+
+# Video parts are already compressed; deflating them costs CPU for no gain
+VIDEO_ZIP_COMPRESSION = zipfile.ZIP_STORED
+
+# Read size when copying parts into the ZIP (zipfile.write uses 8 KB)
+VIDEO_ZIP_COPY_BUFFER_SIZE = 1024 * 1024
+
+# x264 threads per part when re-encoding a split; parts run in parallel
+# so that together they use every core without oversubscribing
+REENCODE_THREADS_PER_PART = 2
+
+# Hardware H.264 encoders in order of preference: (arguments before the
+# input, video encoder arguments), at quality roughly matching CRF 23
+VAAPI_DEVICE = "/dev/dri/renderD128"
+_HW_ENCODERS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "h264_nvenc": (
+        (),
+        ("-c:v", "h264_nvenc", "-preset", "p5", "-rc", "vbr", "-cq", "23", "-b:v", "0")
+    ),
+    "h264_qsv": (
+        (),
+        ("-c:v", "h264_qsv", "-preset", "medium", "-global_quality", "23")
+    ),
+    "h264_vaapi": (
+        ("-vaapi_device", VAAPI_DEVICE),
+        ("-vf", "format=nv12,hwupload", "-c:v", "h264_vaapi", "-qp", "23")
+    ),
+    "h264_videotoolbox": (
+        (),
+        ("-c:v", "h264_videotoolbox", "-q:v", "65")
+    ),
+}
+
+# Option in each hardware encoder's arguments that carries its quality
+# value, and the option added to target a bitrate in a single pass
+_HW_QUALITY_OPTIONS = {
+    "h264_nvenc": "-cq",
+    "h264_qsv": "-global_quality",
+    "h264_vaapi": "-qp",
+    "h264_videotoolbox": "-q:v",
+}
+_HW_BITRATE_ARGS = {
+    "h264_nvenc": ("-multipass", "fullres"),
+    "h264_vaapi": ("-rc_mode", "VBR"),
+}
+
+# Software fallback; the preset is shared by every libx264 encode (two-pass
+# requires both passes to match)
+_X264_COMMON = ("-c:v", "libx264", "-preset", "medium")
+_X264_ENCODER_ARGS = (
+    *_X264_COMMON,
+    "-crf", "23",  # Quality (lower = better, 18-28 range)
+    "-threads", str(REENCODE_THREADS_PER_PART),
+)
+
+# Two-pass log files (.log and .mbtree, hundreds of MB for long videos) go
+# to this tmpfs when it has room, keeping them off the container's disk
+PASSLOG_SHM_DIR = Path("/dev/shm")
+PASSLOG_SHM_MIN_FREE_BYTES = 512 * 1024 * 1024
+
+# Source AAC up to this factor of the requested audio bitrate is copied
+# instead of re-encoded
+AUDIO_COPY_BITRATE_TOLERANCE = 1.1
+
+# Outputs that get -movflags +faststart
+FASTSTART_SUFFIXES = (".mp4", ".m4v", ".mov")
+
+# Probe results kept in memory (keyed by path, mtime and size)
+PROBE_CACHE_SIZE = 256
+
+# Concurrent hardware encodes per split (consumer GPUs cap encoder sessions)
+HW_ENCODER_MAX_SESSIONS = 3
+
+# x264 uses about this many cores per compression; the number of
+# compressions allowed to run at once is sized from it unless
+# FFMPEG_MAX_CONCURRENT is set
+COMPRESS_THREADS_PER_JOB = 4
+COMPRESS_MAX_CONCURRENT = max(1, int(os.getenv(
+    "FFMPEG_MAX_CONCURRENT",
+    str((os.cpu_count() or 1) // COMPRESS_THREADS_PER_JOB)
+)))
+_compress_semaphore = asyncio.Semaphore(COMPRESS_MAX_CONCURRENT)
+
+# Long videos are compressed as SEGMENT_SECONDS pieces encoded in parallel,
+# since one libx264 process stops scaling past about eight cores. Each
+# piece gets SEGMENT_THREADS threads.
+SEGMENT_SECONDS = 60
+SEGMENTED_MIN_DURATION_SECONDS = 600
+SEGMENTED_MIN_CPUS = 8
+SEGMENT_THREADS = 2
+
+# Trailing FFmpeg stderr kept for error messages (the full log can be large)
+FFMPEG_STDERR_TAIL_BYTES = 4096
+
+# Added to every asyncio FFmpeg run: errors only, no banner or stats line
+_FFMPEG_LOG_ARGS = ("-hide_banner", "-loglevel", "error", "-nostats")
+
+
+@lru_cache(maxsize=1)
 def check_ffmpeg_installed() -> bool:
-    """Check if FFmpeg is installed and accessible."""
+    """
+    Check if FFmpeg is installed and accessible.
+
+    The result is cached for the life of the process; call
+    check_ffmpeg_installed.cache_clear() to re-check.
+    """
     try:
         subprocess.run(
-            ["ffmpeg", "-version"],
+            [_FFMPEG_EXE, "-version"],
             capture_output=True,
             timeout=5
         )
@@ -21,46 +149,267 @@ def check_ffmpeg_installed() -> bool:
         return False
 
 
-def get_video_duration(video_path: Path) -> float:
+@lru_cache(maxsize=1)
+def detect_hw_encoder() -> Optional[str]:
     """
-    Get video duration in seconds using ffprobe.
+    Find a working hardware H.264 encoder.
+
+    An encoder listed by ffmpeg is only compiled in, so each candidate is
+    confirmed with a one-frame test encode (the GPU or driver may be
+    missing). The result is cached for the life of the process; call
+    detect_hw_encoder.cache_clear() to re-check.
+
+    Returns:
+        Encoder name (e.g. "h264_nvenc"), or None to use libx264
+    """
+    try:
+        listing = subprocess.run(
+            [_FFMPEG_EXE, "-hide_banner", "-encoders"],
+            capture_output=True,
+            text=True,
+            timeout=10
+        ).stdout
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+
+    for name, (input_args, encoder_args) in _HW_ENCODERS.items():
+        if name not in listing:
+            continue
+        try:
+            result = subprocess.run(
+                [
+                    _FFMPEG_EXE, "-hide_banner", "-v", "error",
+                    *input_args,
+                    "-f", "lavfi", "-i", "color=size=256x256",
+                    "-frames:v", "1",
+                    *encoder_args,
+                    "-f", "null", "-"
+                ],
+                capture_output=True,
+                timeout=15
+            )
+        except subprocess.TimeoutExpired:
+            continue
+        if result.returncode == 0:
+            return name
+
+    return None
+
+
+def _video_encoder_args() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Get (input arguments, video encoder arguments) for H.264 re-encoding."""
+    encoder = detect_hw_encoder()
+    if encoder is None:
+        return (), _X264_ENCODER_ARGS
+    return _HW_ENCODERS[encoder]
+
+
+def _hw_quality_value(encoder: str, crf: int) -> int:
+    """Map an x264 CRF onto a hardware encoder's quality scale."""
+    if encoder == "h264_videotoolbox":
+        # -q:v runs 1-100, higher is better; 65 is roughly CRF 23
+        return max(1, min(100, 65 + (23 - crf) * 3))
+    # NVENC -cq, QSV -global_quality and VAAPI -qp track CRF closely
+    return crf
+
+
+def _compress_encoder_args(
+    crf: Optional[int] = None,
+    bitrate_kbps: Optional[float] = None,
+    video_filter: Optional[str] = None,
+    threads: Optional[int] = None
+) -> Tuple[List[str], List[str]]:
+    """
+    Get (input arguments, video encoder arguments) for a compression.
+
+    Uses the hardware encoder found by detect_hw_encoder() when there is
+    one, else libx264 with the concurrency thread budget. Pass either crf
+    (constant quality) or bitrate_kbps (average bitrate).
 
     Args:
-        video_path: Path to video file
+        crf: x264 CRF, mapped onto the hardware encoder's quality scale
+        bitrate_kbps: Target video bitrate in kbps
+        video_filter: Filter chain to apply before encoding (e.g. scaling)
+        threads: libx264 threads (default: the concurrency budget)
 
     Returns:
-        Duration in seconds
+        (arguments before -i, video arguments after it)
+    """
+    encoder = detect_hw_encoder()
+    filters = [video_filter] if video_filter else []
+
+    if encoder is None:
+        input_args: List[str] = []
+        args = [
+            *_X264_COMMON,
+            "-threads", str(threads or _ffmpeg_thread_budget(COMPRESS_MAX_CONCURRENT)),
+        ]
+        if bitrate_kbps is not None:
+            args += ["-b:v", f"{int(bitrate_kbps)}k"]
+        else:
+            args += ["-crf", str(crf)]
+    else:
+        input_args = list(_HW_ENCODERS[encoder][0])
+        args = list(_HW_ENCODERS[encoder][1])
+        if "-vf" in args:
+            # VAAPI uploads frames to the GPU after any other filtering
+            filters.append(args.pop(args.index("-vf") + 1))
+            args.remove("-vf")
+
+        quality_index = args.index(_HW_QUALITY_OPTIONS[encoder])
+        if bitrate_kbps is not None:
+            del args[quality_index:quality_index + 2]
+            if "-b:v" in args:
+                del args[args.index("-b:v"):args.index("-b:v") + 2]
+            args += [*_HW_BITRATE_ARGS.get(encoder, ()), "-b:v", f"{int(bitrate_kbps)}k"]
+        else:
+            args[quality_index + 1] = str(_hw_quality_value(encoder, crf))
+
+    if filters:
+        args = ["-vf", ",".join(filters), *args]
+    return input_args, args
+
+
+@lru_cache(maxsize=1)
+def _load_av():
+    """Import PyAV on first use if it is installed (optional), else return None."""
+    try:
+        import av
+    except ImportError:
+        return None
+    return av
+
+
+def _probe_in_process(path_str: str, size: int) -> Optional[Dict]:
+    """
+    Read container and stream details in-process with PyAV.
+
+    Opening the container through the libav* bindings avoids forking an
+    ffprobe process per call. PyAV is optional.
+
+    Returns:
+        The fields of ffprobe's -show_format -show_streams JSON that this
+        module reads, or None if PyAV is not installed or cannot read the
+        file (callers then use ffprobe)
+    """
+    av = _load_av()
+    if av is None:
+        return None
+
+    try:
+        with av.open(path_str) as container:
+            if not container.duration:
+                return None
+
+            streams = []
+            for stream in container.streams:
+                if stream.type == "video":
+                    streams.append({
+                        "codec_type": "video",
+                        "codec_name": stream.codec_context.name,
+                        "width": stream.width,
+                        "height": stream.height
+                    })
+                elif stream.type == "audio":
+                    bit_rate = stream.bit_rate or stream.codec_context.bit_rate or 0
+                    streams.append({
+                        "codec_type": "audio",
+                        "codec_name": stream.codec_context.name,
+                        "bit_rate": str(bit_rate)
+                    })
+
+            return {
+                "format": {
+                    "duration": str(container.duration / av.time_base),
+                    "size": str(size)
+                },
+                "streams": streams
+            }
+    except Exception:
+        return None
+
+
+def _probe(video_path: Path) -> Dict:
+    """
+    Get the probe result for a video, probing it at most once per version.
+
+    Results are cached on (path, st_mtime_ns, st_size), so a modified file
+    is probed again.
 
     Raises:
-        ValueError: If duration cannot be determined
+        ValueError: If the file cannot be probed
     """
+    try:
+        stat = video_path.stat()
+    except OSError as e:
+        raise ValueError(str(e))
+    return _probe_json(str(video_path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=PROBE_CACHE_SIZE)
+def _probe_json(path_str: str, mtime_ns: int, size: int) -> Dict:
+    """
+    Probe a file for its format and streams (PyAV when installed, else ffprobe).
+
+    Returns:
+        ffprobe-style {"format": {...}, "streams": [...]} (shared through the
+        cache; callers must not modify it)
+
+    Raises:
+        ValueError: If the file cannot be probed
+    """
+    probed = _probe_in_process(path_str, size)
+    if probed is not None:
+        return probed
+
     try:
         result = subprocess.run(
             [
-                "ffprobe",
+                _FFPROBE_EXE,
                 "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(video_path)
+                "-print_format", "json",
+                "-show_format",
+                "-show_streams",
+                path_str
             ],
             capture_output=True,
-            text=True,
             timeout=30
         )
+    except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+        raise ValueError(str(e))
+
+    if result.returncode != 0:
+        raise ValueError("Failed to read video file")
+
+    # orjson and json both raise ValueError subclasses on bad input
+    return _json_loads(result.stdout)
+
+
+def get_video_duration(video_path: Path) -> float:
+    """
+    Get video duration in seconds.
 
-        if result.returncode != 0:
-            raise ValueError("Failed to get video duration")
+    Shares one cached probe with get_video_info, so validating, estimating
+    and compressing the same file probes it once.
 
-        duration = float(result.stdout.strip())
-        return duration
+    Args:
+        video_path: Path to video file
 
-    except (subprocess.TimeoutExpired, ValueError) as e:
+    Returns:
+        Duration in seconds
+
+    Raises:
+        ValueError: If duration cannot be determined
+    """
+    try:
+        return float(_probe(video_path)["format"]["duration"])
+    except (KeyError, TypeError, ValueError) as e:
         raise ValueError(f"Failed to get video duration: {str(e)}")
 
 
 def get_video_info(video_path: Path) -> Dict:
     """
-    Get detailed video information using ffprobe.
+    Get detailed video information.
 
     Args:
         video_path: Path to video file
@@ -72,53 +421,61 @@ def get_video_info(video_path: Path) -> Dict:
         ValueError: If video info cannot be retrieved
     """
     try:
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v", "quiet",
-                "-print_format", "json",
-                "-show_format",
-                "-show_streams",
-                str(video_path)
-            ],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-
-        if result.returncode != 0:
-            raise ValueError("Failed to read video file")
-
-        data = json.loads(result.stdout)
+        data = _probe(video_path)
         format_info = data.get("format", {})
 
         duration = float(format_info.get("duration", 0))
         size = int(format_info.get("size", 0))
-
-        # Find video stream
-        video_codec = None
-        width = 0
-        height = 0
-
-        for stream in data.get("streams", []):
-            if stream.get("codec_type") == "video":
-                video_codec = stream.get("codec_name", "unknown")
-                width = stream.get("width", 0)
-                height = stream.get("height", 0)
-                break
-
-        return {
-            "filename": video_path.name,
-            "duration": duration,
-            "duration_formatted": format_duration(duration),
-            "size": size,
-            "video_codec": video_codec or "unknown",
-            "resolution": f"{width}x{height}" if width and height else "unknown"
-        }
-
-    except (subprocess.TimeoutExpired, json.JSONDecodeError, ValueError) as e:
+    except (TypeError, ValueError) as e:
         raise ValueError(f"Failed to get video info: {str(e)}")
 
+    # Find video stream
+    video_codec = None
+    width = 0
+    height = 0
+
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video":
+            video_codec = stream.get("codec_name", "unknown")
+            width = stream.get("width", 0)
+            height = stream.get("height", 0)
+            break
+
+    return {
+        "filename": video_path.name,
+        "duration": duration,
+        "duration_formatted": format_duration(duration),
+        "size": size,
+        "video_codec": video_codec or "unknown",
+        "resolution": f"{width}x{height}" if width and height else "unknown"
+    }
+
+
+def get_audio_stream(video_path: Path) -> Optional[Tuple[str, int]]:
+    """
+    Get the codec and bitrate of a video's first audio stream.
+
+    Args:
+        video_path: Path to video file
+
+    Returns:
+        (codec name, bitrate in kbps or 0 if unknown), or None if the file
+        has no audio stream or cannot be probed
+    """
+    try:
+        streams = _probe(video_path).get("streams", [])
+    except ValueError:
+        return None
+
+    for stream in streams:
+        if stream.get("codec_type") == "audio":
+            bit_rate = str(stream.get("bit_rate", "0"))
+            return (
+                stream.get("codec_name", "unknown"),
+                int(bit_rate) // 1000 if bit_rate.isdigit() else 0
+            )
+    return None
+
 
 def format_duration(seconds: float) -> str:
     """
@@ -167,7 +524,7 @@ def calculate_split_times(duration: float, num_parts: int) -> List[Tuple[float,
     return split_times
 
 
-def split_video(
+async def split_video(
     video_path: Path,
     num_parts: int,
     output_dir: Path,
@@ -176,6 +533,9 @@ def split_video(
     """
     Split video into multiple equal parts using FFmpeg.
 
+    FFmpeg runs as asyncio subprocesses with stderr discarded, so the event
+    loop stays free and no output is buffered in memory while parts encode.
+
     Args:
         video_path: Path to input video
         num_parts: Number of parts to split into (2-20)
@@ -196,105 +556,214 @@ def split_video(
         raise ValueError("Number of parts must be between 2 and 20")
 
     # Get video duration
-    duration = get_video_duration(video_path)
+    duration = await asyncio.to_thread(get_video_duration, video_path)
 
     # Calculate split times
     split_times = calculate_split_times(duration, num_parts)
 
-    # Split video
-    output_paths = []
     base_name = video_path.stem
     extension = video_path.suffix
 
-    for i, (start_time, end_time) in enumerate(split_times, 1):
-        output_filename = f"{base_name}_part{i}{extension}"
-        output_path = output_dir / output_filename
+    # Try stream copy first (fast, no quality loss): one demuxer pass
+    # writes every part
+    if use_stream_copy:
+        output_paths = await _split_stream_copy(video_path, output_dir, split_times)
+        if output_paths:
+            return output_paths
+
+    # Fallback to re-encoding, several parts at a time
+    jobs = [
+        (output_dir / f"{base_name}_part{i}{extension}", start_time, end_time - start_time)
+        for i, (start_time, end_time) in enumerate(split_times, 1)
+    ]
+    if await asyncio.to_thread(detect_hw_encoder) is None:
+        workers = max(1, (os.cpu_count() or 1) // REENCODE_THREADS_PER_PART)
+    else:
+        workers = HW_ENCODER_MAX_SESSIONS
+    semaphore = asyncio.Semaphore(workers)
 
-        segment_duration = end_time - start_time
+    async def reencode(output_path: Path, start_time: float, segment_duration: float) -> bool:
+        async with semaphore:
+            return await _split_segment_reencode(video_path, output_path, start_time, segment_duration)
 
-        # Try stream copy first (fast, no quality loss)
-        if use_stream_copy:
-            success = _split_segment_stream_copy(
-                video_path,
-                output_path,
-                start_time,
-                segment_duration
-            )
+    results = await asyncio.gather(*(reencode(*job) for job in jobs))
 
-            if success:
-                output_paths.append(output_path)
-                continue
+    if not all(results):
+        # Cleanup partial files
+        for output_path, _, _ in jobs:
+            output_path.unlink(missing_ok=True)
+        failed_part = results.index(False) + 1
+        raise ValueError(f"Failed to split video at part {failed_part}")
 
-        # Fallback to re-encoding
-        success = _split_segment_reencode(
-            video_path,
-            output_path,
-            start_time,
-            segment_duration
-        )
+    return [output_path for output_path, _, _ in jobs]
+
+
+async def _ffmpeg_run_async(
+    command: List[str],
+    timeout: float,
+    capture_stderr: bool = True,
+    progress_callback: Optional[Callable[[float], None]] = None
+) -> Tuple[int, str]:
+    """
+    Run an FFmpeg command as an asyncio subprocess.
+
+    FFmpeg is told to log errors only, and stderr is read as it is produced
+    with only the last FFMPEG_STDERR_TAIL_BYTES kept. The process is killed
+    if it runs longer than timeout seconds or the caller is cancelled.
+
+    Args:
+        command: FFmpeg command line
+        timeout: Seconds to wait before killing FFmpeg
+        capture_stderr: Keep the tail of stderr (otherwise it is discarded)
+        progress_callback: Called with the seconds of output written so far,
+            read from FFmpeg's -progress reports
+
+    Returns:
+        (return code, tail of stderr)
+
+    Raises:
+        asyncio.TimeoutError: If FFmpeg runs longer than timeout
+    """
+    progress_args = ("-progress", "pipe:1") if progress_callback else ()
+    process = await asyncio.create_subprocess_exec(
+        command[0], *_FFMPEG_LOG_ARGS, *progress_args, *command[1:],
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE if progress_callback else asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE if capture_stderr else asyncio.subprocess.DEVNULL,
+        start_new_session=True  # Own process group, so it can be stopped as a whole
+    )
+    tail = bytearray()
+
+    async def drain_stderr():
+        if process.stderr is None:
+            return
+        while True:
+            chunk = await process.stderr.read(65536)
+            if not chunk:
+                return
+            tail.extend(chunk)
+            del tail[:-FFMPEG_STDERR_TAIL_BYTES]
+
+    async def read_progress():
+        if process.stdout is None:
+            return
+        # Reports are key=value lines; out_time_us is the output position
+        async for line in process.stdout:
+            key, _, value = line.decode("ascii", errors="replace").strip().partition("=")
+            if key == "out_time_us" and value.isdigit():
+                progress_callback(int(value) / 1_000_000)
+
+    readers = [asyncio.ensure_future(drain_stderr()), asyncio.ensure_future(read_progress())]
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+        await asyncio.gather(*readers)  # The pipes reach EOF once FFmpeg exits
+        return process.returncode, tail.decode("utf-8", errors="replace")
+    finally:
+        # Timed out or the request was cancelled: don't leave FFmpeg running
+        if process.returncode is None:
+            await _stop_process(process)
+        for reader in readers:
+            reader.cancel()
+
+
+async def _stop_process(process: asyncio.subprocess.Process):
+    """
+    Kill a process and its process group, and wait for it to exit.
 
-        if success:
-            output_paths.append(output_path)
+    SIGKILL rather than SIGTERM: on SIGTERM FFmpeg keeps going to flush its
+    encoders and finalize an output that is about to be deleted anyway.
+    """
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
         else:
-            # Cleanup partial files
-            for path in output_paths:
-                path.unlink(missing_ok=True)
-            raise ValueError(f"Failed to split video at part {i}")
+            process.kill()  # Windows has no process groups
+    except ProcessLookupError:
+        pass  # Already exited
+    await process.wait()
+
 
-    return output_paths
+async def _run_ffmpeg(command: List[str], timeout: float) -> bool:
+    """
+    Run an FFmpeg command, discarding its output.
+
+    Returns:
+        True if FFmpeg exited successfully within timeout seconds
+    """
+    try:
+        returncode, _ = await _ffmpeg_run_async(command, timeout, capture_stderr=False)
+    except asyncio.TimeoutError:
+        return False
+    return returncode == 0
 
 
-def _split_segment_stream_copy(
+async def _split_stream_copy(
     input_path: Path,
-    output_path: Path,
-    start_time: float,
-    duration: float
-) -> bool:
+    output_dir: Path,
+    split_times: List[Tuple[float, float]]
+) -> Optional[List[Path]]:
     """
-    Split a video segment using stream copy (fast, no re-encoding).
+    Split a video into all parts with a single stream-copy FFmpeg run.
+
+    Uses the segment muxer, so the input is demuxed once rather than once
+    per part. Cuts land on the first keyframe at or after each split time.
 
     Args:
         input_path: Input video path
-        output_path: Output video path
-        start_time: Start time in seconds
-        duration: Segment duration in seconds
+        output_dir: Directory to save output files
+        split_times: List of (start_time, end_time) tuples in seconds
 
     Returns:
-        True if successful, False otherwise
+        Paths of the parts in order, or None if stream copy failed
     """
+    base_name = input_path.stem
+    extension = input_path.suffix
+    output_paths = [
+        output_dir / f"{base_name}_part{i}{extension}"
+        for i in range(1, len(split_times) + 1)
+    ]
+
+    # The segment muxer may write more or fewer parts than requested, so it
+    # writes into a private directory (same filesystem, so moves are renames)
+    # and only the expected parts are moved out on success
+    segment_dir = Path(tempfile.mkdtemp(prefix=".split_", dir=output_dir))
+    segment_paths = [segment_dir / path.name for path in output_paths]
+
     try:
         command = [
-            "ffmpeg",
-            "-y",  # Overwrite output
+            *_FFMPEG_BASE,
             "-i", str(input_path),
-            "-ss", str(start_time),
-            "-t", str(duration),
             "-c", "copy",  # Stream copy (no re-encoding)
+            "-f", "segment",
+            "-segment_times", ",".join(f"{start:.3f}" for start, _ in split_times[1:]),
+            "-segment_start_number", "1",
+            "-reset_timestamps", "1",  # Each part starts at zero
             "-avoid_negative_ts", "make_zero",  # Fix timestamp issues
-            str(output_path)
+            str(segment_dir / f"{base_name}_part%d{extension}")
         ]
 
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minutes max per part
-        )
+        success = await _run_ffmpeg(command, timeout=600)  # 10 minutes max
 
-        # Check if output file exists and has reasonable size
-        if result.returncode == 0 and output_path.exists() and output_path.stat().st_size > 1000:
-            return True
+        # Every part must exist with a reasonable size (too few keyframes
+        # produces fewer parts than requested)
+        if success and all(
+            path.exists() and path.stat().st_size > 1000 for path in segment_paths
+        ):
+            for segment_path, output_path in zip(segment_paths, output_paths):
+                os.replace(segment_path, output_path)
+            return output_paths
 
-        # Stream copy failed, cleanup
-        output_path.unlink(missing_ok=True)
-        return False
+    except Exception:
+        pass
 
-    except (subprocess.TimeoutExpired, Exception):
-        output_path.unlink(missing_ok=True)
-        return False
+    finally:
+        # Drops failed output and any extra parts
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    return None
 
 
-def _split_segment_reencode(
+async def _split_segment_reencode(
     input_path: Path,
     output_path: Path,
     start_time: float,
@@ -303,6 +772,8 @@ def _split_segment_reencode(
     """
     Split a video segment with re-encoding (slower, but more reliable).
 
+    Uses a hardware H.264 encoder when one is available, else libx264.
+
     Args:
         input_path: Input video path
         output_path: Output video path
@@ -312,35 +783,33 @@ def _split_segment_reencode(
     Returns:
         True if successful, False otherwise
     """
+    input_args, encoder_args = await asyncio.to_thread(_video_encoder_args)
+
     try:
         command = [
-            "ffmpeg",
-            "-y",
-            "-i", str(input_path),
+            *_FFMPEG_BASE,
+            *input_args,
+            # Input seeking: jump via the index instead of decoding and
+            # discarding everything before the start (still frame-accurate
+            # when re-encoding)
             "-ss", str(start_time),
             "-t", str(duration),
-            "-c:v", "libx264",  # Re-encode video
-            "-preset", "medium",
-            "-crf", "23",  # Quality (lower = better, 18-28 range)
+            "-i", str(input_path),
+            *encoder_args,  # Re-encode video
             "-c:a", "aac",  # Re-encode audio
             "-b:a", "128k",
             str(output_path)
         ]
 
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minutes max per part
-        )
+        success = await _run_ffmpeg(command, timeout=600)  # 10 minutes max per part
 
-        if result.returncode == 0 and output_path.exists() and output_path.stat().st_size > 1000:
+        if success and output_path.exists() and output_path.stat().st_size > 1000:
             return True
 
         output_path.unlink(missing_ok=True)
         return False
 
-    except (subprocess.TimeoutExpired, Exception):
+    except Exception:
         output_path.unlink(missing_ok=True)
         return False
 
@@ -349,6 +818,11 @@ def create_video_zip(video_paths: List[Path], zip_path: Path) -> Path:
     """
     Create a ZIP archive from multiple video files.
 
+    Entries are stored uncompressed (VIDEO_ZIP_COMPRESSION), so writing the
+    archive runs at close to copy speed and each video stays seekable
+    inside it without decompression. Parts are copied in 1 MB reads, and
+    archives over 4 GB use ZIP64.
+
     Args:
         video_paths: List of video file paths
         zip_path: Output ZIP file path
@@ -356,9 +830,14 @@ def create_video_zip(video_paths: List[Path], zip_path: Path) -> Path:
     Returns:
         Path to created ZIP file
     """
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    with zipfile.ZipFile(zip_path, 'w', VIDEO_ZIP_COMPRESSION, allowZip64=True) as zipf:
         for video_path in video_paths:
-            zipf.write(video_path, video_path.name)
+            # Sizes are known up front, so zipfile writes ZIP64 headers for
+            # large parts directly instead of fixing them up afterwards
+            zinfo = zipfile.ZipInfo.from_file(video_path, video_path.name)
+            zinfo.compress_type = VIDEO_ZIP_COMPRESSION
+            with open(video_path, 'rb') as source, zipf.open(zinfo, 'w') as dest:
+                shutil.copyfileobj(source, dest, VIDEO_ZIP_COPY_BUFFER_SIZE)
 
     return zip_path
 
@@ -367,13 +846,17 @@ def validate_video_file(file_path: Path) -> bool:
     """
     Validate if a file is a supported video.
 
+    Files without a recognized container signature are rejected from
+    their first bytes alone; everything else must also probe to a positive
+    duration (the probe is cached, so later calls on the file are free).
+
     Args:
         file_path: Path to file
 
     Returns:
         True if file is a valid video
     """
-    if not file_path.exists():
+    if not is_video_header(read_header(file_path)):
         return False
 
     try:
@@ -388,6 +871,66 @@ def validate_video_file(file_path: Path) -> bool:
 # VIDEO COMPRESSION FUNCTIONS
 # ============================================================================
 
+# CRF per quality preset
+_CRF_MAP = {
+    "low": 28,      # Smaller file, lower quality
+    "medium": 23,   # Balanced (default)
+    "high": 18      # Larger file, higher quality
+}
+
+# Output height per resolution option
+_RESOLUTION_MAP = {
+    "2160p": 2160,
+    "1440p": 1440,
+    "1080p": 1080,
+    "720p": 720,
+    "480p": 480,
+    "360p": 360
+}
+
+# Bytes to MB for size estimates
+_MB_INV = 1.0 / (1024 * 1024)
+
+# Single-pass target-size calibration: x264 medium lands near CRF 23 at
+# this many bits per pixel (3 Mbps for 1080p30), and CRF rises about 3
+# for each halving of the bitrate. Frame rate is assumed to be 30 fps.
+_CRF_REFERENCE_BPP = 0.048
+_CRF_REFERENCE = 23
+_CRF_PER_BITRATE_HALVING = 3
+_CRF_CALIBRATION_FPS = 30
+_CRF_RANGE = (16, 38)
+
+# VBV lets the average drift a few percent past -maxrate, so the cap is
+# set this far below the target bitrate
+CAPPED_BITRATE_HEADROOM = 0.92
+
+# Rough output/input size ratio per quality preset (typical CRF results)
+_PRESET_SIZE_RATIOS = {
+    "low": 0.3,    # ~70% reduction
+    "medium": 0.5,  # ~50% reduction
+    "high": 0.7     # ~30% reduction
+}
+
+
+def _ffmpeg_thread_budget(concurrency: int) -> int:
+    """
+    Get the -threads value for one of `concurrency` simultaneous encodes.
+
+    Without a cap each libx264 instance starts a thread per core, so
+    concurrent compressions oversubscribe the CPU. A single job keeps
+    FFmpeg's automatic choice (0).
+
+    Args:
+        concurrency: Number of encodes that may run at once
+
+    Returns:
+        Thread count to pass to -threads
+    """
+    if concurrency <= 1:
+        return 0
+    return max(1, (os.cpu_count() or concurrency) // concurrency)
+
+
 def _get_crf_for_preset(preset: str) -> int:
     """
     Get CRF value for quality preset.
@@ -402,30 +945,101 @@ def _get_crf_for_preset(preset: str) -> int:
     Returns:
         CRF value
     """
-    crf_map = {
-        "low": 28,      # Smaller file, lower quality
-        "medium": 23,   # Balanced (default)
-        "high": 18      # Larger file, higher quality
-    }
-    return crf_map.get(preset.lower(), 23)
+    return _CRF_MAP.get(preset.lower(), 23)
+
+
+def _passlog_dir() -> Optional[str]:
+    """
+    Get the directory for two-pass log files.
+
+    Returns:
+        PASSLOG_SHM_DIR if it is writable with enough free space, else None
+        for the default temp directory
+    """
+    if not os.access(PASSLOG_SHM_DIR, os.W_OK):
+        return None
+    try:
+        stats = os.statvfs(PASSLOG_SHM_DIR)
+    except (AttributeError, OSError):  # No statvfs on Windows
+        return None
+    if stats.f_bavail * stats.f_frsize < PASSLOG_SHM_MIN_FREE_BYTES:
+        return None
+    return str(PASSLOG_SHM_DIR)
+
+
+def _crf_for_bitrate(bitrate_kbps: float, resolution: str) -> int:
+    """
+    Estimate the CRF that lands near a video bitrate at a resolution.
+
+    Args:
+        bitrate_kbps: Target video bitrate in kbps
+        resolution: Source resolution as "WIDTHxHEIGHT"
 
+    Returns:
+        CRF value, or the medium preset's CRF if the resolution is unknown
+    """
+    try:
+        width, height = (int(part) for part in resolution.split("x"))
+    except ValueError:
+        return _CRF_MAP["medium"]
+    if width <= 0 or height <= 0:
+        return _CRF_MAP["medium"]
+
+    bits_per_pixel = bitrate_kbps * 1000 / (width * height * _CRF_CALIBRATION_FPS)
+    crf = _CRF_REFERENCE + _CRF_PER_BITRATE_HALVING * math.log2(_CRF_REFERENCE_BPP / bits_per_pixel)
+    low, high = _CRF_RANGE
+    return max(low, min(high, round(crf)))
+
+
+def _audio_args(video_path: Path, audio_bitrate_kbps: int) -> List[str]:
+    """
+    Get audio arguments: copy AAC that already fits the bitrate, else encode.
+
+    Args:
+        video_path: Input video path
+        audio_bitrate_kbps: Audio bitrate in kbps for re-encoding
+
+    Returns:
+        FFmpeg audio arguments
+    """
+    audio = get_audio_stream(video_path)
+    if audio is not None:
+        codec, bitrate_kbps = audio
+        if codec == "aac" and 0 < bitrate_kbps <= audio_bitrate_kbps * AUDIO_COPY_BITRATE_TOLERANCE:
+            return ["-c:a", "copy"]
+    return ["-c:a", "aac", "-b:a", f"{audio_bitrate_kbps}k"]
 
-def compress_target_size(
+
+def _container_args(output_path: Path) -> List[str]:
+    """Move the MP4/MOV index to the front so playback can start while downloading."""
+    if output_path.suffix.lower() in FASTSTART_SUFFIXES:
+        return ["-movflags", "+faststart"]
+    return []
+
+
+async def compress_target_size(
     video_path: Path,
     target_size_mb: float,
     output_path: Path,
-    audio_bitrate_kbps: int = 128
+    audio_bitrate_kbps: int = 128,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    strict_size: bool = False
 ) -> Path:
     """
-    Compress video to target file size using two-pass encoding.
+    Compress video to target file size.
 
-    Two-pass encoding provides accurate bitrate targeting for precise file size.
+    By default a single CRF pass is run with the bitrate capped at the
+    target (-maxrate/-bufsize), so the file ends up at or somewhat below
+    the target size in half the time. strict_size uses two-pass encoding,
+    which hits the size accurately.
 
     Args:
         video_path: Input video path
         target_size_mb: Target output size in MB
         output_path: Output video path
         audio_bitrate_kbps: Audio bitrate in kbps (default 128)
+        progress_callback: Called with the seconds of video encoded so far
+        strict_size: Use two-pass encoding to hit the size precisely
 
     Returns:
         Path to compressed video
@@ -438,7 +1052,7 @@ def compress_target_size(
         raise RuntimeError("FFmpeg is not installed")
 
     # Get video duration
-    duration = get_video_duration(video_path)
+    duration = await asyncio.to_thread(get_video_duration, video_path)
 
     # Calculate target video bitrate
     # Formula: ((target_size_mb * 8192) / duration_seconds) - audio_bitrate_kbps
@@ -447,18 +1061,38 @@ def compress_target_size(
     if target_bitrate_kbps < 100:
         raise ValueError("Target size too small - would result in unplayable video")
 
-    # Use temp directory for two-pass log files
-    with tempfile.TemporaryDirectory() as temp_dir:
+    if not strict_size:
+        info = await asyncio.to_thread(get_video_info, video_path)
+        crf = _crf_for_bitrate(target_bitrate_kbps, info["resolution"])
+
+        async with _compress_semaphore:
+            success = await _run_capped_crf_encode(
+                video_path,
+                output_path,
+                crf,
+                target_bitrate_kbps * CAPPED_BITRATE_HEADROOM,
+                audio_bitrate_kbps,
+                progress_callback
+            )
+
+        if not success:
+            raise ValueError("Video compression failed")
+        return output_path
+
+    # Use temp directory for two-pass log files (in memory when possible)
+    with tempfile.TemporaryDirectory(dir=_passlog_dir()) as temp_dir:
         passlogfile = Path(temp_dir) / "ffmpeg2pass"
 
         # Two-pass encoding for accurate bitrate targeting
-        success = _run_two_pass_encode(
-            video_path,
-            output_path,
-            target_bitrate_kbps,
-            audio_bitrate_kbps,
-            passlogfile
-        )
+        async with _compress_semaphore:
+            success = await _run_two_pass_encode(
+                video_path,
+                output_path,
+                target_bitrate_kbps,
+                audio_bitrate_kbps,
+                passlogfile,
+                progress_callback
+            )
 
         if not success:
             raise ValueError("Video compression failed")
@@ -466,11 +1100,12 @@ def compress_target_size(
     return output_path
 
 
-def compress_quality(
+async def compress_quality(
     video_path: Path,
     quality_preset: str,
     output_path: Path,
-    audio_bitrate_kbps: int = 128
+    audio_bitrate_kbps: int = 128,
+    progress_callback: Optional[Callable[[float], None]] = None
 ) -> Path:
     """
     Compress video using quality preset (CRF encoding).
@@ -482,6 +1117,7 @@ def compress_quality(
         quality_preset: Quality preset (low/medium/high)
         output_path: Output video path
         audio_bitrate_kbps: Audio bitrate in kbps (default 128)
+        progress_callback: Called with the seconds of video encoded so far
 
     Returns:
         Path to compressed video
@@ -493,34 +1129,39 @@ def compress_quality(
     if not check_ffmpeg_installed():
         raise RuntimeError("FFmpeg is not installed")
 
+    if await asyncio.to_thread(_should_encode_segmented, video_path):
+        return await compress_quality_segmented(
+            video_path, quality_preset, output_path, audio_bitrate_kbps, progress_callback
+        )
+
     crf = _get_crf_for_preset(quality_preset)
+    input_args, encoder_args = await asyncio.to_thread(_compress_encoder_args, crf)
+    audio_args = await asyncio.to_thread(_audio_args, video_path, audio_bitrate_kbps)
 
     try:
         command = [
-            "ffmpeg",
-            "-y",
+            *_FFMPEG_BASE,
+            *input_args,
             "-i", str(video_path),
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-crf", str(crf),
-            "-c:a", "aac",
-            "-b:a", f"{audio_bitrate_kbps}k",
+            *encoder_args,
+            *audio_args,
+            *_container_args(output_path),
             str(output_path)
         ]
 
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=3600  # 1 hour timeout
-        )
+        async with _compress_semaphore:
+            returncode, stderr = await _ffmpeg_run_async(
+                command,
+                timeout=3600,  # 1 hour timeout
+                progress_callback=progress_callback
+            )
 
-        if result.returncode != 0 or not output_path.exists():
-            raise ValueError(f"FFmpeg failed: {result.stderr}")
+        if returncode != 0 or not output_path.exists():
+            raise ValueError(f"FFmpeg failed: {stderr}")
 
         return output_path
 
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         output_path.unlink(missing_ok=True)
         raise ValueError("Compression timed out (>1 hour)")
     except Exception as e:
@@ -528,18 +1169,246 @@ def compress_quality(
         raise ValueError(f"Compression failed: {str(e)}")
 
 
-def compress_resolution(
+def _should_encode_segmented(video_path: Path) -> bool:
+    """Check whether a quality compression should be split into parallel segments."""
+    if (os.cpu_count() or 1) < SEGMENTED_MIN_CPUS or detect_hw_encoder() is not None:
+        return False
+    try:
+        return get_video_duration(video_path) > SEGMENTED_MIN_DURATION_SECONDS
+    except ValueError:
+        return False
+
+
+async def compress_quality_segmented(
+    video_path: Path,
+    quality_preset: str,
+    output_path: Path,
+    audio_bitrate_kbps: int = 128,
+    progress_callback: Optional[Callable[[float], None]] = None
+) -> Path:
+    """
+    Compress a long video using quality preset, encoding segments in parallel.
+
+    The video stream is cut at keyframes into SEGMENT_SECONDS pieces without
+    re-encoding, the pieces are encoded concurrently and the results are
+    joined with the concat demuxer. Audio is taken once from the original,
+    so there are no gaps at the joins. compress_quality switches to this
+    for long videos on machines with many cores.
+
+    Args:
+        video_path: Input video path
+        quality_preset: Quality preset (low/medium/high)
+        output_path: Output video path
+        audio_bitrate_kbps: Audio bitrate in kbps (default 128)
+        progress_callback: Called with the seconds of video encoded so far,
+            as each segment finishes
+
+    Returns:
+        Path to compressed video
+
+    Raises:
+        ValueError: If compression fails
+        RuntimeError: If FFmpeg is not installed
+    """
+    if not check_ffmpeg_installed():
+        raise RuntimeError("FFmpeg is not installed")
+
+    crf = _get_crf_for_preset(quality_preset)
+    input_args, encoder_args = await asyncio.to_thread(
+        _compress_encoder_args, crf, threads=SEGMENT_THREADS
+    )
+    audio_args = await asyncio.to_thread(_audio_args, video_path, audio_bitrate_kbps)
+
+    # This compression's share of the cores, split between segment encodes
+    workers = max(1, (os.cpu_count() or 1) // COMPRESS_MAX_CONCURRENT // SEGMENT_THREADS)
+
+    try:
+        async with _compress_semaphore:
+            with tempfile.TemporaryDirectory(dir=output_path.parent) as temp_dir:
+                segment_dir = Path(temp_dir)
+                sources = await _split_video_stream(video_path, segment_dir)
+                encoded = await _encode_segments(
+                    sources, input_args, encoder_args, workers, progress_callback
+                )
+                await _concat_segments(encoded, video_path, audio_args, output_path)
+
+        if not output_path.exists():
+            raise ValueError("FFmpeg produced no output")
+
+        return output_path
+
+    except asyncio.TimeoutError:
+        output_path.unlink(missing_ok=True)
+        raise ValueError("Compression timed out (>1 hour)")
+    except Exception as e:
+        output_path.unlink(missing_ok=True)
+        raise ValueError(f"Compression failed: {str(e)}")
+
+
+async def _split_video_stream(video_path: Path, segment_dir: Path) -> List[Path]:
+    """
+    Cut a video's video stream into segments at keyframes (no re-encoding).
+
+    Returns:
+        Segment paths in order
+
+    Raises:
+        ValueError: If FFmpeg fails
+    """
+    command = [
+        *_FFMPEG_BASE,
+        "-i", str(video_path),
+        "-map", "0:v:0",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(SEGMENT_SECONDS),
+        "-reset_timestamps", "1",
+        str(segment_dir / "source%05d.mkv")
+    ]
+    returncode, stderr = await _ffmpeg_run_async(command, timeout=3600)
+    if returncode != 0:
+        raise ValueError(f"FFmpeg failed: {stderr}")
+    sources = sorted(segment_dir.glob("source*.mkv"))
+    if not sources:
+        raise ValueError("FFmpeg produced no segments")
+    return sources
+
+
+async def _encode_segments(
+    sources: List[Path],
+    input_args: List[str],
+    encoder_args: List[str],
+    workers: int,
+    progress_callback: Optional[Callable[[float], None]] = None
+) -> List[Path]:
+    """
+    Encode segments concurrently, at most `workers` at a time.
+
+    If one segment fails, the others are cancelled.
+
+    Returns:
+        Encoded segment paths in order
+
+    Raises:
+        ValueError: If FFmpeg fails on a segment
+    """
+    semaphore = asyncio.Semaphore(workers)
+    encoded_seconds = 0.0
+
+    async def encode(source: Path) -> Path:
+        nonlocal encoded_seconds
+        target = source.with_name(source.name.replace("source", "encoded", 1))
+        command = [
+            *_FFMPEG_BASE,
+            *input_args,
+            "-i", str(source),
+            *encoder_args,
+            "-an",
+            str(target)
+        ]
+        async with semaphore:
+            returncode, stderr = await _ffmpeg_run_async(command, timeout=3600)
+        if returncode != 0:
+            raise ValueError(f"FFmpeg failed: {stderr}")
+
+        if progress_callback:
+            encoded_seconds += await asyncio.to_thread(get_video_duration, source)
+            progress_callback(encoded_seconds)
+        return target
+
+    tasks = [asyncio.ensure_future(encode(source)) for source in sources]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        # A segment failed or we were cancelled: stop the rest before the
+        # temp directory is removed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _concat_segments(
+    encoded: List[Path],
+    video_path: Path,
+    audio_args: List[str],
+    output_path: Path
+):
+    """
+    Join encoded segments and add the original's audio.
+
+    Raises:
+        ValueError: If FFmpeg fails
+    """
+    # Entries are relative to the list file, which sits next to the segments
+    list_path = encoded[0].parent / "segments.txt"
+    list_path.write_text("".join(f"file '{path.name}'\n" for path in encoded))
+
+    command = [
+        *_FFMPEG_BASE,
+        "-f", "concat",
+        "-i", str(list_path),
+        "-i", str(video_path),
+        "-map", "0:v",
+        "-map", "1:a:0?",
+        "-c:v", "copy",
+        *audio_args,
+        *_container_args(output_path),
+        str(output_path)
+    ]
+    returncode, stderr = await _ffmpeg_run_async(command, timeout=3600)
+    if returncode != 0:
+        raise ValueError(f"FFmpeg failed: {stderr}")
+
+
+async def _remux_if_not_larger(video_path: Path, height: int, output_path: Path) -> bool:
+    """
+    Copy the streams into output_path if the video is no taller than height.
+
+    Returns:
+        True if the remux was done, False if the video must be re-encoded
+    """
+    try:
+        info = await asyncio.to_thread(get_video_info, video_path)
+        source_height = int(info["resolution"].split("x")[1])
+    except (ValueError, IndexError):
+        return False
+    if source_height > height:
+        return False
+
+    command = [
+        *_FFMPEG_BASE,
+        "-i", str(video_path),
+        "-c", "copy",
+        *_container_args(output_path),
+        str(output_path)
+    ]
+    try:
+        returncode, _ = await _ffmpeg_run_async(command, timeout=3600)
+    except asyncio.TimeoutError:
+        returncode = -1
+    if returncode == 0 and output_path.exists():
+        return True
+
+    # Streams the container can't hold as-is: fall back to re-encoding
+    output_path.unlink(missing_ok=True)
+    return False
+
+
+async def compress_resolution(
     video_path: Path,
     resolution: str,
     quality_preset: str,
     output_path: Path,
-    audio_bitrate_kbps: int = 128
+    audio_bitrate_kbps: int = 128,
+    progress_callback: Optional[Callable[[float], None]] = None
 ) -> Path:
     """
     Compress video by downscaling to target resolution.
 
     Maintains aspect ratio using scale filter: scale=-2:{height}
     The -2 ensures even dimensions (required by libx264).
+    Videos already at or below the target height are remuxed without
+    re-encoding.
 
     Args:
         video_path: Input video path
@@ -547,6 +1416,7 @@ def compress_resolution(
         quality_preset: Quality preset (low/medium/high)
         output_path: Output video path
         audio_bitrate_kbps: Audio bitrate in kbps (default 128)
+        progress_callback: Called with the seconds of video encoded so far
 
     Returns:
         Path to compressed video
@@ -559,48 +1429,52 @@ def compress_resolution(
         raise RuntimeError("FFmpeg is not installed")
 
     # Map resolution to height
-    resolution_map = {
-        "2160p": 2160,
-        "1440p": 1440,
-        "1080p": 1080,
-        "720p": 720,
-        "480p": 480,
-        "360p": 360
-    }
-
-    height = resolution_map.get(resolution)
+    height = _RESOLUTION_MAP.get(resolution)
     if not height:
         raise ValueError(f"Invalid resolution: {resolution}")
 
+    # Already at or below the target height: remux instead of re-encoding
+    if await _remux_if_not_larger(video_path, height, output_path):
+        return output_path
+
     crf = _get_crf_for_preset(quality_preset)
 
+    # Maintain aspect ratio, ensure even dimensions
+    scale_filter = f"scale=-2:{height}"
+    if quality_preset.lower() == "low":
+        # fast_bilinear without dithering scales several times faster than
+        # the default bicubic; the difference is lost at low quality anyway
+        scale_filter += ":flags=fast_bilinear:sws_dither=none"
+
+    input_args, encoder_args = await asyncio.to_thread(
+        _compress_encoder_args, crf, video_filter=scale_filter
+    )
+    audio_args = await asyncio.to_thread(_audio_args, video_path, audio_bitrate_kbps)
+
     try:
         command = [
-            "ffmpeg",
-            "-y",
+            *_FFMPEG_BASE,
+            *input_args,
             "-i", str(video_path),
-            "-vf", f"scale=-2:{height}",  # Maintain aspect ratio, ensure even dimensions
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-crf", str(crf),
-            "-c:a", "aac",
-            "-b:a", f"{audio_bitrate_kbps}k",
+            *encoder_args,
+            *audio_args,
+            *_container_args(output_path),
             str(output_path)
         ]
 
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=3600  # 1 hour timeout
-        )
+        async with _compress_semaphore:
+            returncode, stderr = await _ffmpeg_run_async(
+                command,
+                timeout=3600,  # 1 hour timeout
+                progress_callback=progress_callback
+            )
 
-        if result.returncode != 0 or not output_path.exists():
-            raise ValueError(f"FFmpeg failed: {result.stderr}")
+        if returncode != 0 or not output_path.exists():
+            raise ValueError(f"FFmpeg failed: {stderr}")
 
         return output_path
 
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         output_path.unlink(missing_ok=True)
         raise ValueError("Compression timed out (>1 hour)")
     except Exception as e:
@@ -634,7 +1508,47 @@ def estimate_output_size(
         ValueError: If parameters are invalid
     """
     info = get_video_info(video_path)
-    original_size_mb = info["size"] / (1024 * 1024)
+    return _estimate_from_info(info, mode, target_size_mb, quality_preset, resolution)
+
+
+def estimate_output_size_batch(video_path: Path, requests: List[Dict]) -> List[Dict]:
+    """
+    Estimate output sizes for several settings from one metadata lookup.
+
+    Args:
+        video_path: Input video path
+        requests: Dictionaries with the keyword arguments of
+            estimate_output_size ("mode", and optionally "target_size_mb",
+            "quality_preset", "resolution")
+
+    Returns:
+        One estimate dictionary per request, in order
+
+    Raises:
+        ValueError: If video info cannot be retrieved
+    """
+    info = get_video_info(video_path)
+    return [
+        _estimate_from_info(
+            info,
+            request["mode"],
+            request.get("target_size_mb"),
+            request.get("quality_preset"),
+            request.get("resolution")
+        )
+        for request in requests
+    ]
+
+
+def _estimate_from_info(
+    info: Dict,
+    mode: str,
+    target_size_mb: Optional[float] = None,
+    quality_preset: Optional[str] = None,
+    resolution: Optional[str] = None
+) -> Dict:
+    """Estimate output size from get_video_info() metadata (see estimate_output_size)."""
+    original_size_mb = info["size"] * _MB_INV
 
     estimated_size_mb = original_size_mb
 
@@ -643,12 +1557,7 @@ def estimate_output_size(
 
     elif mode == "quality" and quality_preset:
         # Rough estimates based on typical CRF compression ratios
-        compression_ratios = {
-            "low": 0.3,    # ~70% reduction
-            "medium": 0.5,  # ~50% reduction
-            "high": 0.7     # ~30% reduction
-        }
-        ratio = compression_ratios.get(quality_preset.lower(), 0.5)
+        ratio = _PRESET_SIZE_RATIOS.get(quality_preset.lower(), 0.5)
         estimated_size_mb = original_size_mb * ratio
 
     elif mode == "resolution" and resolution and quality_preset:
@@ -658,47 +1567,92 @@ def estimate_output_size(
             current_height = int(res_parts[1])
 
             # Map target resolution
-            resolution_map = {
-                "2160p": 2160,
-                "1440p": 1440,
-                "1080p": 1080,
-                "720p": 720,
-                "480p": 480,
-                "360p": 360
-            }
-            target_height = resolution_map.get(resolution, current_height)
+            target_height = _RESOLUTION_MAP.get(resolution, current_height)
 
             # Resolution scaling factor (based on pixel count reduction)
-            scale_factor = (target_height / current_height) ** 2
+            scale_factor = (target_height * target_height) / (current_height * current_height)
 
             # Quality factor
-            quality_factors = {
-                "low": 0.3,
-                "medium": 0.5,
-                "high": 0.7
-            }
-            quality_factor = quality_factors.get(quality_preset.lower(), 0.5)
+            quality_factor = _PRESET_SIZE_RATIOS.get(quality_preset.lower(), 0.5)
 
             estimated_size_mb = original_size_mb * scale_factor * quality_factor
         else:
             # Fallback if resolution parsing fails
             estimated_size_mb = original_size_mb * 0.5
 
-    reduction_pct = ((original_size_mb - estimated_size_mb) / original_size_mb) * 100
+    reduction_pct = (1 - estimated_size_mb / original_size_mb) * 100
 
+    # Sizes are never negative, so rounding half up with int() is exact
+    # enough and cheaper than round(); the reduction can be negative
     return {
-        "original_size_mb": round(original_size_mb, 2),
-        "estimated_size_mb": round(estimated_size_mb, 2),
+        "original_size_mb": int(original_size_mb * 100 + 0.5) / 100,
+        "estimated_size_mb": int(estimated_size_mb * 100 + 0.5) / 100,
         "reduction_percent": round(reduction_pct, 1)
     }
 
 
-def _run_two_pass_encode(
+async def _run_capped_crf_encode(
+    input_path: Path,
+    output_path: Path,
+    crf: int,
+    max_bitrate_kbps: float,
+    audio_bitrate_kbps: int,
+    progress_callback: Optional[Callable[[float], None]] = None
+) -> bool:
+    """
+    Run a single constant-quality pass with the video bitrate capped.
+
+    Args:
+        input_path: Input video path
+        output_path: Output video path
+        crf: x264 CRF (mapped for hardware encoders)
+        max_bitrate_kbps: Maximum video bitrate in kbps
+        audio_bitrate_kbps: Audio bitrate in kbps
+        progress_callback: Called with the seconds of video encoded so far
+
+    Returns:
+        True if successful, False otherwise
+    """
+    input_args, encoder_args = await asyncio.to_thread(_compress_encoder_args, crf)
+    audio_args = await asyncio.to_thread(_audio_args, input_path, audio_bitrate_kbps)
+
+    try:
+        command = [
+            *_FFMPEG_BASE,
+            *input_args,
+            "-i", str(input_path),
+            *encoder_args,
+            "-maxrate", f"{int(max_bitrate_kbps)}k",
+            "-bufsize", f"{int(max_bitrate_kbps * 2)}k",
+            *audio_args,
+            *_container_args(output_path),
+            str(output_path)
+        ]
+
+        returncode, _ = await _ffmpeg_run_async(
+            command,
+            timeout=3600,
+            progress_callback=progress_callback
+        )
+
+        if returncode == 0 and output_path.exists():
+            return True
+
+        output_path.unlink(missing_ok=True)
+        return False
+
+    except (asyncio.TimeoutError, Exception):
+        output_path.unlink(missing_ok=True)
+        return False
+
+
+async def _run_two_pass_encode(
     input_path: Path,
     output_path: Path,
     video_bitrate_kbps: float,
     audio_bitrate_kbps: int,
-    passlogfile: Path
+    passlogfile: Path,
+    progress_callback: Optional[Callable[[float], None]] = None
 ) -> bool:
     """
     Run two-pass FFmpeg encoding for accurate bitrate targeting.
@@ -706,70 +1660,73 @@ def _run_two_pass_encode(
     Pass 1: Analyze video and create log file
     Pass 2: Encode video using log file for accurate bitrate control
 
+    With a hardware encoder only one pass is run; the encoder handles
+    bitrate control itself (NVENC with its own multipass mode).
+
     Args:
         input_path: Input video path
         output_path: Output video path
         video_bitrate_kbps: Target video bitrate in kbps
         audio_bitrate_kbps: Audio bitrate in kbps
         passlogfile: Path for two-pass log files (without extension)
+        progress_callback: Called with the seconds encoded by the final pass
 
     Returns:
         True if successful, False otherwise
     """
-    try:
-        # Pass 1: Analysis
-        command_pass1 = [
-            "ffmpeg",
-            "-y",
-            "-i", str(input_path),
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-b:v", f"{int(video_bitrate_kbps)}k",
-            "-pass", "1",
-            "-passlogfile", str(passlogfile),
-            "-an",  # No audio in pass 1
-            "-f", "null",
-            "NUL" if subprocess.os.name == "nt" else "/dev/null"  # Windows vs Unix
-        ]
-
-        result1 = subprocess.run(
-            command_pass1,
-            capture_output=True,
-            text=True,
-            timeout=3600
-        )
+    input_args, encoder_args = await asyncio.to_thread(
+        _compress_encoder_args, bitrate_kbps=video_bitrate_kbps
+    )
+    audio_args = await asyncio.to_thread(_audio_args, input_path, audio_bitrate_kbps)
+    hardware = detect_hw_encoder() is not None
 
-        if result1.returncode != 0:
-            return False
+    try:
+        if not hardware:
+            # Pass 1: Analysis. The preset must match pass 2 (x264 rejects
+            # stats from different B-frame/weightp/mbtree settings), so speed
+            # comes from x264's reduced first-pass motion search and from
+            # skipping every stream but video
+            command_pass1 = [
+                *_FFMPEG_BASE,
+                "-i", str(input_path),
+                *encoder_args,
+                "-fastfirstpass", "1",
+                "-pass", "1",
+                "-passlogfile", str(passlogfile),
+                "-an", "-sn", "-dn",  # No audio, subtitles or data in pass 1
+                "-f", "null",
+                _NULL_DEVICE
+            ]
+
+            returncode, _ = await _ffmpeg_run_async(command_pass1, timeout=3600)
+
+            if returncode != 0:
+                return False
 
         # Pass 2: Encoding
         command_pass2 = [
-            "ffmpeg",
-            "-y",
+            *_FFMPEG_BASE,
+            *input_args,
             "-i", str(input_path),
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-b:v", f"{int(video_bitrate_kbps)}k",
-            "-pass", "2",
-            "-passlogfile", str(passlogfile),
-            "-c:a", "aac",
-            "-b:a", f"{audio_bitrate_kbps}k",
+            *encoder_args,
+            *(() if hardware else ("-pass", "2", "-passlogfile", str(passlogfile))),
+            *audio_args,
+            *_container_args(output_path),
             str(output_path)
         ]
 
-        result2 = subprocess.run(
+        returncode, _ = await _ffmpeg_run_async(
             command_pass2,
-            capture_output=True,
-            text=True,
-            timeout=3600
+            timeout=3600,
+            progress_callback=progress_callback
         )
 
-        if result2.returncode == 0 and output_path.exists():
+        if returncode == 0 and output_path.exists():
             return True
 
         output_path.unlink(missing_ok=True)
         return False
 
-    except (subprocess.TimeoutExpired, Exception):
+    except (asyncio.TimeoutError, Exception):
         output_path.unlink(missing_ok=True)
         return False
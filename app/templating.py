@@ -0,0 +1,52 @@
+"""Shared Jinja2 template environment and pre-rendered static pages."""
+
+from typing import Dict
+import jinja2
+from fastapi.responses import HTMLResponse
+from fastapi.templating import Jinja2Templates
+from app.config import settings
+
+
+# Single template environment shared by every router
+templates = Jinja2Templates(directory="templates")
+
+# Reuse compiled template bytecode across workers and restarts
+settings.template_cache_dir.mkdir(parents=True, exist_ok=True)
+templates.env.bytecode_cache = jinja2.FileSystemBytecodeCache(str(settings.template_cache_dir))
+
+if settings.environment == "production":
+    templates.env.auto_reload = False
+
+# Pages whose templates take no per-request context
+STATIC_PAGES = {
+    "landing": "landing.html",
+    "app": "index.html",
+    "pricing": "pricing.html",
+    "terms": "terms.html",
+    "privacy": "privacy.html",
+    "success": "success.html"
+}
+
+_rendered_pages: Dict[str, bytes] = {}
+
+
+def render_static_pages() -> None:
+    """Render all static pages once and keep the encoded HTML in memory."""
+    for name, template_name in STATIC_PAGES.items():
+        html = templates.get_template(template_name).render()
+        _rendered_pages[name] = html.encode("utf-8")
+
+
+def static_page(name: str) -> HTMLResponse:
+    """
+    Build a response for a pre-rendered static page.
+
+    Args:
+        name: Key in STATIC_PAGES
+
+    Returns:
+        HTML response with the cached page body
+    """
+    if name not in _rendered_pages:
+        render_static_pages()
+    return HTMLResponse(_rendered_pages[name])
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Run the app under uvicorn with uvloop and httptools."""
+import os
+import uvicorn
+from app.config import settings
+
+
+def main():
+    """Start uvicorn with the C event loop and HTTP parser."""
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=int(os.environ.get("PORT", settings.port)),
+        loop="uvloop",
+        http="httptools",
+        # Usage limits are tracked in-process, so stay single-worker unless asked
+        workers=int(os.environ.get("WEB_CONCURRENCY", 1))
+    )
+
+
+if __name__ == '__main__':
+    main()
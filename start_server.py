@@ -2,15 +2,15 @@
 """Railway startup script that properly handles PORT environment variable."""
 import os
 import sys
-import subprocess
 
 def main():
     """Start uvicorn with proper PORT handling."""
     # Debug: Print all environment variables related to PORT
-    print("=== ENVIRONMENT DEBUG ===")
-    print(f"All env vars: {list(os.environ.keys())}")
-    print(f"PORT env var: {os.environ.get('PORT', 'NOT SET')}")
-    print("========================")
+    if os.environ.get('DEBUG_BOOT'):
+        print("=== ENVIRONMENT DEBUG ===")
+        print(f"All env vars: {list(os.environ.keys())}")
+        print(f"PORT env var: {os.environ.get('PORT', 'NOT SET')}")
+        print("========================")
 
     # Get PORT from environment, default to 8000
     port = os.environ.get('PORT', '8000')
@@ -32,18 +32,19 @@ def main():
         'uvicorn',
         'app.main:app',
         '--host', '0.0.0.0',
-        '--port', str(port_num)
+        '--port', str(port_num),
+        '--loop', 'uvloop',
+        '--http', 'httptools'
     ]
 
     print(f"Executing: {' '.join(cmd)}")
 
-    # Execute uvicorn
+    # Replace this process with uvicorn so it runs as PID 1 and receives
+    # the platform's signals directly
+    sys.stdout.flush()
     try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: uvicorn exited with code {e.returncode}")
-        sys.exit(e.returncode)
-    except Exception as e:
+        os.execvp(cmd[0], cmd)
+    except OSError as e:
         print(f"ERROR: Failed to start uvicorn: {e}")
         sys.exit(1)
 
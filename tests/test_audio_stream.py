@@ -0,0 +1,88 @@
+"""Tests for streaming audio extraction."""
+
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.audio_service import STREAM_CHUNK_SIZE, extract_audio_stream
+
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+    reason="FFmpeg is not installed"
+)
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    """Generate a short test video with a sine audio track."""
+    path = tmp_path_factory.mktemp("media") / "sample.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", "testsrc=size=160x120:rate=10:duration=30",
+            "-f", "lavfi", "-i", "sine=frequency=440:duration=30",
+            "-c:v", "libx264", "-preset", "ultrafast",
+            "-c:a", "aac", "-shortest",
+            str(path)
+        ],
+        check=True
+    )
+    return path
+
+
+def test_stream_yields_complete_audio(video_path):
+    first_chunk, rest = extract_audio_stream(video_path, "wav")
+    data = first_chunk + b"".join(rest)
+
+    assert data[:4] == b"RIFF"
+    # 30 s of 44.1 kHz mono 16-bit PCM is a little over 2.6 MB
+    assert len(data) > 2_600_000
+
+
+def test_stream_rejects_unsupported_format(video_path):
+    with pytest.raises(ValueError):
+        extract_audio_stream(video_path, "xyz")
+
+
+def test_stream_reports_ffmpeg_failure(tmp_path):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"\x00" * 1024)
+
+    with pytest.raises(ValueError):
+        extract_audio_stream(broken, "wav")
+
+
+def test_stalled_stream_is_killed(video_path):
+    first_chunk, rest = extract_audio_stream(video_path, "wav", stall_timeout=1)
+    assert len(first_chunk) == STREAM_CHUNK_SIZE
+
+    # Stop reading: FFmpeg blocks on the full pipe until the watchdog fires
+    time.sleep(3)
+
+    with pytest.raises(ValueError, match="stalled"):
+        b"".join(rest)
+
+
+def test_closing_stream_stops_ffmpeg(video_path, monkeypatch):
+    spawned = []
+    real_popen = subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        process = real_popen(*args, **kwargs)
+        spawned.append(process)
+        return process
+
+    monkeypatch.setattr(subprocess, "Popen", recording_popen)
+
+    first_chunk, rest = extract_audio_stream(video_path, "wav")
+    next(rest)
+    rest.close()
+
+    assert first_chunk
+    ffmpeg = [process for process in spawned if Path(process.args[0]).name == "ffmpeg"]
+    assert len(ffmpeg) == 1
+    assert ffmpeg[0].poll() is not None
@@ -0,0 +1,68 @@
+"""Tests for PDF page range parsing."""
+
+import pytest
+
+from app.services.pdf_service import parse_page_range
+
+
+MAX_PAGES = 10
+
+
+@pytest.mark.parametrize("range_string, expected", [
+    # Single pages and ranges
+    ("1", [1]),
+    ("10", [10]),
+    ("1,3,5", [1, 3, 5]),
+    ("1-5", [1, 2, 3, 4, 5]),
+    ("2-2", [2]),
+    ("1-10", list(range(1, 11))),
+    ("1-3,5,7-9", [1, 2, 3, 5, 7, 8, 9]),
+    # Results are sorted and de-duplicated
+    ("5,1", [1, 5]),
+    ("3,3,1-3", [1, 2, 3]),
+    # Whitespace around numbers, dashes and commas
+    (" 2 , 4 ", [2, 4]),
+    (" 1 - 3 ", [1, 2, 3]),
+    ("1 -3", [1, 2, 3]),
+    # Empty tokens are skipped
+    ("1,,3", [1, 3]),
+    (",1,", [1]),
+    (" ,1", [1]),
+    # Leading zeros and a leading "+" are accepted, as int() does
+    ("01", [1]),
+    ("+1", [1]),
+    ("+1-+3", [1, 2, 3]),
+])
+def test_valid_ranges(range_string, expected):
+    assert parse_page_range(range_string, MAX_PAGES) == expected
+
+
+@pytest.mark.parametrize("range_string, message", [
+    # Empty input
+    ("", "Page range cannot be empty"),
+    ("   ", "Page range cannot be empty"),
+    (",,", "No valid pages specified"),
+    # Reversed ranges
+    ("3-1", "Invalid range: 3-1 (start > end)"),
+    # Out of bounds
+    ("0", "Page 0 is out of bounds (1-10)"),
+    ("11", "Page 11 is out of bounds (1-10)"),
+    ("0-2", "Page range 0-2 is out of bounds (1-10)"),
+    ("5-11", "Page range 5-11 is out of bounds (1-10)"),
+    # Malformed input
+    ("a", "Invalid page number: a"),
+    ("1,a", "Invalid page number: a"),
+    ("1.5", "Invalid page number: 1.5"),
+    ("1 2", "Invalid page number: 1 2"),
+    ("1_0", "Invalid page number: 1_0"),
+    ("1-a", "Invalid range format: 1-a"),
+    ("1-", "Invalid range format: 1-"),
+    ("-3", "Invalid range format: -3"),
+    ("1-2-3", "Invalid range format: 1-2-3"),
+    ("1--3", "Invalid range format: 1--3"),
+])
+def test_invalid_ranges(range_string, message):
+    with pytest.raises(ValueError) as excinfo:
+        parse_page_range(range_string, MAX_PAGES)
+
+    assert str(excinfo.value) == message
@@ -0,0 +1,105 @@
+"""Tests for the request body size limit on API uploads."""
+
+import asyncio
+import warnings
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.middleware.upload_limit import MULTIPART_OVERHEAD_BYTES
+from app.services.usage_tracker import usage_tracker
+
+
+def max_body(client_ip):
+    """Body limit the middleware applies to client_ip's tier."""
+    return usage_tracker.max_file_size_mb(client_ip) * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES
+
+
+@pytest.fixture
+def client():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield TestClient(app)
+
+
+def test_declared_oversized_body_is_rejected_before_reading(client):
+    def body():
+        pytest.fail("body was read despite an oversized Content-Length")
+        yield b""
+
+    response = client.post(
+        "/api/image/convert",
+        content=body(),
+        headers={
+            "Content-Length": str(max_body("testclient") + 1),
+            "Content-Type": "multipart/form-data; boundary=x"
+        }
+    )
+
+    assert response.status_code == 413
+
+
+def test_streamed_oversized_body_is_cut_off():
+    client_ip = "203.0.113.7"
+    limit = max_body(client_ip)
+    chunk = b"\0" * (1024 * 1024)
+    total_chunks = 2 * limit // len(chunk)
+    received_chunks = 0
+    messages = []
+
+    # Drive the app over ASGI directly so the body really arrives in
+    # pieces (TestClient buffers the whole request body first)
+    async def receive():
+        nonlocal received_chunks
+        if received_chunks == 0:
+            received_chunks += 1
+            return {
+                "type": "http.request",
+                "body": b"--x\r\nContent-Disposition: form-data; name=\"file\"; "
+                        b"filename=\"a.png\"\r\n\r\n\x89PNG\r\n\x1a\n",
+                "more_body": True
+            }
+        received_chunks += 1
+        return {
+            "type": "http.request",
+            "body": chunk,
+            "more_body": received_chunks < total_chunks
+        }
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/image/convert",
+        "raw_path": b"/api/image/convert",
+        "query_string": b"",
+        # No Content-Length: only the received byte count can stop it
+        "headers": [(b"content-type", b"multipart/form-data; boundary=x")],
+        "client": (client_ip, 50000),
+        "server": ("testserver", 80),
+        "root_path": ""
+    }
+
+    asyncio.run(app(scope, receive, send))
+
+    assert messages[0]["type"] == "http.response.start"
+    assert messages[0]["status"] == 413
+    # Reading stopped just past the limit instead of spooling the whole body
+    assert received_chunks * len(chunk) <= limit + 2 * len(chunk)
+
+
+def test_body_within_limit_passes_through(client):
+    response = client.post(
+        "/api/image/convert",
+        files={"file": ("a.txt", b"not an image", "text/plain")},
+        data={"format": "png"}
+    )
+
+    # Handled by the endpoint (validation or usage quota), not the size limit
+    assert response.status_code != 413